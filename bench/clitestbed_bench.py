@@ -0,0 +1,515 @@
+#!/usr/bin/env python
+"""
+File
+
+    clitestbed_bench.py
+
+Description
+
+    Measures the throughput of the Command Line Test Bed (clitestbed)
+    itself. Each benchmark scenario generates a synthetic configuration
+    (number of Test Sets and cases, no-op or CPU-bound executable, size of
+    the ARGUMENTS map and depth of the TESTDIR tree), runs clitestbed on it
+    and records the startup time, time until the first case starts,
+    per-case harness overhead, cases per second, peak memory and log bytes
+    written. The results are written as JSON so that clitestbed versions or
+    runner options (e.g., --parallel) can be compared.
+
+Usage
+
+    clitestbed_bench.py [--suite quick|default|full] [--scenario NAME]...
+                        [--clitestbed FILE] [--python EXE]
+                        [--runner-args ARGS] [--work-dir DIR] [--keep]
+                        [--output FILE]
+    clitestbed_bench.py --list
+
+Return value
+
+    0 = Success
+    1 = Failed argument parsing
+    2 = Failed running benchmarks
+
+Author
+
+    Report bugs to dpmcmlxxvi@gmail.com
+
+"""
+
+import collections
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from optparse import OptionParser
+
+class BenchmarkScenario:
+    """
+    A synthetic configuration to benchmark clitestbed on
+    """
+
+    # ========================================
+    # EXECUTABLES
+    # ========================================
+    EXECUTABLE_NOOP="noop"
+    EXECUTABLE_CPU="cpu"
+    EXECUTABLES=[EXECUTABLE_NOOP, EXECUTABLE_CPU]
+
+    # Shell loop iterations of the CPU-bound executable
+    CPU_LOOPS=20000
+
+    def __init__(self, name, sets, cases, executable=EXECUTABLE_NOOP,
+                 arguments=0, depth=1):
+        """
+        :param name: Scenario name
+        :param sets: Number of Test Sets
+        :param cases: Total number of cases (spread evenly over the sets)
+        :param executable: Executable kind (one of EXECUTABLES)
+        :param arguments: Number of ARGUMENTS of every case
+        :param depth: Number of directories above each TESTDIR
+        """
+        self.name = name
+        self.sets = sets
+        self.cases = cases
+        self.executable = executable
+        self.arguments = arguments
+        self.depth = depth
+
+    def getName(self):
+        return self.name
+
+    def getCases(self):
+        return self.cases
+
+    def getSettings(self):
+        """
+        :returns: Scenario settings
+        """
+        settings = collections.OrderedDict()
+        settings["sets"] = self.sets
+        settings["cases"] = self.cases
+        settings["executable"] = self.executable
+        settings["arguments"] = self.arguments
+        settings["depth"] = self.depth
+        return settings
+
+    def createExecutable(self, directory):
+        """
+        Create the executable run by every case
+        :param directory: Scenario directory
+        :returns: Executable path
+        """
+        if (self.executable == BenchmarkScenario.EXECUTABLE_NOOP and
+            os.path.isfile("/bin/true")):
+            return "/bin/true"
+
+        path = os.path.join(directory, self.executable + ".sh")
+        with open(path, 'w') as handle:
+            handle.write("#!/bin/sh\n")
+            if self.executable == BenchmarkScenario.EXECUTABLE_CPU:
+                handle.write("i=0\n"
+                             "while [ $i -lt %i ]; do i=$((i+1)); done\n" %
+                             BenchmarkScenario.CPU_LOOPS)
+            handle.write("exit 0\n")
+        os.chmod(path, 0755)
+        return path
+
+    def generate(self, directory):
+        """
+        Write the scenario configuration and case files
+        :param directory: Scenario directory
+        :returns: (configuration file, executable path)
+        """
+        executable = self.createExecutable(directory)
+
+        arguments = collections.OrderedDict()
+        for index in range(self.arguments):
+            arguments["--option%04i" % index] = "value%04i" % index
+
+        casesDir = os.path.join(*(["cases"] +
+                                  ["level%02i" % level
+                                   for level in range(self.depth)]))
+
+        config = collections.OrderedDict()
+        numCases = 0
+        for setIndex in range(self.sets):
+            setName = "set%03i" % setIndex
+            testdir = os.path.join(casesDir, setName)
+            os.makedirs(os.path.join(directory, testdir))
+
+            setCases = ((self.cases * (setIndex + 1)) // self.sets -
+                        numCases)
+            for caseIndex in range(numCases, numCases + setCases):
+                caseName = "case%06i" % caseIndex
+                case = collections.OrderedDict()
+                case["TEST"] = collections.OrderedDict([
+                    ("DESCRIPTION", "Benchmark case %i" % caseIndex),
+                    ("OUTSUBDIR", caseName),
+                    ("LOGFILE", caseName + ".log")])
+                case["ARGUMENTS"] = arguments
+                with open(os.path.join(directory, testdir,
+                                       caseName + ".json"), 'w') as handle:
+                    json.dump(case, handle)
+            numCases += setCases
+
+            config[setName] = collections.OrderedDict([
+                ("EXECUTABLE", executable),
+                ("TESTDIR", testdir),
+                ("OUTDIR", os.path.join("output", setName)),
+                ("LOGFILE", setName + ".log")])
+
+        configFile = os.path.join(directory, "config.json")
+        with open(configFile, 'w') as handle:
+            json.dump(config, handle, indent=4)
+
+        return (configFile, executable)
+
+# ========================================
+# SCENARIOS
+# ========================================
+SCENARIOS=[
+    BenchmarkScenario("noop-1x10", 1, 10),
+    BenchmarkScenario("noop-1x1000", 1, 1000),
+    BenchmarkScenario("noop-10x10000", 10, 10000),
+    BenchmarkScenario("noop-100x100000", 100, 100000),
+    BenchmarkScenario("cpu-1x100", 1, 100, BenchmarkScenario.EXECUTABLE_CPU),
+    BenchmarkScenario("cpu-10x1000", 10, 1000,
+                      BenchmarkScenario.EXECUTABLE_CPU),
+    BenchmarkScenario("args-1x1000", 1, 1000, arguments=500),
+    BenchmarkScenario("deep-10x1000", 10, 1000, depth=32),
+    BenchmarkScenario("sets-100x1000", 100, 1000)]
+
+SUITES={
+    "quick": ["noop-1x10", "cpu-1x100"],
+    "default": ["noop-1x10", "noop-1x1000", "noop-10x10000", "cpu-1x100",
+                "args-1x1000", "deep-10x1000", "sets-100x1000"],
+    "full": [scenario.getName() for scenario in SCENARIOS]}
+
+class Benchmark:
+    """
+    Runs clitestbed on benchmark scenarios and measures its throughput
+    """
+
+    # Markers of the clitestbed log (written to stderr)
+    MARKER_SET="TEST SET:"
+    MARKER_CASE="Running CASE #"
+    MARKER_STATUS="Test Case return status:"
+
+    def __init__(self, clitestbed, python, runnerArgs, workDir, keep):
+        """
+        :param clitestbed: Path of clitestbed.py
+        :param python: Python interpreter running clitestbed
+        :param runnerArgs: Extra clitestbed arguments (e.g., --parallel)
+        :param workDir: Directory the scenarios are generated in
+        :param keep: If True the generated scenarios are kept
+        """
+        self.clitestbed = os.path.abspath(clitestbed)
+        self.python = python
+        self.runnerArgs = runnerArgs
+        self.workDir = workDir
+        self.keep = keep
+
+    def getVersion(self):
+        """
+        :returns: Version reported by clitestbed
+        """
+        process = subprocess.Popen([self.python, self.clitestbed, "--version"],
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT)
+        return process.communicate()[0].strip()
+
+    @staticmethod
+    def getLogBytes(directory):
+        """
+        :param directory: Output directory
+        :returns: Total size (bytes) of the files in the directory
+        """
+        total = 0
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                total += os.path.getsize(os.path.join(root, name))
+        return total
+
+    @staticmethod
+    def getBaselineSeconds(executable, directory, runs):
+        """
+        Time the executable without the harness: it is launched as many
+        times as clitestbed ran cases, one after another from a bare loop
+        and through the shell as clitestbed launches it.
+        :param executable: Executable path
+        :param directory: Working directory
+        :param runs: Number of launches
+        :returns: Total run time (seconds)
+        """
+        with open(os.devnull, 'w') as devnull:
+            tStart = time.time()
+            for index in range(runs):
+                subprocess.Popen(executable,
+                                 stdout=devnull,
+                                 stderr=devnull,
+                                 cwd=directory,
+                                 close_fds=True,
+                                 shell=True).wait()
+            return time.time() - tStart
+
+    def runClitestbed(self, configFile, directory):
+        """
+        Run clitestbed and time the progress reported in its log
+        :param configFile: Configuration file
+        :param directory: Working directory
+        :returns: Measurements
+        """
+        command = ([self.python, self.clitestbed] + self.runnerArgs +
+                   [configFile])
+        with open(os.devnull, 'w') as devnull:
+            tStart = time.time()
+            process = subprocess.Popen(command,
+                                       stdout=devnull,
+                                       stderr=subprocess.PIPE,
+                                       cwd=directory)
+
+            tSet = None
+            tFirstCase = None
+            numCases = 0
+            numFail = 0
+            for line in iter(process.stderr.readline, ""):
+                if tSet is None and Benchmark.MARKER_SET in line:
+                    tSet = time.time()
+                elif tFirstCase is None and Benchmark.MARKER_CASE in line:
+                    tFirstCase = time.time()
+                elif Benchmark.MARKER_STATUS in line:
+                    numCases += 1
+                    if "ERROR" in line:
+                        numFail += 1
+            process.stderr.close()
+
+            pid, status, rusage = os.wait4(process.pid, 0)
+            tEnd = time.time()
+
+        measurements = collections.OrderedDict()
+        measurements["returncode"] = (os.WEXITSTATUS(status)
+                                      if os.WIFEXITED(status)
+                                      else -os.WTERMSIG(status))
+        measurements["cases_run"] = numCases
+        measurements["cases_failed"] = numFail
+        measurements["wall_seconds"] = tEnd - tStart
+        measurements["startup_seconds"] = (tSet - tStart
+                                           if tSet is not None else None)
+        measurements["first_case_seconds"] = (tFirstCase - tStart
+                                              if tFirstCase is not None
+                                              else None)
+        measurements["cpu_seconds"] = rusage.ru_utime + rusage.ru_stime
+        measurements["peak_rss_kb"] = rusage.ru_maxrss
+        return measurements
+
+    def run(self, scenario):
+        """
+        Generate and benchmark a scenario
+        :param scenario: BenchmarkScenario
+        :returns: Scenario settings and measurements
+        """
+        directory = tempfile.mkdtemp(prefix=scenario.getName() + "-",
+                                     dir=self.workDir)
+        try:
+            tStart = time.time()
+            configFile, executable = scenario.generate(directory)
+            tGenerate = time.time() - tStart
+
+            measurements = self.runClitestbed(configFile, directory)
+            baseline = Benchmark.getBaselineSeconds(
+                executable, directory, measurements["cases_run"])
+            logBytes = Benchmark.getLogBytes(os.path.join(directory,
+                                                          "output"))
+        finally:
+            if not self.keep:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        # Time spent running cases, from the first set header to exit
+        runSeconds = None
+        if measurements["startup_seconds"] is not None:
+            runSeconds = (measurements["wall_seconds"] -
+                          measurements["startup_seconds"])
+
+        numCases = measurements["cases_run"]
+        result = collections.OrderedDict()
+        result["name"] = scenario.getName()
+        result.update(scenario.getSettings())
+        result["directory"] = directory if self.keep else None
+        result["generate_seconds"] = tGenerate
+        result["executable_seconds"] = (baseline / numCases
+                                        if numCases > 0 else None)
+        result.update(measurements)
+        result["run_seconds"] = runSeconds
+        result["cases_per_second"] = None
+        result["overhead_per_case_seconds"] = None
+        if runSeconds is not None and runSeconds > 0 and numCases > 0:
+            result["cases_per_second"] = numCases / runSeconds
+            # Timing noise can make a run faster than its baseline
+            result["overhead_per_case_seconds"] = max(
+                0.0, (runSeconds - baseline) / numCases)
+        result["log_bytes"] = logBytes
+        result["log_bytes_per_case"] = (logBytes // numCases
+                                        if numCases > 0 else None)
+        return result
+
+    def runAll(self, scenarios, stream=sys.stdout):
+        """
+        Benchmark scenarios
+        :param scenarios: BenchmarkScenarios
+        :param stream: Stream progress is written to
+        :returns: Benchmark report
+        """
+        report = collections.OrderedDict()
+        report["started"] = datetime.datetime.now().isoformat()
+        report["clitestbed"] = self.clitestbed
+        report["version"] = self.getVersion()
+        report["runner_args"] = self.runnerArgs
+        report["python"] = self.python
+        report["platform"] = platform.platform()
+        report["cpus"] = multiprocessing.cpu_count()
+        report["scenarios"] = []
+
+        fmt = "%-20s %9s %9s %9s %11s %12s %9s %12s\n"
+        stream.write(fmt % ("SCENARIO", "CASES", "START (s)", "FIRST (s)",
+                            "CASES/s", "OVERHEAD (ms)", "RSS (MB)",
+                            "LOG (bytes)"))
+        for scenario in scenarios:
+            result = self.run(scenario)
+            report["scenarios"].append(result)
+
+            def show(value, scale=1.0, precision=3):
+                if value is None:
+                    return "-"
+                return "%.*f" % (precision, value * scale)
+
+            stream.write(fmt % (scenario.getName(),
+                                result["cases_run"],
+                                show(result["startup_seconds"]),
+                                show(result["first_case_seconds"]),
+                                show(result["cases_per_second"],
+                                     precision=1),
+                                show(result["overhead_per_case_seconds"],
+                                     1000.0),
+                                show(result["peak_rss_kb"], 1 / 1024.0, 1),
+                                result["log_bytes"]))
+            stream.flush()
+
+        report["finished"] = datetime.datetime.now().isoformat()
+        return report
+
+def main(argv=None):
+    """
+    Command line main function
+    :param argv: Command line arguments
+    """
+
+    defaultClitestbed = os.path.join(os.path.dirname(os.path.abspath(
+        __file__)), os.pardir, "src", "clitestbed.py")
+
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("--suite",
+                      dest="suite",
+                      default="default",
+                      choices=sorted(SUITES.keys()),
+                      help="scenarios to run: quick, default or full "
+                           "(default: default).")
+    parser.add_option("--scenario",
+                      dest="scenarios",
+                      action="append",
+                      default=[],
+                      metavar="NAME",
+                      help="runs scenario NAME instead of a suite "
+                           "(repeatable).")
+    parser.add_option("--list",
+                      action="store_true",
+                      dest="list",
+                      default=False,
+                      help="lists the scenarios and suites.")
+    parser.add_option("--clitestbed",
+                      dest="clitestbed",
+                      default=defaultClitestbed,
+                      metavar="FILE",
+                      help="clitestbed.py to benchmark (default: the one "
+                           "in this repository).")
+    parser.add_option("--python",
+                      dest="python",
+                      default=sys.executable,
+                      metavar="EXE",
+                      help="Python interpreter running clitestbed (default: "
+                           "this interpreter).")
+    parser.add_option("--runner-args",
+                      dest="runnerArgs",
+                      default="",
+                      metavar="ARGS",
+                      help="extra clitestbed arguments, e.g. "
+                           "\"--parallel --cpus 4\".")
+    parser.add_option("--work-dir",
+                      dest="workDir",
+                      default=None,
+                      metavar="DIR",
+                      help="directory the scenarios are generated in "
+                           "(default: system temporary directory).")
+    parser.add_option("--keep",
+                      action="store_true",
+                      dest="keep",
+                      default=False,
+                      help="keeps the generated scenarios and output.")
+    parser.add_option("--output",
+                      dest="output",
+                      default="clitestbed_bench.json",
+                      metavar="FILE",
+                      help="JSON results file (default: "
+                           "clitestbed_bench.json).")
+    (options, args) = parser.parse_args()
+
+    if len(args) != 0:
+        parser.error("incorrect number of arguments")
+        return 1
+
+    scenarios = collections.OrderedDict((scenario.getName(), scenario)
+                                        for scenario in SCENARIOS)
+
+    if options.list:
+        for scenario in SCENARIOS:
+            print "%-20s %s" % (scenario.getName(),
+                                json.dumps(scenario.getSettings()))
+        for suite in sorted(SUITES.keys()):
+            print "%-20s %s" % ("[" + suite + "]", " ".join(SUITES[suite]))
+        return 0
+
+    names = options.scenarios or SUITES[options.suite]
+    for name in names:
+        if name not in scenarios:
+            parser.error("unknown scenario: %s" % name)
+            return 1
+
+    if not os.path.isfile(options.clitestbed):
+        print "Error: clitestbed not found: {}".format(options.clitestbed)
+        return 2
+
+    try:
+        benchmark = Benchmark(options.clitestbed,
+                              options.python,
+                              shlex.split(options.runnerArgs),
+                              options.workDir,
+                              options.keep)
+        report = benchmark.runAll([scenarios[name] for name in names])
+        with open(options.output, 'w') as handle:
+            json.dump(report, handle, indent=4)
+            handle.write("\n")
+    except Exception as e:
+        print "Error: {}".format(e)
+        return 2
+
+    print "Results written to {}".format(options.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
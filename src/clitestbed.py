@@ -17,7 +17,20 @@ Description
 
 Usage
 
-    clitestbed.py [--dry-run] <configuration file>
+    clitestbed.py [--dry-run] [--profile-harness] [--profile-output FILE]
+                  [--parallel [--cpus N] [--memory-mb N]]
+                  [--reserve-core N]
+                  [--fixture-cache DIR] [--fixture-cache-mb N]
+                  [--watch]
+                  <configuration file>
+    clitestbed.py --plan json|csv [--history DB] <configuration file>
+    clitestbed.py [--history DB] <configuration file>
+    clitestbed.py --coordinator [HOST]:PORT [--worker-timeout SECONDS]
+                  <configuration file>
+    clitestbed.py --worker [HOST]:PORT
+    clitestbed.py history [--last N] [--top N] <DB> [<case>]
+    clitestbed.py show <archive directory> [<case id>]
+    clitestbed.py show <case log file>
 
 Return value
 
@@ -39,18 +52,57 @@ Author
 
 """
 
+import base64
 import collections
+import cProfile
+import ctypes
+import ctypes.util
+import csv
+import errno
+import fcntl
 import glob
+import hashlib
+import itertools
 import json
 import logging
+import multiprocessing
+import mmap
 import os
 import platform
+import re
+import select
+import shlex
+import shutil
+import socket
+import struct
 import subprocess
 import sys
+import tempfile
+import threading
 import time
+import timeit
+import urllib
+import zlib
 
 from optparse import OptionParser
 
+# Optional log compression codecs
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4frame
+except ImportError:
+    lz4frame = None
+
+# Optional run history store
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
 class ApplicationProperties:
     """
     Application Properties
@@ -179,6 +231,167 @@ def normalizePath(srcPath):
         return dstPath
     return srcPath
 
+def parseCpuList(cpus):
+    """
+    Parse a list of CPUs given as a list of numbers or a string of
+    comma separated numbers and ranges (e.g., "0-3,6")
+    :param cpus: CPU list
+    :returns: Sorted list of CPU numbers
+    """
+    if isinstance(cpus, (int, long)):
+        return [cpus]
+    if not isinstance(cpus, list):
+        items = [item.strip() for item in str(cpus).split(",")]
+        cpus = []
+        for item in items:
+            if len(item) == 0:
+                continue
+            if "-" in item:
+                first, last = item.split("-", 1)
+                cpus.extend(range(int(first), int(last) + 1))
+            else:
+                cpus.append(int(item))
+    return sorted(set(int(cpu) for cpu in cpus))
+
+def formatCpuList(cpus):
+    """
+    Format a list of CPUs as comma separated numbers and ranges
+    :param cpus: Sorted list of CPU numbers
+    :returns: CPU list string (e.g., "0-3,6")
+    """
+    ranges = []
+    for cpu in cpus:
+        if len(ranges) > 0 and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(first) if first == last else "%d-%d" % (first, last)
+                    for first, last in ranges)
+
+def parseAddress(address):
+    """
+    Parse a network address given as HOST:PORT. The host defaults to the
+    local machine only (127.0.0.1); other machines can only connect if a
+    host such as 0.0.0.0 is given explicitly.
+    :param address: Address string
+    :returns: (host, port)
+    """
+    host, separator, port = str(address).rpartition(":")
+    if len(separator) == 0 or not port.isdigit():
+        raise ValueError("Invalid address (expected HOST:PORT): %s" % address)
+    return (host or "127.0.0.1", int(port))
+
+def loadLibc():
+    """
+    Load the C library for system calls not available in the os module
+    :returns: C library or None if unavailable
+    """
+    try:
+        return ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    except (OSError, TypeError):
+        return None
+
+def setProcessAffinity(cpus, libc=None):
+    """
+    Restrict the current process to a set of CPUs
+    :param cpus: List of CPU numbers
+    :param libc: C library used if os.sched_setaffinity is unavailable
+    """
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+        return
+
+    if libc is None:
+        raise OSError("CPU affinity is not supported")
+
+    # cpu_set_t is a bit mask of (at least) 1024 CPUs
+    bitsPerWord = 8 * ctypes.sizeof(ctypes.c_ulong)
+    numWords = max(1024, max(cpus) + 1) // bitsPerWord + 1
+    mask = (ctypes.c_ulong * numWords)()
+    for cpu in cpus:
+        mask[cpu // bitsPerWord] |= 1 << (cpu % bitsPerWord)
+    if libc.sched_setaffinity(0, ctypes.sizeof(mask), ctypes.byref(mask)) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+def waitProcess(process):
+    """
+    Wait for a child process to exit and collect its resource usage
+    :param process: subprocess.Popen process
+    :returns: (return code, resource usage or None if unavailable)
+    """
+    if not hasattr(os, "wait4"):
+        return (process.wait(), None)
+
+    while True:
+        try:
+            pid, status, rusage = os.wait4(process.pid, 0)
+            break
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            if e.errno == errno.ECHILD:
+                return (process.wait(), None)
+            raise
+
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    return (process.returncode, rusage)
+
+class Timeval(ctypes.Structure):
+    """
+    C struct timeval
+    """
+    _fields_ = [("tv_sec", ctypes.c_long),
+                ("tv_usec", ctypes.c_long)]
+
+class Rusage(ctypes.Structure):
+    """
+    C struct rusage (the CPU times followed by 14 counters)
+    """
+    _fields_ = [("ru_utime", Timeval),
+                ("ru_stime", Timeval),
+                ("ru_counters", ctypes.c_long * 14)]
+
+# getrusage() target measuring the calling thread only (Linux)
+RUSAGE_THREAD=1
+
+def getThreadCpuTime(libc):
+    """
+    CPU time used by the calling thread, excluding the other threads of
+    the process (e.g., other cases run with --parallel)
+    :param libc: C library (see loadLibc)
+    :returns: User plus system CPU time (seconds) or None if unavailable
+    """
+    if libc is None:
+        return None
+    usage = Rusage()
+    if libc.getrusage(RUSAGE_THREAD, ctypes.byref(usage)) != 0:
+        return None
+    return (usage.ru_utime.tv_sec + usage.ru_stime.tv_sec +
+            (usage.ru_utime.tv_usec + usage.ru_stime.tv_usec) / 1e6)
+
+def setProcessPriority(nice, libc=None):
+    """
+    Set the scheduling priority (nice value) of the current process
+    :param nice: Nice value
+    :param libc: C library used if os.setpriority is unavailable
+    """
+    if hasattr(os, "setpriority"):
+        os.setpriority(os.PRIO_PROCESS, 0, nice)
+        return
+
+    if libc is None:
+        os.nice(nice - os.nice(0))
+        return
+
+    # PRIO_PROCESS = 0
+    if libc.setpriority(0, 0, nice) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
 class CommandLineArgument:
     """
     Class that defines a command line argument
@@ -208,13 +421,42 @@ class CommandLineParser:
     """
     Class to parse command line arguments
     """
-    USAGE="usage: %prog [--help] <configuration file>"
+    USAGE=("usage: %prog [--help] <configuration file>\n"
+           "       %prog --worker HOST:PORT\n"
+           "       %prog show <archive directory> [<case id>]\n"
+           "       %prog show <case log file>\n"
+           "       %prog history [--last N] [--top N] <database> [<case>]")
+
+    # ========================================
+    # COMMANDS
+    # ========================================
+    COMMAND_RUN="run"
+    COMMAND_SHOW="show"
+    COMMAND_HISTORY="history"
 
     def __init__(self):
 
         self.good = False
+        self.command = CommandLineParser.COMMAND_RUN
+        self.commandArgs = []
         self.config = None
         self.dryrun = False
+        self.profileHarness = False
+        self.profileOutput = None
+        self.parallel = False
+        self.cpus = None
+        self.memoryMb = None
+        self.reserveCore = None
+        self.fixtureCache = None
+        self.fixtureCacheMb = None
+        self.watch = False
+        self.plan = None
+        self.history = None
+        self.last = None
+        self.top = None
+        self.coordinator = None
+        self.workerTimeout = None
+        self.worker = None
         self.parser = OptionParser(
             description=ApplicationProperties.description(),
             usage=CommandLineParser.USAGE,
@@ -224,29 +466,250 @@ class CommandLineParser:
                                dest="dryrun",
                                default=False,
                                help="prints command line without executing it.")
+        self.parser.add_option("--profile-harness",
+                               action="store_true",
+                               dest="profileHarness",
+                               default=False,
+                               help="times harness phases and prints a "
+                                    "per-case overhead breakdown.")
+        self.parser.add_option("--profile-output",
+                               dest="profileOutput",
+                               default=None,
+                               metavar="FILE",
+                               help="writes cProfile statistics to FILE "
+                                    "(implies --profile-harness).")
+        self.parser.add_option("--parallel",
+                               action="store_true",
+                               dest="parallel",
+                               default=False,
+                               help="runs cases in parallel, packed by their "
+                                    "declared CPUS and MEMORY_MB.")
+        self.parser.add_option("--cpus",
+                               type="int",
+                               dest="cpus",
+                               default=None,
+                               metavar="N",
+                               help="number of CPUs available to --parallel "
+                                    "(default all).")
+        self.parser.add_option("--memory-mb",
+                               type="int",
+                               dest="memoryMb",
+                               default=None,
+                               metavar="N",
+                               help="memory (MB) available to --parallel "
+                                    "(default physical memory).")
+        self.parser.add_option("--reserve-core",
+                               type="int",
+                               dest="reserveCore",
+                               default=None,
+                               metavar="N",
+                               help="pins the harness to CPU N and excludes "
+                                    "it from the cases' CPU affinity.")
+        self.parser.add_option("--fixture-cache",
+                               dest="fixtureCache",
+                               default=None,
+                               metavar="DIR",
+                               help="fixture cache directory (default "
+                                    "~/.cache/clitestbed/fixtures).")
+        self.parser.add_option("--fixture-cache-mb",
+                               type="int",
+                               dest="fixtureCacheMb",
+                               default=None,
+                               metavar="N",
+                               help="maximum fixture cache size in MB "
+                                    "(default 10240).")
+        self.parser.add_option("--watch",
+                               action="store_true",
+                               dest="watch",
+                               default=False,
+                               help="stays resident and re-runs the sets and "
+                                    "cases affected by changes to their "
+                                    "executables or configuration files.")
+        self.parser.add_option("--plan",
+                               type="choice",
+                               choices=TestPlan.FORMATS,
+                               dest="plan",
+                               default=None,
+                               metavar="FORMAT",
+                               help="writes the execution plan as json or csv "
+                                    "to stdout without running any case.")
+        self.parser.add_option("--history",
+                               dest="history",
+                               default=None,
+                               metavar="DB",
+                               help="records runs and case results in the "
+                                    "SQLite database DB (also used by "
+                                    "--plan to predict case durations).")
+        self.parser.add_option("--coordinator",
+                               dest="coordinator",
+                               default=None,
+                               metavar="HOST:PORT",
+                               help="runs the cases on --worker processes "
+                                    "connecting to HOST:PORT (HOST "
+                                    "default 127.0.0.1).")
+        self.parser.add_option("--worker-timeout",
+                               type="int",
+                               dest="workerTimeout",
+                               default=None,
+                               metavar="SECONDS",
+                               help="fails a --coordinator run once no "
+                                    "worker has been connected for SECONDS "
+                                    "(default 300).")
+        self.parser.add_option("--worker",
+                               dest="worker",
+                               default=None,
+                               metavar="HOST:PORT",
+                               help="runs the cases handed out by the "
+                                    "--coordinator at HOST:PORT.")
+        self.parser.add_option("--last",
+                               type="int",
+                               dest="last",
+                               default=30,
+                               metavar="N",
+                               help="history: number of recent runs to "
+                                    "report on (default 30).")
+        self.parser.add_option("--top",
+                               type="int",
+                               dest="top",
+                               default=10,
+                               metavar="N",
+                               help="history: number of cases per table "
+                                    "(default 10).")
+
+    def getCoordinator(self):
+        return self.coordinator
+
+    def getWorkerTimeout(self):
+        return self.workerTimeout
+
+    def getCommand(self):
+        return self.command
+
+    def getCommandArgs(self):
+        return self.commandArgs
 
     def getConfig(self):
         return self.config
 
+    def getCpus(self):
+        return self.cpus
+
+    def getFixtureCache(self):
+        return self.fixtureCache
+
+    def getFixtureCacheMb(self):
+        return self.fixtureCacheMb
+
+    def getHistory(self):
+        return self.history
+
+    def getLast(self):
+        return self.last
+
+    def getMemoryMb(self):
+        return self.memoryMb
+
+    def getPlan(self):
+        return self.plan
+
+    def getProfileOutput(self):
+        return self.profileOutput
+
+    def getReserveCore(self):
+        return self.reserveCore
+
+    def getTop(self):
+        return self.top
+
+    def getWorker(self):
+        return self.worker
+
     def isDryrun(self):
         return self.dryrun
 
     def isGood(self):
         return self.good
 
+    def isParallel(self):
+        return self.parallel
+
+    def isProfileHarness(self):
+        return self.profileHarness
+
+    def isWatch(self):
+        return self.watch
+
     def parse(self):
 
         (options, args) = self.parser.parse_args()
 
+        if options.worker is not None:
+            if len(args) != 0:
+                self.parser.error("--worker takes no configuration file")
+                return
+            try:
+                self.worker = parseAddress(options.worker)
+            except ValueError as e:
+                self.parser.error(str(e))
+                return
+            self.reserveCore = options.reserveCore
+            self.fixtureCache = options.fixtureCache
+            self.fixtureCacheMb = options.fixtureCacheMb
+            self.good = True
+            return
+
         if len(args) == 0:
             self.parser.print_usage()
             return
 
+        if args[0] == CommandLineParser.COMMAND_SHOW:
+            if len(args) not in [2, 3]:
+                self.parser.error("incorrect number of arguments")
+                return
+            self.command = args[0]
+            self.commandArgs = args[1:]
+            self.good = True
+            return
+
+        if args[0] == CommandLineParser.COMMAND_HISTORY:
+            if len(args) not in [2, 3]:
+                self.parser.error("incorrect number of arguments")
+                return
+            self.command = args[0]
+            self.commandArgs = args[1:]
+            self.last = options.last
+            self.top = options.top
+            self.good = True
+            return
+
         if len(args) != 1:
             self.parser.error("incorrect number of arguments")
             return
 
         self.dryrun = options.dryrun
+        self.profileHarness = (options.profileHarness or
+                               options.profileOutput is not None)
+        self.profileOutput = options.profileOutput
+        self.parallel = options.parallel
+        self.cpus = options.cpus
+        self.memoryMb = options.memoryMb
+        self.reserveCore = options.reserveCore
+        self.fixtureCache = options.fixtureCache
+        self.fixtureCacheMb = options.fixtureCacheMb
+        self.watch = options.watch
+        self.plan = options.plan
+        self.history = options.history
+        if options.coordinator is not None:
+            if options.parallel or options.watch:
+                self.parser.error("--coordinator cannot be combined with "
+                                  "--parallel or --watch")
+                return
+            try:
+                self.coordinator = parseAddress(options.coordinator)
+            except ValueError as e:
+                self.parser.error(str(e))
+                return
+            self.workerTimeout = options.workerTimeout
         self.config = args[0]
         self.good = True
 
@@ -265,6 +728,531 @@ class FileHandler:
     def getHandle(self):
         return self.handle
 
+class HarnessProfiler:
+    """
+    Low overhead per-phase timers that measure the time spent in the
+    harness itself, as opposed to the program under test. Timers are
+    accumulated per test case (or test set for set-level phases) and
+    reported as a breakdown when the run completes. When disabled the
+    timer calls return immediately.
+    """
+
+    # ========================================
+    # PHASES
+    # ========================================
+    PHASE_PARSE="parse"
+    PHASE_INTERPOLATE="interpolate"
+    PHASE_DISCOVER="discover"
+    PHASE_LOGGER="logger"
+    PHASE_SPAWN="spawn"
+    PHASE_WAIT="wait"
+    PHASE_LOGWRITE="logwrite"
+    PHASE_FIXTURE="fixture"
+    PHASE_WORKSPACE="workspace"
+    PHASES=[PHASE_PARSE,
+            PHASE_INTERPOLATE,
+            PHASE_DISCOVER,
+            PHASE_LOGGER,
+            PHASE_SPAWN,
+            PHASE_WAIT,
+            PHASE_LOGWRITE,
+            PHASE_FIXTURE,
+            PHASE_WORKSPACE]
+
+    # Phases that measure the program under test (and its fixture
+    # generators) rather than the harness
+    CHILD_PHASES=[PHASE_WAIT, PHASE_FIXTURE]
+
+    def __init__(self):
+        self.enabled = False
+        self.timer = timeit.default_timer
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.keys = []
+        self.totals = {}
+
+    def enable(self):
+        """
+        Enable phase timers
+        """
+        self.enabled = True
+
+    def isEnabled(self):
+        return self.enabled
+
+    def setKey(self, key):
+        """
+        Set the test set or case that subsequent phases (in the calling
+        thread) are accounted to
+        :param key: Test set or case identifier
+        """
+        if not self.enabled:
+            return
+        self.local.key = key
+
+    def start(self):
+        """
+        Start a phase timer
+        :returns: Start time token to pass to stop()
+        """
+        if not self.enabled:
+            return None
+        return self.timer()
+
+    def stop(self, phase, tStart):
+        """
+        Stop a phase timer and accumulate its elapsed time
+        :param phase: Phase name (one of PHASES)
+        :param tStart: Token returned by start()
+        """
+        if tStart is None:
+            return
+        tElapsed = self.timer() - tStart
+        key = getattr(self.local, "key", None)
+        with self.lock:
+            phases = self.totals.get(key)
+            if phases is None:
+                phases = self.totals[key] = dict.fromkeys(self.PHASES, 0.0)
+                self.keys.append(key)
+            phases[phase] += tElapsed
+
+    def calibrate(self, iterations=100000):
+        """
+        Measure the cost of a single start/stop timer pair
+        :param iterations: Number of timer pairs to average over
+        :returns: Timer overhead per phase in seconds
+        """
+        key = getattr(self.local, "key", None)
+        self.local.key = "calibrate"
+        tStart = self.timer()
+        for i in xrange(iterations):
+            self.stop(HarnessProfiler.PHASE_WAIT, self.start())
+        tElapsed = self.timer() - tStart
+        self.local.key = key
+        with self.lock:
+            if "calibrate" in self.totals:
+                self.keys.remove("calibrate")
+                del self.totals["calibrate"]
+        return tElapsed / iterations
+
+    def report(self, stream=None):
+        """
+        Print the per-phase breakdown of harness overhead
+        :param stream: Output stream (default stdout)
+        """
+        if stream is None:
+            stream = sys.stdout
+
+        overhead = self.calibrate()
+        harnessPhases = [phase for phase in self.PHASES
+                         if phase not in self.CHILD_PHASES]
+
+        header = "%-40s" + " %11s" * (len(self.PHASES) + 1)
+        row = "%-40s" + " %11.3f" * (len(self.PHASES) + 1)
+        stream.write("HARNESS PROFILE (milliseconds)\n")
+        stream.write((header + "\n") % tuple(["CASE"] + self.PHASES +
+                                             ["harness"]))
+
+        totals = dict.fromkeys(self.PHASES, 0.0)
+        for key in self.keys:
+            phases = self.totals[key]
+            harness = sum(phases[phase] for phase in harnessPhases)
+            for phase in self.PHASES:
+                totals[phase] += phases[phase]
+            name = str(key)
+            if len(name) > 40:
+                name = "..." + name[-37:]
+            stream.write((row + "\n") % tuple(
+                [name] +
+                [1000.0 * phases[phase] for phase in self.PHASES] +
+                [1000.0 * harness]))
+
+        harness = sum(totals[phase] for phase in harnessPhases)
+        child = sum(totals[phase] for phase in self.CHILD_PHASES)
+        stream.write((row + "\n") % tuple(
+            ["TOTAL"] +
+            [1000.0 * totals[phase] for phase in self.PHASES] +
+            [1000.0 * harness]))
+        if harness + child > 0:
+            stream.write("Harness overhead: %.3f ms of %.3f ms (%.1f%%)\n" %
+                         (1000.0 * harness,
+                          1000.0 * (harness + child),
+                          100.0 * harness / (harness + child)))
+        stream.write("Timer overhead per phase (microseconds): %.3f\n" %
+                     (1.0e6 * overhead))
+
+# Harness profiler shared by all test sets and cases
+profiler = HarnessProfiler()
+
+class Fixture:
+    """
+    A shared input file generated by a command. The file is generated at
+    most once per run, stored in the FixtureCache under a hash of its
+    declaration (command, and contents of the files the command names and
+    of its input files) so it is reused across runs, and shared read-only
+    by every case that references it.
+    """
+
+    # ========================================
+    # PROPERTIES
+    # ========================================
+    PROP_COMMAND="COMMAND"
+    PROP_INPUTS="INPUTS"
+
+    # Hash shown in place of the content hash of unhashed paths
+    KEY_PLACEHOLDER="<hash>"
+
+    def __init__(self, cache, name, command, inputs=None):
+        """
+        :param cache: FixtureCache storing the fixture
+        :param name: Fixture name
+        :param command: Shell command whose standard output is the fixture
+        :param inputs: Optional list of files the command reads
+        """
+        self.cache = cache
+        self.name = name
+        self.command = command
+        self.inputs = inputs or []
+        self.lock = threading.Lock()
+        self.built = False
+        self.path = None
+
+    def getName(self):
+        return self.name
+
+    def getCommandFiles(self):
+        """
+        :returns: Files named by the command: its executable (searched for
+                  on the PATH) and any argument naming a file, such as a
+                  generator script
+        """
+        command = self.command
+        if isinstance(command, unicode):
+            command = command.encode("utf-8")
+        try:
+            words = shlex.split(command)
+        except ValueError:
+            words = command.split()
+
+        files = []
+        for index, word in enumerate(words):
+            path = word
+            if index == 0 and len(os.path.dirname(word)) == 0:
+                for pathdir in os.environ.get("PATH", "").split(os.pathsep):
+                    if os.path.isfile(os.path.join(pathdir, word)):
+                        path = os.path.join(pathdir, word)
+                        break
+            if os.path.isfile(path) and path not in files:
+                files.append(path)
+        return files
+
+    def getKey(self):
+        """
+        :returns: Content hash of the fixture declaration
+        """
+        command = self.command
+        if isinstance(command, unicode):
+            command = command.encode("utf-8")
+        digest = hashlib.sha1(command)
+        for filename in self.getCommandFiles() + list(self.inputs):
+            if isinstance(filename, unicode):
+                filename = filename.encode("utf-8")
+            digest.update("\0" + filename + "\0")
+            with open(filename, 'rb') as handle:
+                for chunk in iter(lambda: handle.read(1024 * 1024), ""):
+                    digest.update(chunk)
+        return digest.hexdigest()[:16]
+
+    def getPath(self, hashed=True):
+        """
+        :param hashed: If False the content hash in the path is replaced by
+                       KEY_PLACEHOLDER so no file is read (e.g., for a plan)
+        :returns: Path of the fixture file in the cache
+        """
+        if not hashed:
+            return os.path.join(self.cache.getDirectory(),
+                                "%s-%s" % (self.name, Fixture.KEY_PLACEHOLDER))
+        if self.path is None:
+            self.path = os.path.join(self.cache.getDirectory(),
+                                     "%s-%s" % (self.name, self.getKey()))
+        return self.path
+
+    def build(self, logger=None):
+        """
+        Generate the fixture file unless it is cached
+        :param logger: Optional logger to report generation to
+        """
+        with self.lock:
+            if self.built:
+                return
+
+            path = self.getPath()
+            if os.path.isfile(path):
+                os.utime(path, None)
+            else:
+                if logger is not None:
+                    logger.info("Generating fixture %s: %s" % (self.name,
+                                                               self.command))
+                tPhase = profiler.start()
+                self.cache.generate(path, self.command)
+                profiler.stop(HarnessProfiler.PHASE_FIXTURE, tPhase)
+                self.cache.evict()
+
+            self.built = True
+
+class FixtureCache:
+    """
+    Cache of generated fixture files shared across runs. When the cache
+    exceeds its maximum size the least recently used fixtures that are not
+    used by the current run are evicted.
+    """
+
+    # ========================================
+    # SECTION: FIXTURES
+    # ========================================
+    SECTION_FIXTURES="FIXTURES"
+
+    # Cache location and maximum size (MB)
+    directory = os.path.join(os.path.expanduser("~"), ".cache",
+                             ApplicationProperties.name(), "fixtures")
+    sizeMb = 10240
+
+    def __init__(self, directory=None, sizeMb=None):
+        """
+        :param directory: Cache directory (default FixtureCache.directory)
+        :param sizeMb: Maximum cache size in MB (default FixtureCache.sizeMb)
+        """
+        self.directory = directory or FixtureCache.directory
+        self.sizeMb = sizeMb if sizeMb is not None else FixtureCache.sizeMb
+        self.fixtures = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def getDirectory(self):
+        return self.directory
+
+    def getFixture(self, name):
+        """
+        :param name: Fixture name
+        :returns: Fixture
+        """
+        if name not in self.fixtures:
+            raise Exception("Unknown fixture: %s" % name)
+        return self.fixtures[name]
+
+    def addFixtures(self, declarations):
+        """
+        Add fixtures declared in a FIXTURES section. Each fixture is either
+        a command or an object with COMMAND and optional INPUTS properties.
+        :param declarations: Fixture declarations by name
+        """
+        for name, declaration in declarations.iteritems():
+            inputs = None
+            if isinstance(declaration, dict):
+                command = declaration[Fixture.PROP_COMMAND]
+                inputs = declaration.get(Fixture.PROP_INPUTS)
+            else:
+                command = declaration
+            self.fixtures[name] = Fixture(self, name, command, inputs)
+
+    def generate(self, path, command):
+        """
+        Run a fixture command and store its output read-only in the cache
+        :param path: Fixture file path
+        :param command: Shell command whose standard output is the fixture
+        """
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
+
+        # Write to a temporary file so concurrent runs never see partial
+        # fixtures
+        pathTemp = "%s.%d.%d.tmp" % (path, os.getpid(),
+                                     threading.current_thread().ident)
+        try:
+            with open(pathTemp, 'wb') as handle:
+                status = subprocess.call(command,
+                                         stdout=handle,
+                                         close_fds=True,
+                                         shell=True)
+            if status != 0:
+                raise Exception("Fixture command failed (%i): %s" %
+                                (status, command))
+            os.chmod(pathTemp, 0444)
+            os.rename(pathTemp, path)
+        finally:
+            if os.path.isfile(pathTemp):
+                os.remove(pathTemp)
+
+    def evict(self):
+        """
+        Remove least recently used fixtures until the cache fits its
+        maximum size. Fixtures used by the current run are kept.
+        """
+        with self.lock:
+
+            # Fixtures referenced by the loaded cases have their path (and
+            # hash) set; unreferenced fixtures are never hashed
+            keep = set(fixture.path for fixture in self.fixtures.values()
+                       if fixture.path is not None)
+            entries = []
+            size = 0
+            for filename in os.listdir(self.directory):
+                path = os.path.join(self.directory, filename)
+                if filename.endswith(".tmp") or not os.path.isfile(path):
+                    continue
+                stat = os.stat(path)
+                size += stat.st_size
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            entries.sort()
+            for mtime, entrySize, path in entries:
+                if size <= self.sizeMb * 1024 * 1024:
+                    break
+                if path in keep:
+                    continue
+                os.remove(path)
+                size -= entrySize
+
+class Workspace:
+    """
+    An isolated working directory for a test case built from a template
+    directory tree. Files are reflinked (copy-on-write clones) where the
+    file system supports it and copied otherwise. Hardlinking is only used
+    when requested: hardlinked files share their data with the template, so
+    an executable modifying them in place modifies the template.
+    """
+
+    # ========================================
+    # MODES
+    # ========================================
+    MODE_AUTO="auto"
+    MODE_REFLINK="reflink"
+    MODE_HARDLINK="hardlink"
+    MODE_COPY="copy"
+    MODES=[MODE_AUTO, MODE_REFLINK, MODE_HARDLINK, MODE_COPY]
+
+    # ========================================
+    # KEEP POLICIES
+    # ========================================
+    KEEP_NEVER="never"
+    KEEP_FAILURE="failure"
+    KEEP_ALWAYS="always"
+    KEEPS=[KEEP_NEVER, KEEP_FAILURE, KEEP_ALWAYS]
+
+    # Linux FICLONE ioctl request
+    FICLONE=0x40049409
+
+    # Workspaces of this run are created under <root>/<RUN>
+    RUN="%s-%d" % (time.strftime('%Y%m%d_%H%M%S', time.localtime()),
+                   os.getpid())
+
+    # Counter used to give each workspace a unique name
+    counter = itertools.count(1)
+
+    # True once the fallback of auto mode to copying has been logged
+    fallbackWarned = False
+
+    def __init__(self, template, root, name, mode=MODE_AUTO):
+        """
+        :param template: Template directory
+        :param root: Directory to create the workspace in
+        :param name: Workspace name
+        :param mode: How files are populated (one of MODES)
+        """
+        self.template = template
+        self.root = os.path.abspath(root)
+        self.name = name
+        self.path = os.path.join(self.root, Workspace.RUN,
+                                 "%s-%d" % (name, next(Workspace.counter)))
+        self.mode = mode
+
+    def getPath(self):
+        return self.path
+
+    def getPattern(self):
+        """
+        :returns: Workspace path with <run> and <n> in place of the run and
+                  workspace numbers, which differ from run to run
+        """
+        return os.path.join(self.root, "<run>", "%s-<n>" % self.name)
+
+    def getTemplate(self):
+        return self.template
+
+    def create(self):
+        """
+        Create the workspace from its template
+        :returns: Mode used for the last file populated
+        """
+        mode = self.mode
+        if mode == Workspace.MODE_AUTO:
+            mode = Workspace.MODE_REFLINK
+
+        # Remove a workspace kept from a previous run of the case
+        self.remove()
+
+        os.makedirs(self.path)
+        for srcDir, dirNames, fileNames in os.walk(self.template):
+            dstDir = os.path.join(self.path,
+                                  os.path.relpath(srcDir, self.template))
+            for dirName in list(dirNames):
+                srcPath = os.path.join(srcDir, dirName)
+                dstPath = os.path.join(dstDir, dirName)
+                if os.path.islink(srcPath):
+                    os.symlink(os.readlink(srcPath), dstPath)
+                    dirNames.remove(dirName)
+                else:
+                    os.mkdir(dstPath)
+            for fileName in fileNames:
+                srcPath = os.path.join(srcDir, fileName)
+                dstPath = os.path.join(dstDir, fileName)
+                if os.path.islink(srcPath):
+                    os.symlink(os.readlink(srcPath), dstPath)
+                else:
+                    mode = self.populate(srcPath, dstPath, mode)
+        return mode
+
+    def populate(self, srcPath, dstPath, mode):
+        """
+        Populate a workspace file, falling back to the next mode when the
+        requested one is not supported
+        :param srcPath: Template file
+        :param dstPath: Workspace file
+        :param mode: Requested mode
+        :returns: Mode used (to request for the next file)
+        """
+        if mode == Workspace.MODE_REFLINK:
+            try:
+                with open(srcPath, 'rb') as src:
+                    with open(dstPath, 'wb') as dst:
+                        fcntl.ioctl(dst.fileno(), Workspace.FICLONE,
+                                    src.fileno())
+                shutil.copymode(srcPath, dstPath)
+                return mode
+            except (IOError, OSError):
+                if os.path.exists(dstPath):
+                    os.remove(dstPath)
+                if self.mode != Workspace.MODE_AUTO:
+                    raise
+                mode = Workspace.MODE_COPY
+
+        if mode == Workspace.MODE_HARDLINK:
+            os.link(srcPath, dstPath)
+            return mode
+
+        shutil.copy2(srcPath, dstPath)
+        return mode
+
+    def remove(self):
+        """
+        Remove the workspace
+        """
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+
 class TestBedInterpolator:
     """
     Interpolates for testbed interpolants
@@ -272,8 +1260,61 @@ class TestBedInterpolator:
     outdir=os.getcwd()
     outsubdir=""
 
+    # Names of the interpolation methods sorted by order (built on first use)
+    methodNames=None
+
     def __init__(self):
-        pass
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the fixtures, workspace and case output directories of the
+        previously loaded configuration
+        """
+        self.fixtureCache = None
+        self.fixturesUsed = []
+        self.workspace = None
+        self.caseOutdirs = {}
+        self.readOnly = False
+
+    def setFixtureCache(self, fixtureCache):
+        """
+        :param fixtureCache: FixtureCache to resolve $(fixture:name) with
+        """
+        self.fixtureCache = fixtureCache
+
+    def setReadOnly(self, readOnly):
+        """
+        :param readOnly: If True $(fixture:name) is resolved without hashing
+                         the fixture inputs and $(workspace) to the pattern
+                         of the workspace path
+        """
+        self.readOnly = readOnly
+
+    def isReadOnly(self):
+        return self.readOnly
+
+    def getFixturesUsed(self):
+        """
+        :returns: Fixtures referenced since the last call to resetFixturesUsed
+        """
+        return self.fixturesUsed
+
+    def resetFixturesUsed(self):
+        self.fixturesUsed = []
+
+    def setWorkspace(self, workspace):
+        """
+        :param workspace: Case workspace directory or None
+        """
+        self.workspace = workspace
+
+    def setCaseOutdirs(self, caseOutdirs):
+        """
+        :param caseOutdirs: Map of case name to its output directory (None
+                            if the name is used by more than one case)
+        """
+        self.caseOutdirs = caseOutdirs
 
     def setOutdir(self, outdir):
         """
@@ -318,18 +1359,82 @@ class TestBedInterpolator:
         value = self.outsubdir
         return expression.replace(pattern,value)
 
+    @assignOrder(4)
+    def interpolateFixture(self, expression):
+        """
+        Interpolate for fixture string $(fixture:name) with the path of the
+        cached fixture file. The fixture is generated before the case runs.
+        :param expression: Source expression to search and replace for fixtures
+        """
+        if "$(fixture:" not in expression:
+            return expression
+
+        def replace(match):
+            if self.fixtureCache is None:
+                raise Exception("No fixtures declared: %s" % match.group(1))
+            fixture = self.fixtureCache.getFixture(match.group(1))
+            if fixture not in self.fixturesUsed:
+                self.fixturesUsed.append(fixture)
+            return fixture.getPath(not self.readOnly)
+
+        return re.sub(r"\$\(fixture:([^)]+)\)", replace, expression)
+
+    @assignOrder(5)
+    def interpolateWorkspace(self, expression):
+        """
+        Interpolate for workspace string $(workspace) with the case's
+        workspace directory
+        :param expression: Source expression to search and replace for workspace
+        """
+        pattern = "$(workspace)"
+        if pattern not in expression:
+            return expression
+        if self.workspace is None:
+            raise Exception("$(workspace) used by a case without WORKSPACE")
+        return expression.replace(pattern, self.workspace)
+
+    @assignOrder(6)
+    def interpolateCaseOutdir(self, expression):
+        """
+        Interpolate for case output directory string $(outdir:name) with the
+        output directory of the named case. Cases not created yet are left
+        for TestCaseGraph to resolve once all test sets are created.
+        :param expression: Source expression to search and replace for cases
+        """
+        if "$(outdir:" not in expression:
+            return expression
+
+        def replace(match):
+            if match.group(1) not in self.caseOutdirs:
+                return match.group(0)
+            if self.caseOutdirs[match.group(1)] is None:
+                raise Exception("Ambiguous case name: %s" % match.group(1))
+            return self.caseOutdirs[match.group(1)]
+
+        return re.sub(r"\$\(outdir:([^)]+)\)", replace, expression)
+
     def interpolate(self, expression):
         """
         Interpolate source expression with all TestBed patterns  
         :param expression: Source expression to search and replace with patterns
         """
 
+        tPhase = profiler.start()
+
         # get a list of fields that have the order set and sort them by order
-        methods = sorted( [ getattr(self, field) for field in dir(self) 
-                           if hasattr(getattr(self, field), "order") ],
-                           key = (lambda field: field.order) )
-        for method in methods:
-            expression = method(expression)
+        if TestBedInterpolator.methodNames is None:
+            TestBedInterpolator.methodNames = [
+                method.__name__ for method in
+                sorted( [ getattr(self, field) for field in dir(self) 
+                         if hasattr(getattr(self, field), "order") ],
+                         key = (lambda field: field.order) ) ]
+
+        # Every pattern starts with "$("
+        if "$(" in expression:
+            for methodName in TestBedInterpolator.methodNames:
+                expression = getattr(self, methodName)(expression)
+
+        profiler.stop(HarnessProfiler.PHASE_INTERPOLATE, tPhase)
         return expression
 
 class TestBedConfigParser():
@@ -366,6 +1471,13 @@ class TestBedConfigParser():
         """
         node = self.data[section]
         expression = node[option]
+        if isinstance(expression, dict):
+            return collections.OrderedDict(
+                (self.interpolator.interpolate(key),
+                 self.interpolator.interpolate(unicode(value)))
+                for key, value in expression.iteritems())
+        if not isinstance(expression, (basestring, list)):
+            return expression
         if (type(expression) is list):
             for i in range(len(expression)):
                 expression[i] = self.interpolator.interpolate(expression[i])
@@ -392,11 +1504,14 @@ class TestBedConfigParser():
         Read configuration file
         :param filename: Configuration filename
         """
+        tPhase = profiler.start()
         try:
             with open(filename, 'r') as f:
                 self.data = json.load(f, object_pairs_hook=collections.OrderedDict)
         except:
             raise Exception("Unable to read configuration file")
+        finally:
+            profiler.stop(HarnessProfiler.PHASE_PARSE, tPhase)
 
     def sections(self):
         """
@@ -405,522 +1520,4195 @@ class TestBedConfigParser():
         """
         return self.data.keys()
 
-class TestCase:
+class LogCompressor:
     """
-    Class that defines a Test Case
+    Streaming compressor for test case output. Output is compressed as it
+    is written and buffered until its compressed size reaches a threshold;
+    output that compresses to less is written plain. Supports gzip and,
+    when their modules are installed, zstd and lz4.
     """
 
     # ========================================
-    # SECTION: TEST
+    # CODECS
     # ========================================
-    SECTION_TEST="TEST"
-    PROP_TEST_DESCRIPTION="DESCRIPTION"
-    PROP_TEST_OUTSUBDIR="OUTSUBDIR"
-    PROP_TEST_LOGFILE="LOGFILE"
+    CODEC_NONE="none"
+    CODEC_GZIP="gzip"
+    CODEC_ZSTD="zstd"
+    CODEC_LZ4="lz4"
+    EXTENSIONS={CODEC_GZIP: ".gz",
+                CODEC_ZSTD: ".zst",
+                CODEC_LZ4: ".lz4"}
 
-    # ========================================
-    # SECTION: ARGUMENTS
-    # ========================================
-    SECTION_ARGS="ARGUMENTS"
+    # Size of chunks read from the child process and decompressed streams
+    CHUNK_SIZE=65536
+
+    # Uncompressed output (bytes) buffered while the compressed size is
+    # below the threshold; larger output is compressed regardless
+    BUFFER_MAX=1048576
+
+    # C library used to measure the CPU time spent compressing
+    libc = loadLibc()
 
-    def __init__(self, configFile, description, outsubdir, logfile, arguments):
+    def __init__(self, codec, threshold, openOutput):
         """
-        :param configFile: Test configuration file
-        :param description: Test case description
-        :param outsubdir: Output sub directory
-        :param logfile: Output log file
-        :param arguments: List of command line arguments
+        :param codec: Compression codec (one of EXTENSIONS)
+        :param threshold: Compressed output size (bytes) below which output
+                          stays plain
+        :param openOutput: Function called with the codec used (or None if
+                           plain) that returns the file handle to write to
         """
-        self.configFile = configFile
-        self.description = description
-        self.outsubdir = outsubdir
-        self.logfile = logfile
-        self.arguments = arguments
+        self.codec = codec
+        self.threshold = threshold
+        self.openOutput = openOutput
+        self.buffer = []
+        self.compressedBuffer = []
+        self.compressedSize = 0
+        self.compressor = LogCompressor.createCompressor(codec)
+        self.handle = None
+        self.bytesIn = 0
+        self.bytesOut = 0
+        self.cpuTime = 0.0
+
+    def getBytesIn(self):
+        return self.bytesIn
+
+    def getBytesOut(self):
+        return self.bytesOut
+
+    def getCodec(self):
+        """
+        :returns: Codec used or None if output was written plain
+        """
+        if self.handle is None or self.buffer is not None:
+            return None
+        return self.codec
 
-        # Initialize derived properties: logger, etc.
-        self.initialize()
+    def getCpuTime(self):
+        """
+        :returns: CPU time (seconds) of the writing thread spent compressing
+                  or None if thread CPU time is unavailable
+        """
+        return self.cpuTime
 
-    def getConfigFile(self):
+    def getRatio(self):
         """
-        Access case configuration file
-        :returns: TestCase configuration file
+        :returns: Uncompressed to compressed size ratio
         """
-        return self.configFile
+        if self.bytesOut == 0:
+            return 1.0
+        return float(self.bytesIn) / self.bytesOut
 
-    def initialize(self):
+    def writeOutput(self, data):
+        if len(data) > 0:
+            self.handle.write(data)
+            self.bytesOut += len(data)
+
+    def compress(self, data, flush=False):
+        """
+        :param data: Uncompressed data
+        :param flush: If True the compressor is flushed after the data
+        :returns: Compressed data
+        """
+        tStart = getThreadCpuTime(LogCompressor.libc)
+        data = self.compressor.compress(data)
+        if flush:
+            data += self.compressor.flush()
+        if tStart is None:
+            self.cpuTime = None
+        elif self.cpuTime is not None:
+            self.cpuTime += getThreadCpuTime(LogCompressor.libc) - tStart
+        return data
+
+    def startCompressed(self):
+        """
+        Open the compressed output and write the compressed buffer to it
+        """
+        self.handle = self.openOutput(self.codec)
+        self.writeOutput("".join(self.compressedBuffer))
+        self.buffer = None
+        self.compressedBuffer = None
+
+    def write(self, data):
+        """
+        Write uncompressed output
+        :param data: Output data
+        """
+        self.bytesIn += len(data)
+        compressed = self.compress(data)
+
+        if self.buffer is None:
+            self.writeOutput(compressed)
+            return
+
+        self.buffer.append(data)
+        self.compressedBuffer.append(compressed)
+        self.compressedSize += len(compressed)
+        if (self.compressedSize >= self.threshold or
+            self.bytesIn > LogCompressor.BUFFER_MAX):
+            self.startCompressed()
+
+    def close(self):
+        """
+        Flush remaining output. The output handle is flushed, not closed.
+        :returns: Output file handle
+        """
+        data = self.compress("", True)
+        if self.buffer is not None:
+            if self.compressedSize + len(data) < self.threshold:
+                self.handle = self.openOutput(None)
+                self.writeOutput("".join(self.buffer))
+                self.buffer = []
+                self.handle.flush()
+                return self.handle
+            self.startCompressed()
+        self.writeOutput(data)
+        self.handle.flush()
+        return self.handle
+
+    @staticmethod
+    def isAvailable(codec):
+        """
+        :param codec: Compression codec
+        :returns: True if the codec's module is installed
+        """
+        if codec == LogCompressor.CODEC_GZIP:
+            return True
+        if codec == LogCompressor.CODEC_ZSTD:
+            return zstandard is not None
+        if codec == LogCompressor.CODEC_LZ4:
+            return lz4frame is not None
+        return False
+
+    @staticmethod
+    def createCompressor(codec):
+        """
+        :param codec: Compression codec
+        :returns: Object with compress(data) and flush() methods
+        """
+        if codec == LogCompressor.CODEC_GZIP:
+            return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        if codec == LogCompressor.CODEC_ZSTD:
+            return zstandard.ZstdCompressor().compressobj()
+        if codec == LogCompressor.CODEC_LZ4:
+            return LZ4Compressor()
+        raise Exception("Unsupported log compression: %s" % codec)
+
+    @staticmethod
+    def createDecompressor(codec):
+        """
+        :param codec: Compression codec
+        :returns: Object with a decompress(data) method
+        """
+        if codec == LogCompressor.CODEC_GZIP:
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if codec == LogCompressor.CODEC_ZSTD:
+            return zstandard.ZstdDecompressor().decompressobj()
+        if codec == LogCompressor.CODEC_LZ4:
+            return lz4frame.LZ4FrameDecompressor()
+        raise Exception("Unsupported log compression: %s" % codec)
+
+    @staticmethod
+    def decompressChunks(codec, chunks):
+        """
+        Decompress a stream of chunks
+        :param codec: Compression codec or None if the stream is plain
+        :param chunks: Iterable of compressed chunks
+        :returns: Generator of decompressed chunks
+        """
+        if codec is None:
+            for chunk in chunks:
+                yield chunk
+            return
+        decompressor = LogCompressor.createDecompressor(codec)
+        for chunk in chunks:
+            yield decompressor.decompress(chunk)
+
+    @staticmethod
+    def readLog(filename):
+        """
+        Stream a test case log file, decompressing it according to its
+        extension
+        :param filename: Log file path
+        :returns: Generator of decompressed chunks
+        """
+        codec = None
+        for name, extension in LogCompressor.EXTENSIONS.iteritems():
+            if filename.endswith(extension):
+                codec = name
+        with open(filename, 'rb') as handle:
+            chunks = iter(lambda: handle.read(LogCompressor.CHUNK_SIZE), "")
+            for chunk in LogCompressor.decompressChunks(codec, chunks):
+                yield chunk
+
+class LZ4Compressor:
+    """
+    Adapts the lz4 frame compressor to the compress()/flush() interface
+    """
+
+    def __init__(self):
+        self.compressor = lz4frame.LZ4FrameCompressor()
+        self.header = self.compressor.begin()
+
+    def compress(self, data):
+        data = self.header + self.compressor.compress(data)
+        self.header = ""
+        return data
+
+    def flush(self):
+        return self.header + self.compressor.flush()
+
+class TestCaseArchive:
+    """
+    Packed archive of test case output. Instead of one log file per case
+    the output of every case is appended to a small number of segment
+    files. A journal records the location (segment, offset, length) of
+    each case and, when the archive is closed, a hashed index is built
+    from the journal so a single case can be read back in constant time.
+    """
+
+    # ========================================
+    # FILES
+    # ========================================
+    JOURNAL_FILE="journal.txt"
+    INDEX_FILE="index.dat"
+    SEGMENT_FILE="segment-%04d.dat"
+
+    # ========================================
+    # INDEX FORMAT
+    # ========================================
+    INDEX_MAGIC="CLTBIDX1"
+    INDEX_HEADER=struct.Struct("<8sQQ")
+    INDEX_SLOT=struct.Struct("<QQ")
+
+    # Segment files are rotated once they exceed this size (bytes)
+    SEGMENT_SIZE_MAX=256*1024*1024
+
+    # Open archives shared by all test sets
+    archives = {}
+    archivesLock = threading.Lock()
+
+    def __init__(self, path):
+        """
+        :param path: Archive directory
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.segmentsFree = []
+        self.segmentsCount = 0
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        # Continue numbering after any existing segments
+        while os.path.isfile(self.getSegmentPath(self.segmentsCount)):
+            self.segmentsCount += 1
+
+        self.journal = open(os.path.join(self.path,
+                                         TestCaseArchive.JOURNAL_FILE), 'ab')
+
+    def getPath(self):
+        return self.path
+
+    def getSegmentPath(self, segment):
+        """
+        :param segment: Segment number
+        :returns: Segment file path
+        """
+        return os.path.join(self.path, TestCaseArchive.SEGMENT_FILE % segment)
+
+    def acquireSegment(self):
+        """
+        Acquire exclusive use of a segment to append a case's output to.
+        A new segment is created if all open segments are in use or full.
+        :returns: (segment number, segment file handle opened for append)
+        """
+        with self.lock:
+            while len(self.segmentsFree) > 0:
+                segment, handle = self.segmentsFree.pop()
+                if os.fstat(handle.fileno()).st_size < self.SEGMENT_SIZE_MAX:
+                    return (segment, handle)
+                handle.close()
+            segment = self.segmentsCount
+            self.segmentsCount += 1
+        return (segment, open(self.getSegmentPath(segment), 'ab'))
+
+    def releaseSegment(self, segment, handle):
+        """
+        Return a segment acquired with acquireSegment()
+        :param segment: Segment number
+        :param handle: Segment file handle
+        """
+        handle.flush()
+        with self.lock:
+            self.segmentsFree.append((segment, handle))
+
+    def record(self, caseId, segment, offset, length, codec=None):
+        """
+        Record the location of a case's output in the journal
+        :param caseId: Case identifier
+        :param segment: Segment number
+        :param offset: Byte offset of the output in the segment
+        :param length: Byte length of the output
+        :param codec: Compression codec of the output or None if plain
+        """
+        line = "%s\t%d\t%d\t%d\t%s\n" % (caseId, segment, offset, length,
+                                          codec or "")
+        with self.lock:
+            self.journal.write(line)
+            self.journal.flush()
+
+    def close(self):
+        """
+        Close open segments and build the archive index
+        """
+        with self.lock:
+            for segment, handle in self.segmentsFree:
+                handle.close()
+            self.segmentsFree = []
+            self.journal.close()
+        TestCaseArchive.buildIndex(self.path)
+
+    @staticmethod
+    def open(path):
+        """
+        Open an archive shared by every test set that writes to it
+        :param path: Archive directory
+        """
+        path = os.path.normpath(path)
+        with TestCaseArchive.archivesLock:
+            archive = TestCaseArchive.archives.get(path)
+            if archive is None:
+                archive = TestCaseArchive(path)
+                TestCaseArchive.archives[path] = archive
+        return archive
+
+    @staticmethod
+    def closeAll():
+        """
+        Close every archive opened with open()
+        """
+        with TestCaseArchive.archivesLock:
+            archives = TestCaseArchive.archives.values()
+            TestCaseArchive.archives = {}
+        for archive in archives:
+            archive.close()
+
+    @staticmethod
+    def hashCaseId(caseId):
+        """
+        :param caseId: Case identifier
+        :returns: 64-bit hash of the case identifier (never zero)
+        """
+        value = struct.unpack("<Q", hashlib.md5(caseId).digest()[:8])[0]
+        return value or 1
+
+    @staticmethod
+    def parseJournalLine(line):
+        """
+        :param line: Journal line
+        :returns: (caseId, segment, offset, length, codec)
+        """
+        fields = line.rstrip("\n").split("\t")
+        codec = None
+        if len(fields) > 4 and len(fields[4]) > 0:
+            codec = fields[4]
+        return (fields[0], int(fields[1]), int(fields[2]), int(fields[3]),
+                codec)
+
+    @staticmethod
+    def buildIndex(path):
+        """
+        Build the hashed index of an archive from its journal. Each slot
+        holds the hash of a case identifier and the offset of its latest
+        journal entry. Slots are probed linearly.
+        :param path: Archive directory
+        """
+        journalPath = os.path.join(path, TestCaseArchive.JOURNAL_FILE)
+
+        entries = collections.OrderedDict()
+        offset = 0
+        with open(journalPath, 'rb') as journal:
+            for line in journal:
+                if line.endswith("\n"):
+                    caseId = line.split("\t", 1)[0]
+                    entries[caseId] = offset
+                offset += len(line)
+
+        numSlots = max(8, 2 * len(entries))
+        slots = [(0, 0)] * numSlots
+        for caseId, entryOffset in entries.iteritems():
+            slot = TestCaseArchive.hashCaseId(caseId) % numSlots
+            while slots[slot][0] != 0:
+                slot = (slot + 1) % numSlots
+            # Journal offsets are stored plus one so zero marks an empty slot
+            slots[slot] = (TestCaseArchive.hashCaseId(caseId), entryOffset + 1)
+
+        indexPath = os.path.join(path, TestCaseArchive.INDEX_FILE)
+        with open(indexPath + ".tmp", 'wb') as index:
+            index.write(TestCaseArchive.INDEX_HEADER.pack(
+                TestCaseArchive.INDEX_MAGIC, numSlots, offset))
+            for slot in slots:
+                index.write(TestCaseArchive.INDEX_SLOT.pack(*slot))
+        os.rename(indexPath + ".tmp", indexPath)
+
+    @staticmethod
+    def lookup(path, caseId):
+        """
+        Find the location of a case's output
+        :param path: Archive directory
+        :param caseId: Case identifier
+        :returns: (caseId, segment, offset, length, codec) or None
+        """
+        journalPath = os.path.join(path, TestCaseArchive.JOURNAL_FILE)
+        indexPath = os.path.join(path, TestCaseArchive.INDEX_FILE)
+
+        with open(journalPath, 'rb') as journal:
+
+            # Journal entries written after the index was built (e.g. an
+            # interrupted run) are scanned, latest entry wins
+            indexed = 0
+            entry = None
+            if os.path.isfile(indexPath):
+                with open(indexPath, 'rb') as index:
+                    entry, indexed = TestCaseArchive.lookupIndex(index,
+                                                                 journal,
+                                                                 caseId)
+            journal.seek(indexed)
+            for line in journal:
+                if line.startswith(caseId + "\t") and line.endswith("\n"):
+                    entry = TestCaseArchive.parseJournalLine(line)
+
+        return entry
+
+    @staticmethod
+    def lookupIndex(index, journal, caseId):
+        """
+        Find the journal entry of a case using the hashed index
+        :param index: Index file handle
+        :param journal: Journal file handle
+        :param caseId: Case identifier
+        :returns: (journal entry or None, journal size covered by the index)
+        """
+        header = index.read(TestCaseArchive.INDEX_HEADER.size)
+        magic, numSlots, indexed = TestCaseArchive.INDEX_HEADER.unpack(header)
+        if magic != TestCaseArchive.INDEX_MAGIC:
+            raise Exception("Invalid archive index: %s" % index.name)
+
+        data = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            value = TestCaseArchive.hashCaseId(caseId)
+            slot = value % numSlots
+            for probe in xrange(numSlots):
+                position = (TestCaseArchive.INDEX_HEADER.size +
+                            slot * TestCaseArchive.INDEX_SLOT.size)
+                slotHash, entryOffset = TestCaseArchive.INDEX_SLOT.unpack_from(
+                    data, position)
+                if slotHash == 0:
+                    break
+                if slotHash == value:
+                    journal.seek(entryOffset - 1)
+                    entry = TestCaseArchive.parseJournalLine(journal.readline())
+                    if entry[0] == caseId:
+                        return (entry, indexed)
+                slot = (slot + 1) % numSlots
+        finally:
+            data.close()
+
+        return (None, indexed)
+
+    @staticmethod
+    def listCases(path):
+        """
+        :param path: Archive directory
+        :returns: Case identifiers in the archive in the order written
+        """
+        journalPath = os.path.join(path, TestCaseArchive.JOURNAL_FILE)
+        caseIds = collections.OrderedDict()
+        with open(journalPath, 'rb') as journal:
+            for line in journal:
+                if line.endswith("\n"):
+                    caseIds[line.split("\t", 1)[0]] = True
+        return caseIds.keys()
+
+    @staticmethod
+    def read(path, caseId):
+        """
+        Stream a case's output from an archive, decompressing it if needed
+        :param path: Archive directory
+        :param caseId: Case identifier
+        :returns: Generator of case output chunks
+        """
+        entry = TestCaseArchive.lookup(path, caseId)
+        if entry is None:
+            raise Exception("Case not found in archive: %s" % caseId)
+
+        caseId, segment, offset, length, codec = entry
+        if length == 0:
+            return
+
+        segmentPath = os.path.join(path, TestCaseArchive.SEGMENT_FILE % segment)
+        with open(segmentPath, 'rb') as handle:
+            data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                chunks = (data[position:min(position + LogCompressor.CHUNK_SIZE,
+                                            offset + length)]
+                          for position in xrange(offset,
+                                                 offset + length,
+                                                 LogCompressor.CHUNK_SIZE))
+                for chunk in LogCompressor.decompressChunks(codec, chunks):
+                    yield chunk
+            finally:
+                data.close()
+
+class TestRunHistory:
+    """
+    Local SQLite store of runs and case results. A result records the
+    case's set, configuration file, command fingerprint, status, wall and
+    CPU time, peak RSS and a hash of the executable. Results are buffered
+    and written in batches, each in one transaction, so recording does not
+    slow the run down. The store answers trend queries over recent runs:
+    per-case durations, flaky cases and the cases slowing down the most.
+    """
+
+    # Results buffered before they are written
+    BATCH_SIZE=1000
+
+    # Seconds after which buffered results are written regardless
+    BATCH_SECONDS=5.0
+
+    # Number of recent runs predictions are made from
+    PREDICT_RUNS=10
+
+    SCHEMA=("CREATE TABLE IF NOT EXISTS runs ("
+            "  id INTEGER PRIMARY KEY,"
+            "  config TEXT,"
+            "  host TEXT,"
+            "  started REAL,"
+            "  finished REAL,"
+            "  num_tests INTEGER,"
+            "  num_fail INTEGER);"
+            "CREATE TABLE IF NOT EXISTS results ("
+            "  run_id INTEGER,"
+            "  set_name TEXT,"
+            "  case_file TEXT,"
+            "  case_name TEXT,"
+            "  fingerprint TEXT,"
+            "  status INTEGER,"
+            "  passed INTEGER,"
+            "  wall_seconds REAL,"
+            "  cpu_seconds REAL,"
+            "  peak_rss_kb INTEGER,"
+            "  executable_hash TEXT);"
+            "CREATE INDEX IF NOT EXISTS results_case "
+            "  ON results (case_file, set_name, run_id);"
+            "CREATE INDEX IF NOT EXISTS results_name "
+            "  ON results (case_name, run_id);"
+            "CREATE INDEX IF NOT EXISTS results_run "
+            "  ON results (run_id);")
+
+    def __init__(self, path, readOnly=False):
+        """
+        :param path: Database file (created if missing unless read-only)
+        :param readOnly: If True the database is only queried: it must
+                         exist and is opened read-only without changing its
+                         journal mode or schema
+        """
+        if sqlite3 is None:
+            raise Exception("Run history requires the sqlite3 module")
+        self.path = path
+        self.lock = threading.Lock()
+        if readOnly:
+            if not os.path.isfile(path):
+                raise Exception("Run history database not found: %s" % path)
+            self.connection = TestRunHistory.connectReadOnly(path)
+        else:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(TestRunHistory.SCHEMA)
+        self.runId = None
+        self.pending = []
+        self.flushed = time.time()
+        self.executableHashes = {}
+        self.predictions = None
+
+    @staticmethod
+    def connectReadOnly(path):
+        """
+        Open a database read-only
+        :param path: Database file
+        :returns: Connection
+        """
+        uri = "file:%s?mode=ro" % urllib.pathname2url(os.path.abspath(path))
+        try:
+            return sqlite3.connect(uri, uri=True, check_same_thread=False)
+        except TypeError:
+            pass
+
+        # Python 2 passes the name to SQLite as is: it is opened as a URI
+        # if SQLite is built to accept URIs, otherwise writes are refused
+        # on a regular connection
+        options = [row[0] for row in sqlite3.connect(":memory:").execute(
+            "PRAGMA compile_options")]
+        if "USE_URI" in options:
+            return sqlite3.connect(uri, check_same_thread=False)
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.execute("PRAGMA query_only=ON")
+        return connection
+
+    def getPath(self):
+        return self.path
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.connection.close()
+
+    def beginRun(self, configFile):
+        """
+        Start recording a run
+        :param configFile: Configuration file
+        """
+        with self.lock:
+            with self.connection:
+                cursor = self.connection.execute(
+                    "INSERT INTO runs (config, host, started) VALUES (?, ?, ?)",
+                    (os.path.abspath(configFile), platform.node(),
+                     time.time()))
+            self.runId = cursor.lastrowid
+
+    def endRun(self, numFail):
+        """
+        Write the buffered results and complete the run
+        :param numFail: Number of failed tests
+        """
+        self.flush()
+        with self.lock:
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE runs SET finished = ?, num_fail = ?, num_tests = "
+                    "(SELECT COUNT(*) FROM results WHERE run_id = ?) "
+                    "WHERE id = ?",
+                    (time.time(), numFail, self.runId, self.runId))
+            self.runId = None
+
+    def getExecutableHash(self, testset):
+        """
+        :param testset: Test set
+        :returns: Hash of the set executable or None if not found
+        """
+        path = testset.findExecutable()
+        if path is None:
+            return None
+        try:
+            status = os.stat(path)
+        except OSError:
+            return None
+        key = (path, status.st_mtime, status.st_size)
+        if key not in self.executableHashes:
+            digest = hashlib.sha1()
+            with open(path, 'rb') as handle:
+                for chunk in iter(lambda: handle.read(1024 * 1024), ""):
+                    digest.update(chunk)
+            self.executableHashes[key] = digest.hexdigest()[:16]
+        return self.executableHashes[key]
+
+    @staticmethod
+    def getFingerprint(command):
+        """
+        :param command: Command line as a list of arguments
+        :returns: Hash of the command line
+        """
+        return hashlib.sha1("\0".join(
+            argument.encode("utf-8") if isinstance(argument, unicode)
+            else str(argument) for argument in command)).hexdigest()[:16]
+
+    def record(self, testset, case, status, passed):
+        """
+        Record the result of a case run
+        :param testset: Test set
+        :param case: Test case
+        :param status: Return status (None if the case could not be run)
+        :param passed: True if the case passed
+        """
+        row = (self.runId,
+               testset.name,
+               os.path.normpath(case.getConfigFile()),
+               case.getName(),
+               TestRunHistory.getFingerprint(
+                   case.getCommand(testset.executable)),
+               status,
+               1 if passed else 0,
+               case.getElapsed(),
+               case.getCpuTime(),
+               case.getPeakRss(),
+               self.getExecutableHash(testset))
+
+        with self.lock:
+            self.pending.append(row)
+            flush = (len(self.pending) >= TestRunHistory.BATCH_SIZE or
+                     time.time() - self.flushed >= TestRunHistory.BATCH_SECONDS)
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered results in one transaction
+        """
+        with self.lock:
+            if len(self.pending) > 0:
+                with self.connection:
+                    self.connection.executemany(
+                        "INSERT INTO results VALUES "
+                        "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        self.pending)
+                self.pending = []
+            self.flushed = time.time()
+
+    def getFirstRun(self, last):
+        """
+        :param last: Number of recent runs
+        :returns: Id of the oldest of the recent runs (0 if none)
+        """
+        row = self.connection.execute(
+            "SELECT MIN(id) FROM "
+            "(SELECT id FROM runs ORDER BY id DESC LIMIT ?)",
+            (last,)).fetchone()
+        return row[0] or 0
+
+    def predict(self, setName, configFile):
+        """
+        :param setName: Test set name
+        :param configFile: Case configuration file
+        :returns: Mean run time (seconds) of the case's recent passed runs
+                  or None if it never passed
+        """
+        if self.predictions is None:
+            self.predictions = {}
+            for name, caseFile, seconds in self.connection.execute(
+                    "SELECT set_name, case_file, AVG(wall_seconds) "
+                    "FROM results WHERE run_id >= ? AND passed = 1 "
+                    "GROUP BY case_file, set_name",
+                    (self.getFirstRun(TestRunHistory.PREDICT_RUNS),)):
+                self.predictions[(name, caseFile)] = seconds
+        return self.predictions.get((setName, os.path.normpath(configFile)))
+
+    def getRuns(self, firstRun):
+        """
+        :param firstRun: Oldest run id
+        :returns: (id, started, finished, config, tests, failed) of the runs
+        """
+        return self.connection.execute(
+            "SELECT id, started, finished, config, num_tests, num_fail "
+            "FROM runs WHERE id >= ? ORDER BY id", (firstRun,)).fetchall()
+
+    def getSlowestGrowing(self, firstRun, top):
+        """
+        Cases whose passed run time grows the most, by the slope of the
+        least squares line through their run times
+        :param firstRun: Oldest run id
+        :param top: Maximum number of cases
+        :returns: (set, case file, runs, mean, slope seconds per run, latest)
+        """
+        rows = self.connection.execute(
+            "SELECT set_name, case_file, COUNT(*), AVG(wall_seconds), "
+            "  (COUNT(*) * SUM(run_id * wall_seconds) - "
+            "   SUM(run_id) * SUM(wall_seconds)) / "
+            "  (COUNT(*) * SUM(run_id * run_id) - "
+            "   SUM(run_id) * SUM(run_id)) AS slope "
+            "FROM results "
+            "WHERE run_id >= ? AND passed = 1 AND wall_seconds IS NOT NULL "
+            "GROUP BY case_file, set_name "
+            "HAVING COUNT(*) > 1 AND slope > 0 "
+            "ORDER BY slope DESC LIMIT ?", (firstRun, top)).fetchall()
+
+        result = []
+        for setName, caseFile, runs, mean, slope in rows:
+            latest = self.connection.execute(
+                "SELECT wall_seconds FROM results "
+                "WHERE case_file = ? AND set_name = ? AND passed = 1 "
+                "ORDER BY run_id DESC LIMIT 1",
+                (caseFile, setName)).fetchone()[0]
+            result.append((setName, caseFile, runs, mean, slope, latest))
+        return result
+
+    def getFlaky(self, firstRun, top):
+        """
+        Cases whose return status changes across runs
+        :param firstRun: Oldest run id
+        :param top: Maximum number of cases
+        :returns: (set, case file, runs, statuses, status changes) ordered by
+                  the number of status changes
+        """
+        candidates = self.connection.execute(
+            "SELECT set_name, case_file, COUNT(*) FROM results "
+            "WHERE run_id >= ? "
+            "GROUP BY case_file, set_name "
+            "HAVING COUNT(DISTINCT IFNULL(status, 'none')) > 1",
+            (firstRun,)).fetchall()
+
+        result = []
+        for setName, caseFile, runs in candidates:
+            statuses = [row[0] for row in self.connection.execute(
+                "SELECT status FROM results "
+                "WHERE case_file = ? AND set_name = ? AND run_id >= ? "
+                "ORDER BY run_id", (caseFile, setName, firstRun))]
+            changes = len([index for index in range(1, len(statuses))
+                           if statuses[index] != statuses[index - 1]])
+            result.append((setName, caseFile, runs,
+                           ",".join(str(status) for status in
+                                    sorted(set(statuses))),
+                           changes))
+        result.sort(key=lambda row: row[4], reverse=True)
+        return result[:top]
+
+    def getTrend(self, firstRun, case):
+        """
+        Results of a case in each run
+        :param firstRun: Oldest run id
+        :param case: Case configuration file or name
+        :returns: (run, started, set, case file, status, wall, CPU, peak RSS,
+                  executable hash) ordered by case and run
+        """
+        return self.connection.execute(
+            "SELECT results.run_id, runs.started, set_name, case_file, "
+            "  status, wall_seconds, cpu_seconds, peak_rss_kb, "
+            "  executable_hash "
+            "FROM results JOIN runs ON runs.id = results.run_id "
+            "WHERE results.run_id >= ? AND "
+            "  (case_file = ? OR case_name = ?) "
+            "ORDER BY case_file, set_name, results.run_id",
+            (firstRun, os.path.normpath(case), case)).fetchall()
+
+    @staticmethod
+    def formatTime(seconds):
+        if seconds is None:
+            return "-"
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(seconds))
+
+    @staticmethod
+    def formatSeconds(seconds):
+        if seconds is None:
+            return "-"
+        return "%.3f" % seconds
+
+    @staticmethod
+    def formatCase(setName, caseFile):
+        name = "%s: %s" % (setName, caseFile)
+        if len(name) > 50:
+            name = "..." + name[-47:]
+        return name
+
+    def report(self, stream=None, case=None, last=30, top=10):
+        """
+        Print the run history report
+        :param stream: Output stream (default stdout)
+        :param case: Optional case configuration file or name to report the
+                     per-run results of
+        :param last: Number of recent runs to report on
+        :param top: Maximum number of cases per table
+        """
+        if stream is None:
+            stream = sys.stdout
+
+        firstRun = self.getFirstRun(last)
+
+        if case is not None:
+            stream.write("CASE TREND\n")
+            stream.write("%6s %-19s %6s %9s %9s %9s %16s  %s\n" %
+                         ("RUN", "STARTED", "STATUS", "WALL (s)", "CPU (s)",
+                          "RSS (KB)", "EXECUTABLE", "CASE"))
+            for (runId, started, setName, caseFile, status, wall, cpu, rss,
+                 exeHash) in self.getTrend(firstRun, case):
+                stream.write("%6d %-19s %6s %9s %9s %9s %16s  %s\n" %
+                             (runId,
+                              TestRunHistory.formatTime(started),
+                              status,
+                              TestRunHistory.formatSeconds(wall),
+                              TestRunHistory.formatSeconds(cpu),
+                              rss if rss is not None else "-",
+                              exeHash or "-",
+                              TestRunHistory.formatCase(setName, caseFile)))
+            return
+
+        stream.write("RUNS (last %d)\n" % last)
+        stream.write("%6s %-19s %11s %8s %8s  %s\n" %
+                     ("RUN", "STARTED", "WALL (s)", "TESTS", "FAILED",
+                      "CONFIG"))
+        for runId, started, finished, config, numTests, numFail in \
+                self.getRuns(firstRun):
+            stream.write("%6d %-19s %11s %8s %8s  %s\n" %
+                         (runId,
+                          TestRunHistory.formatTime(started),
+                          TestRunHistory.formatSeconds(
+                              finished - started if finished else None),
+                          numTests if numTests is not None else "-",
+                          numFail if numFail is not None else "-",
+                          config))
+
+        stream.write("\nSLOWEST GROWING CASES\n")
+        stream.write("%-50s %6s %11s %11s %14s\n" %
+                     ("CASE", "RUNS", "MEAN (s)", "LATEST (s)",
+                      "GROWTH (s/run)"))
+        for setName, caseFile, runs, mean, slope, latest in \
+                self.getSlowestGrowing(firstRun, top):
+            stream.write("%-50s %6d %11.3f %11.3f %14.4f\n" %
+                         (TestRunHistory.formatCase(setName, caseFile),
+                          runs, mean, latest, slope))
+
+        stream.write("\nFLAKY CASES\n")
+        stream.write("%-50s %6s %8s  %s\n" %
+                     ("CASE", "RUNS", "CHANGES", "STATUSES"))
+        for setName, caseFile, runs, statuses, changes in \
+                self.getFlaky(firstRun, top):
+            stream.write("%-50s %6d %8d  %s\n" %
+                         (TestRunHistory.formatCase(setName, caseFile),
+                          runs, changes, statuses))
+
+class TestCase:
+    """
+    Class that defines a Test Case
+    """
+
+    # ========================================
+    # SECTION: TEST
+    # ========================================
+    SECTION_TEST="TEST"
+    PROP_TEST_DESCRIPTION="DESCRIPTION"
+    PROP_TEST_OUTSUBDIR="OUTSUBDIR"
+    PROP_TEST_LOGFILE="LOGFILE"
+    PROP_TEST_CPUS="CPUS"
+    PROP_TEST_MEMORY="MEMORY_MB"
+    PROP_TEST_STDIN="STDIN"
+    PROP_TEST_WORKSPACE="WORKSPACE"
+    PROP_TEST_NAME="NAME"
+    PROP_TEST_DEPENDS_ON="DEPENDS_ON"
+
+    # ========================================
+    # SECTION: ARGUMENTS
+    # ========================================
+    SECTION_ARGS="ARGUMENTS"
+
+    # Console logger of cases not run by a Test Set
+    LOGGER=ApplicationProperties.name() + ".testcase"
+
+    def __init__(self, configFile, description, outsubdir, logfile, arguments,
+                 cpus=1, memoryMb=0, stdin=None, fixtures=None,
+                 workspace=None, name=None, dependsOn=None, readOnly=False):
+        """
+        :param configFile: Test configuration file
+        :param description: Test case description
+        :param outsubdir: Output sub directory
+        :param logfile: Output log file
+        :param arguments: List of command line arguments
+        :param cpus: Number of CPUs used by the case
+        :param memoryMb: Memory (MB) used by the case
+        :param stdin: Optional file to use as the executable's standard input
+        :param fixtures: Fixtures referenced by the case
+        :param workspace: Optional Workspace to run the case in
+        :param name: Case name (default configuration file name without
+                     extension)
+        :param dependsOn: Names of cases that must pass before this one runs
+        :param readOnly: If True the case is only inspected (not run) and no
+                         logger is created
+        """
+        self.configFile = configFile
+        self.description = description
+        self.outsubdir = outsubdir
+        self.logfile = logfile
+        self.arguments = arguments
+        self.cpus = cpus
+        self.memoryMb = memoryMb
+        self.stdin = stdin
+        self.fixtures = fixtures or []
+        self.workspace = workspace
+        self.name = name
+        if self.name is None:
+            self.name = os.path.splitext(os.path.basename(configFile))[0]
+        self.dependsOn = dependsOn or []
+        self.dependencies = []
+        self.elapsed = None
+        self.cpuTime = None
+        self.peakRss = None
+        self.logger = None
+
+        # Initialize derived properties: logger, etc.
+        if not readOnly:
+            self.initialize()
+
+    def getConfigFile(self):
+        """
+        Access case configuration file
+        :returns: TestCase configuration file
+        """
+        return self.configFile
+
+    def getCpus(self):
+        return self.cpus
+
+    def getCpuTime(self):
+        """
+        :returns: CPU time (seconds) of the last run or None if unknown
+        """
+        return self.cpuTime
+
+    def getDependencies(self):
+        return self.dependencies
+
+    def getDependsOn(self):
+        return self.dependsOn
+
+    def getDescription(self):
+        return self.description
+
+    def getElapsed(self):
+        """
+        :returns: Wall time (seconds) of the last run or None if not run
+        """
+        return self.elapsed
+
+    def getStdin(self):
+        return self.stdin
+
+    def getMemoryMb(self):
+        return self.memoryMb
+
+    def getName(self):
+        return self.name
+
+    def getOutsubdir(self):
+        return self.outsubdir
+
+    def getPeakRss(self):
+        """
+        :returns: Peak resident set size (KB) of the last run or None if
+                  unknown
+        """
+        return self.peakRss
+
+    def getWorkspace(self):
+        return self.workspace
+
+    def setRunResult(self, elapsed, cpuTime, peakRss):
+        """
+        Set the timings of a run performed elsewhere (e.g., by a worker)
+        :param elapsed: Wall time (seconds)
+        :param cpuTime: CPU time (seconds) or None if unknown
+        :param peakRss: Peak resident set size (KB) or None if unknown
+        """
+        self.elapsed = elapsed
+        self.cpuTime = cpuTime
+        self.peakRss = peakRss
+
+    def setDependencies(self, dependencies):
+        """
+        :param dependencies: Cases named by DEPENDS_ON
+        """
+        self.dependencies = dependencies
+
+    def interpolateCaseOutdirs(self, interpolator):
+        """
+        Resolve the $(outdir:name) references left when the case was created
+        :param interpolator: TestBedInterpolator with all case output
+                             directories set
+        """
+        expressions = []
+        for argument in self.arguments:
+            argument.option = interpolator.interpolateCaseOutdir(
+                argument.option)
+            argument.value = interpolator.interpolateCaseOutdir(argument.value)
+            expressions += [argument.option, argument.value]
+        if self.stdin is not None:
+            self.stdin = interpolator.interpolateCaseOutdir(self.stdin)
+            expressions.append(self.stdin)
+
+        # Names still unresolved are not the name of any case
+        for expression in expressions:
+            match = re.search(r"\$\(outdir:([^)]+)\)", expression)
+            if match:
+                raise Exception("Unknown case name in %s: %s" %
+                                (self.configFile, match.group(1)))
+
+    def cleanupWorkspace(self, passed, keep):
+        """
+        Remove the case workspace according to the keep policy
+        :param passed: True if the case passed
+        :param keep: Keep policy (one of Workspace.KEEPS)
+        """
+        if self.workspace is None:
+            return
+        if (keep == Workspace.KEEP_ALWAYS or
+            (keep == Workspace.KEEP_FAILURE and not passed)):
+            if os.path.isdir(self.workspace.getPath()):
+                self.logger.info("Test Case workspace kept: %s" %
+                                 self.workspace.getPath())
+            return
+        tPhase = profiler.start()
+        self.workspace.remove()
+        profiler.stop(HarnessProfiler.PHASE_WORKSPACE, tPhase)
+
+    def initialize(self):
+
+        tPhase = profiler.start()
+
+        # Share one console logger between all cases until they are run
+        # with the logger of their Test Set
+        self.logger = logging.getLogger(TestCase.LOGGER)
+        if len(self.logger.handlers) == 0:
+            self.logger.setLevel(logging.DEBUG)
+            formatter = logging.Formatter(
+                '%(asctime)s: %(levelname)10s: %(message)s',
+                '%Y-%m-%d %H:%M:%S')
+            consoleHandler = logging.StreamHandler()
+            consoleHandler.setFormatter(formatter)
+            self.logger.addHandler(consoleHandler)
+
+        profiler.stop(HarnessProfiler.PHASE_LOGGER, tPhase)
+
+    def getCaseId(self):
+        """
+        Access case identifier used to store the case output in an archive
+        :returns: Log file path relative to the test set output directory
+        """
+        return os.path.normpath(
+            os.path.join(self.outsubdir, self.logfile)).replace(os.path.sep,
+                                                                "/")
+
+    def getCommand(self, executable):
+        """
+        Build the case command line
+        :param executable: Test set executable
+        :returns: Command line as a list of arguments
+        """
+        command = [executable]
+        for argument in self.arguments:
+            if len(argument.getOption()) > 0:
+                command.append(argument.getOption())
+            if len(argument.getValue()) > 0:
+                command.append(argument.getValue())
+        return command
+
+    def getLogPath(self, outdir):
+        """
+        :param outdir: Test set output directory
+        :returns: Path of the case log file
+        """
+        return os.path.normpath(os.path.join(outdir, self.outsubdir,
+                                             self.logfile))
+
+    def run(self, executable, outdir, environment=None, dryrun = False,
+            archive=None, compression=None, compressionThreshold=0,
+            preexec=None):
+        """
+        Run test case
+        :param archive: Optional TestCaseArchive to write output to instead
+                        of the case log file
+        :param compression: Optional codec to compress the output with
+        :param compressionThreshold: Output size (bytes) below which output
+                                     is not compressed
+        :param preexec: Optional function called in the child process before
+                        the executable is run
+        """
+        # Build command line
+        command = self.getCommand(executable)
+
+        tStart = time.time()
+        self.elapsed = None
+        self.cpuTime = None
+        self.peakRss = None
+
+        stdinHandle = None
+        segmentHandle = None
+
+        if dryrun:
+
+            # Perform dry-run by printing would be command
+            self.logger.info("Dry run command: %s" % ' '.join(command))
+            status = 0
+
+        else:
+
+            try:
+
+                # Get executable path
+                exedir = os.path.dirname(executable)
+                if len(exedir.strip()) == 0:
+                    exedir = os.getcwd()
+
+                # Generate referenced fixtures
+                for fixture in self.fixtures:
+                    try:
+                        fixture.build(self.logger)
+                    except Exception as e:
+                        raise Exception("Unable to generate fixture %s: %s" %
+                                        (fixture.name, e))
+
+                # Create isolated working directory
+                if self.workspace is not None:
+                    tPhase = profiler.start()
+                    mode = self.workspace.create()
+                    profiler.stop(HarnessProfiler.PHASE_WORKSPACE, tPhase)
+                    self.logger.info("Test Case workspace (%s): %s" %
+                                     (mode, self.workspace.getPath()))
+                    if (self.workspace.mode == Workspace.MODE_AUTO and
+                        mode == Workspace.MODE_COPY and
+                        not Workspace.fallbackWarned):
+                        Workspace.fallbackWarned = True
+                        self.logger.warning("Reflink is not supported in %s. "
+                                            "Workspaces are full copies of "
+                                            "their template" %
+                                            os.path.dirname(
+                                                self.workspace.getPath()))
+
+                    # A relative executable path is relative to the original
+                    # directory, not the workspace
+                    if len(os.path.dirname(executable).strip()) > 0:
+                        command[0] = os.path.abspath(executable)
+                    exedir = self.workspace.getPath()
+
+                # Hand the input file to the executable as its descriptor
+                if self.stdin is not None:
+                    try:
+                        stdinHandle = FileHandler(self.stdin, 'rb')
+                    except IOError as e:
+                        raise Exception("Unable to open STDIN %s: %s" %
+                                        (self.stdin, e.strerror))
+
+                if archive is not None:
+
+                    # Append output to an archive segment
+                    tPhase = profiler.start()
+                    segment, segmentHandle = archive.acquireSegment()
+                    segmentOffset = os.fstat(segmentHandle.fileno()).st_size
+                    outputHandle = segmentHandle
+                    profiler.stop(HarnessProfiler.PHASE_LOGWRITE, tPhase)
+
+                else:
+
+                    # Make sure log file exists
+                    tPhase = profiler.start()
+                    testLogFileToWrite = self.getLogPath(outdir)
+                    testLogCreated = checkFileIsWritable(testLogFileToWrite,
+                                                         True)
+                    profiler.stop(HarnessProfiler.PHASE_LOGWRITE, tPhase)
+                    if (testLogCreated is False):
+
+                        self.logger.critical("Log file is not writable: " +
+                                             testLogFileToWrite)
+                        return -1;
+
+                    if compression is None:
+                        tPhase = profiler.start()
+                        testLogHandle = FileHandler(testLogFileToWrite,'w')
+                        outputHandle = testLogHandle.getHandle()
+                        profiler.stop(HarnessProfiler.PHASE_LOGWRITE, tPhase)
+
+                # Stream output through a compressor
+                compressor = None
+                if compression is not None:
+
+                    def openOutput(codec):
+                        if archive is not None:
+                            return segmentHandle
+                        if codec is None:
+                            return open(testLogFileToWrite, 'wb')
+                        return open(testLogFileToWrite +
+                                    LogCompressor.EXTENSIONS[codec], 'wb')
+
+                    compressor = LogCompressor(compression,
+                                               compressionThreshold,
+                                               openOutput)
+                    outputHandle = subprocess.PIPE
+
+                # Run command as a subprocess
+                tPhase = profiler.start()
+                process = subprocess.Popen(command,
+                                           stdin=(stdinHandle.getHandle()
+                                                  if stdinHandle is not None
+                                                  else None),
+                                           stdout=outputHandle,
+                                           stderr=(outputHandle
+                                                   if compressor is None
+                                                   else subprocess.STDOUT),
+                                           env=environment,
+                                           cwd=exedir,
+                                           preexec_fn=preexec,
+                                           close_fds=True,
+                                           shell=True)
+                profiler.stop(HarnessProfiler.PHASE_SPAWN, tPhase)
+
+                tPhase = profiler.start()
+                if compressor is not None:
+                    outputFd = process.stdout.fileno()
+                    for chunk in iter(lambda: os.read(outputFd,
+                                                      LogCompressor.CHUNK_SIZE),
+                                      ""):
+                        compressor.write(chunk)
+                    process.stdout.close()
+                status, rusage = waitProcess(process)
+                profiler.stop(HarnessProfiler.PHASE_WAIT, tPhase)
+                if rusage is not None:
+                    self.cpuTime = rusage.ru_utime + rusage.ru_stime
+                    self.peakRss = rusage.ru_maxrss
+
+                tPhase = profiler.start()
+                codec = None
+                if compressor is not None:
+                    outputHandle = compressor.close()
+                    codec = compressor.getCodec()
+                    self.logCompression(compressor)
+                if archive is not None:
+                    segmentLength = (os.fstat(segmentHandle.fileno()).st_size -
+                                     segmentOffset)
+                    archive.record(self.getCaseId(),
+                                   segment,
+                                   segmentOffset,
+                                   segmentLength,
+                                   codec)
+                    archive.releaseSegment(segment, segmentHandle)
+                    segmentHandle = None
+                else:
+                    outputHandle.close()
+                profiler.stop(HarnessProfiler.PHASE_LOGWRITE, tPhase)
+
+            except Exception, e:
+                if segmentHandle is not None:
+                    archive.releaseSegment(segment, segmentHandle)
+                message = "Exception occurred launching application: %s" % e
+                self.logger.critical(message)
+                self.logger.critical("Stopping test case.")
+                return -2
+
+        tElapsed = time.time() - tStart;
+        self.elapsed = tElapsed
+        self.logger.info("Test Case elapsed time (seconds): %i" % tElapsed)
+
+        return status
+
+    def storeOutput(self, source, outdir, archive=None, compression=None,
+                    compressionThreshold=0):
+        """
+        Write output produced elsewhere (e.g., by a worker) the way run
+        writes the output of the executable
+        :param source: File object to read the case output from
+        :param outdir: Test set output directory
+        :param archive: Optional TestCaseArchive to write output to instead
+                        of the case log file
+        :param compression: Optional codec to compress the output with
+        :param compressionThreshold: Output size (bytes) below which output
+                                     is not compressed
+        """
+        segmentHandle = None
+        if archive is not None:
+            segment, segmentHandle = archive.acquireSegment()
+            segmentOffset = os.fstat(segmentHandle.fileno()).st_size
+        else:
+            testLogFileToWrite = self.getLogPath(outdir)
+            if not checkFileIsWritable(testLogFileToWrite, True):
+                raise Exception("Log file is not writable: " +
+                                testLogFileToWrite)
+
+        chunks = iter(lambda: source.read(LogCompressor.CHUNK_SIZE), "")
+        try:
+            codec = None
+            if compression is not None:
+
+                def openOutput(codec):
+                    if archive is not None:
+                        return segmentHandle
+                    if codec is None:
+                        return open(testLogFileToWrite, 'wb')
+                    return open(testLogFileToWrite +
+                                LogCompressor.EXTENSIONS[codec], 'wb')
+
+                compressor = LogCompressor(compression,
+                                           compressionThreshold,
+                                           openOutput)
+                for chunk in chunks:
+                    compressor.write(chunk)
+                outputHandle = compressor.close()
+                codec = compressor.getCodec()
+                self.logCompression(compressor)
+                if archive is None:
+                    outputHandle.close()
+
+            elif archive is not None:
+                for chunk in chunks:
+                    segmentHandle.write(chunk)
+                segmentHandle.flush()
+
+            else:
+                with open(testLogFileToWrite, 'wb') as outputHandle:
+                    for chunk in chunks:
+                        outputHandle.write(chunk)
+
+            if archive is not None:
+                segmentLength = (os.fstat(segmentHandle.fileno()).st_size -
+                                 segmentOffset)
+                archive.record(self.getCaseId(),
+                               segment,
+                               segmentOffset,
+                               segmentLength,
+                               codec)
+        finally:
+            if segmentHandle is not None:
+                archive.releaseSegment(segment, segmentHandle)
+
+    def logCompression(self, compressor):
+        """
+        Log the compression statistics of the case output
+        :param compressor: LogCompressor used to write the case output
+        """
+        if compressor.getCodec() is None:
+            self.logger.info("Test Case output (bytes): %i (below "
+                             "compression threshold, stored plain)" %
+                             compressor.getBytesIn())
+            return
+        cpuTime = ""
+        if compressor.getCpuTime() is not None:
+            cpuTime = (", %.3f CPU seconds compressing" %
+                       compressor.getCpuTime())
+        self.logger.info("Test Case output (bytes): %i, %s compressed: %i "
+                         "(ratio %.2f%s)" %
+                         (compressor.getBytesIn(),
+                          compressor.getCodec(),
+                          compressor.getBytesOut(),
+                          compressor.getRatio(),
+                          cpuTime))
+
+    def printSettings(self):
+        """
+        Print settings to logger
+        """
+
+        fmt = "%15s: %s"
+
+        self.logger.info(fmt, "TEST CASE", self.configFile)
+        self.logger.info(fmt, "DESCRIPTION", self.description)
+        self.logger.info(fmt, "OUTSUBDIR", self.outsubdir)
+        self.logger.info(fmt, "LOG FILE", self.logfile)
+        self.logger.info(fmt, "CPUS", self.cpus)
+        self.logger.info(fmt, "MEMORY_MB", self.memoryMb)
+
+        if self.stdin is not None:
+            self.logger.info(fmt, "STDIN", self.stdin)
+
+        if len(self.dependsOn) > 0:
+            self.logger.info(fmt, "DEPENDS_ON", ", ".join(self.dependsOn))
+
+        if self.workspace is not None:
+            self.logger.info(fmt, "WORKSPACE", self.workspace.getTemplate())
+
+        for fixture in self.fixtures:
+            self.logger.info(fmt, "FIXTURE", "%s: %s" % (fixture.getName(),
+                                                         fixture.getPath()))
+
+        for case, argument in enumerate(self.arguments):
+            self.logger.info(fmt,
+                             "ARGUMENT #" + str(case),
+                             argument.option + " " + argument.value)
+
+        return
+
+    def setLogger(self, logger):
+        """
+        Set test case logger. Default is console
+        """
+        self.logger = logger
+
+    @staticmethod
+    def createTestCase(outdir, configFile, cpus=1, memoryMb=0,
+                       workspaceRoot=None, workspaceMode=Workspace.MODE_AUTO,
+                       readOnly=False):
+        """
+        Create a Test Case in a configuration file
+        :param outdir: Test set output directory
+        :param configFile: Test case configuration filename
+        :param cpus: Default number of CPUs used by the case
+        :param memoryMb: Default memory (MB) used by the case
+        :param workspaceRoot: Directory to create case workspaces in
+        :param workspaceMode: How workspace files are populated
+        :param readOnly: If True the case is only inspected (not run)
+        """
+
+        profiler.setKey(configFile)
+
+        # Create parser
+        config = TestBedConfigParser()
+        config.interpolator.setOutdir(outdir)
+        config.interpolator.resetFixturesUsed()
+        config.interpolator.setWorkspace(None)
+        config.optionxform = str
+        config.read(configFile)
+
+        # Extract test properties
+        outsubdir=config.parseOption(
+            TestCase.SECTION_TEST,
+            TestCase.PROP_TEST_OUTSUBDIR)
+        config.interpolator.setOutSubdir(outsubdir)
+        description=config.parseOption(
+            TestCase.SECTION_TEST,
+            TestCase.PROP_TEST_DESCRIPTION)
+        logfile=config.parseOption(TestCase.SECTION_TEST,
+                                   TestCase.PROP_TEST_LOGFILE)
+
+        # Extract workspace template
+        workspace = None
+        if config.has_option(TestCase.SECTION_TEST,
+                             TestCase.PROP_TEST_WORKSPACE):
+            template = config.parseOption(TestCase.SECTION_TEST,
+                                          TestCase.PROP_TEST_WORKSPACE)
+            name = os.path.splitext(os.path.basename(configFile))[0]
+            workspace = Workspace(template,
+                                  workspaceRoot or os.path.join(outdir,
+                                                                "workspaces"),
+                                  name,
+                                  workspaceMode)
+            config.interpolator.setWorkspace(
+                workspace.getPattern() if config.interpolator.isReadOnly()
+                else workspace.getPath())
+
+        args=config.parseItemValues(TestCase.SECTION_ARGS)
+
+        # Extract declared resource costs
+        if config.has_option(TestCase.SECTION_TEST, TestCase.PROP_TEST_CPUS):
+            cpus = config.parseOption(TestCase.SECTION_TEST,
+                                      TestCase.PROP_TEST_CPUS)
+        if config.has_option(TestCase.SECTION_TEST, TestCase.PROP_TEST_MEMORY):
+            memoryMb = config.parseOption(TestCase.SECTION_TEST,
+                                          TestCase.PROP_TEST_MEMORY)
+
+        # Extract standard input file
+        stdin = None
+        if config.has_option(TestCase.SECTION_TEST, TestCase.PROP_TEST_STDIN):
+            stdin = config.parseOption(TestCase.SECTION_TEST,
+                                       TestCase.PROP_TEST_STDIN)
+
+        # Extract case name and dependencies
+        name = None
+        if config.has_option(TestCase.SECTION_TEST, TestCase.PROP_TEST_NAME):
+            name = config.parseOption(TestCase.SECTION_TEST,
+                                      TestCase.PROP_TEST_NAME)
+
+        dependsOn = []
+        if config.has_option(TestCase.SECTION_TEST,
+                             TestCase.PROP_TEST_DEPENDS_ON):
+            dependsOn = config.parseOption(TestCase.SECTION_TEST,
+                                           TestCase.PROP_TEST_DEPENDS_ON)
+            if not isinstance(dependsOn, list):
+                dependsOn = [dependsOn]
+
+        arguments = []
+        for argument in args:
+            clarg = [CommandLineArgument(argument[0],argument[1])]
+            arguments = arguments + clarg
+
+        return TestCase(configFile,
+                        description,
+                        outsubdir,
+                        logfile,
+                        arguments,
+                        int(cpus),
+                        int(memoryMb),
+                        stdin,
+                        list(config.interpolator.getFixturesUsed()),
+                        workspace,
+                        name,
+                        dependsOn,
+                        readOnly)
+
+class TestSet:
+    """
+    A collection of Test Cases for a single executable.
+    """
+
+    # ========================================
+    # SECTION PROPERTIES
+    # ========================================
+    PROP_GROUP_EXECUTABLE="EXECUTABLE"
+    PROP_GROUP_SUCCESSCODE="SUCCESSCODE"
+    PROP_GROUP_TESTDIR="TESTDIR"
+    PROP_GROUP_TESTCASES="TESTCASES"
+    PROP_GROUP_OUTDIR="OUTDIR"
+    PROP_GROUP_PATHDIRS="PATHDIRS"
+    PROP_GROUP_LOGFILE="LOGFILE"
+    PROP_GROUP_LOGLEVEL="LOGLEVEL"
+    PROP_GROUP_LOGARCHIVE="LOGARCHIVE"
+    PROP_GROUP_LOGCOMPRESSION="LOGCOMPRESSION"
+    PROP_GROUP_LOGCOMPRESSIONMIN="LOGCOMPRESSIONMIN"
+    PROP_GROUP_CPUS="CPUS"
+    PROP_GROUP_MEMORY="MEMORY_MB"
+    PROP_GROUP_AFFINITY="AFFINITY"
+    PROP_GROUP_NICE="NICE"
+    PROP_GROUP_ENV_CLEAR="ENV_CLEAR"
+    PROP_GROUP_ENV="ENV"
+    PROP_GROUP_WORKSPACEROOT="WORKSPACEROOT"
+    PROP_GROUP_WORKSPACETMPFS="WORKSPACETMPFS"
+    PROP_GROUP_WORKSPACEMODE="WORKSPACEMODE"
+    PROP_GROUP_WORKSPACEKEEP="WORKSPACEKEEP"
+
+    # ========================================
+    # DEFAULT PROPERTIES
+    # ========================================
+    PROP_GROUP_SUCCESSCODE_DEFAULT=0
+    PROP_GROUP_LOGLEVEL_DEFAULT="DEBUG"
+    PROP_GROUP_LOGCOMPRESSION_DEFAULT=LogCompressor.CODEC_NONE
+    PROP_GROUP_LOGCOMPRESSION_FALLBACK=LogCompressor.CODEC_GZIP
+    PROP_GROUP_LOGCOMPRESSIONMIN_DEFAULT=4096
+    PROP_GROUP_CPUS_DEFAULT=1
+    PROP_GROUP_MEMORY_DEFAULT=0
+    PROP_GROUP_WORKSPACEROOT_TMPFS="/dev/shm/clitestbed"
+    PROP_GROUP_WORKSPACEMODE_DEFAULT=Workspace.MODE_AUTO
+    PROP_GROUP_WORKSPACEKEEP_DEFAULT=Workspace.KEEP_FAILURE
+
+    # ========================================
+    # CLEAN ENVIRONMENT (ENV_CLEAR)
+    # ========================================
+    ENV_CLEAR_KEEP=["PATH", "HOME", "TMPDIR"]
+    ENV_CLEAR_DEFAULTS=collections.OrderedDict([("LANG", "C"),
+                                                ("LC_ALL", "C")])
+
+    # CPU reserved for the harness; excluded from every case's affinity
+    reservedCore = None
+
+    # Optional TestRunHistory recording every case result
+    history = None
+
+    # ========================================
+    # CONFIGURATION EXTENSIONS
+    # ========================================
+    CONFIG_EXTENSION=".json"
+
+    def __init__(self,
+                 name,
+                 executable,
+                 successCode,
+                 outdir,
+                 cases,
+                 pathdirs=None,
+                 logfile=None,
+                 loglevel=None,
+                 logarchive=None,
+                 logcompression=None,
+                 logcompressionmin=None,
+                 affinity=None,
+                 nice=None,
+                 envClear=False,
+                 env=None,
+                 workspaceKeep=Workspace.KEEP_FAILURE,
+                 testdir=None,
+                 caseFiles=None,
+                 caseOptions=None,
+                 readOnly=False):
+        """
+        :param name: Set name
+        :param executable: Set executable path
+        :param executable: Set executable succes return code
+        :param outdir: Output directory
+        :param cases: Test case files to be run for this Set
+        :param pathdirs: Optional list of directories to add to system path
+        :param environment: OS Environment to run Test Cases
+        :param logger: Log file to write test results
+        :param logarchive: Optional archive directory to pack case output into
+        :param logcompression: Optional case output compression codec
+        :param logcompressionmin: Output size (bytes) below which case output
+                                  is not compressed
+        :param affinity: Optional list of CPUs to run cases on
+        :param nice: Optional nice value to run cases with
+        :param envClear: If True run cases in a minimal clean environment
+        :param env: Optional environment variables to set for cases
+        :param workspaceKeep: When case workspaces are kept after the case
+        :param testdir: Optional directory the case files were found in
+        :param caseFiles: Case configuration files (including any that
+                          failed to load)
+        :param caseOptions: Keyword arguments used to create the cases
+        :param readOnly: If True the set is only inspected (not run) and
+                         nothing (logs, archive) is created on disk
+        """
+        self.name = name
+        self.executable = executable
+        self.successCode = successCode
+        self.outdir = outdir
+        self.cases = cases
+        self.pathdirs = pathdirs
+        self.logfile = logfile
+        self.loglevel = loglevel
+        self.logarchive = logarchive
+        self.logcompression = logcompression
+        self.logcompressionmin = logcompressionmin
+        self.affinity = affinity
+        self.nice = nice
+        self.envClear = envClear
+        self.env = env
+        self.workspaceKeep = workspaceKeep
+        self.testdir = testdir
+        self.caseFiles = caseFiles or [case.getConfigFile() for case in cases]
+        self.caseOptions = caseOptions or {}
+
+        self.archive = None
+        self.compression = None
+        self.compressionThreshold = TestSet.PROP_GROUP_LOGCOMPRESSIONMIN_DEFAULT
+        self.logger = None
+        self.loggerHandler = None
+        self.consoleHandler = None
+        self.environment = None
+        self.preexec = None
+        self.runSettings = collections.OrderedDict()
+
+        # Initialize derived properties: logger, system environment, etc.
+        if readOnly:
+            self.initializeEnvironment()
+        else:
+            self.initialize()
+
+    def __del__ (self):
+    
+        self.close()
+
+    def close(self):
+        """
+        Remove the test set's log handlers
+        """
+
+        # Clean up handler
+        if self.loggerHandler is not None:
+            self.logger.removeHandler(self.loggerHandler)
+            self.loggerHandler.close()
+            self.loggerHandler = None
+        if self.consoleHandler is not None:
+            self.logger.removeHandler(self.consoleHandler)
+            self.consoleHandler = None
+
+    def initialize(self):
+
+        tPhase = profiler.start()
+
+        # Build log file path
+        logFilePath = None
+        logFileValid = self.logfile is not None
+        if logFileValid:
+            logFilePath = os.path.normpath(os.path.join(self.outdir,
+                                                        self.logfile))
+            logFileValid = checkFileIsWritable(logFilePath, True)
+
+        # Extract log level
+        logNumericLevel = getattr(logging, self.loglevel.upper(), None)
+        isLogLevelValid = isinstance(logNumericLevel, int)
+        if not isLogLevelValid:
+            logNumericLevel = getattr(logging,
+                                      TestSet.PROP_GROUP_LOGLEVEL_DEFAULT,
+                                      None)
 
         # Create logger        
-        self.logger = logging.getLogger(self.configFile)
-        self.logger.setLevel(logging.DEBUG)
+        self.logger = logging.getLogger(self.name)
+        self.logger.setLevel(logNumericLevel)
         formatter = logging.Formatter(
             '%(asctime)s: %(levelname)10s: %(message)s',
             '%Y-%m-%d %H:%M:%S')
 
-        # Add console handler to logger
-        consoleHandler = logging.StreamHandler()
-        consoleHandler.setFormatter(formatter)
-        self.logger.addHandler(consoleHandler)
+        # Add console handler to logger
+        self.consoleHandler = logging.StreamHandler()
+        self.consoleHandler.setFormatter(formatter)
+        self.logger.addHandler(self.consoleHandler)
+
+        # Add file handler to logger
+        try:
+            if logFileValid:
+                self.loggerHandler = logging.FileHandler(normalizePath(
+                    os.path.normpath(logFilePath)))
+                self.loggerHandler.setFormatter(formatter)
+                self.logger.addHandler(self.loggerHandler)
+        except:
+            self.logger.critical("Unable to create file logger: " + logFilePath)
+
+        # Warn user about logger failures
+        if not logFileValid:
+            self.logger.critical(('Invalid log file: %s' % logFilePath))
+
+        if not isLogLevelValid:
+            self.logger.critical(('Invalid log level: %s' % self.loglevel))
+            self.logger.critical("Setting log level to " +
+                                 TestSet.PROP_GROUP_LOGLEVEL_DEFAULT)
+
+        profiler.stop(HarnessProfiler.PHASE_LOGGER, tPhase)
+
+        # Select case output compression codec
+        if self.logcompression is not None:
+            codec = self.logcompression.lower()
+            if codec not in LogCompressor.EXTENSIONS:
+                if codec != LogCompressor.CODEC_NONE:
+                    self.logger.critical('Invalid log compression: %s' %
+                                         self.logcompression)
+            elif not LogCompressor.isAvailable(codec):
+                self.logger.critical('Log compression not available: %s' %
+                                     self.logcompression)
+                self.logger.critical("Setting log compression to " +
+                    TestSet.PROP_GROUP_LOGCOMPRESSION_FALLBACK)
+                self.compression = TestSet.PROP_GROUP_LOGCOMPRESSION_FALLBACK
+            else:
+                self.compression = codec
+
+        if self.logcompressionmin is not None:
+            try:
+                self.compressionThreshold = int(self.logcompressionmin)
+            except ValueError:
+                self.logger.critical('Invalid log compression minimum: %s' %
+                                     self.logcompressionmin)
+
+        # Open case output archive
+        self.openArchive()
+
+        # Modify test set system environment
+        self.initializeEnvironment()
+
+        # Build child process CPU affinity and priority
+        self.initializeProcessSettings()
+
+    def initializeEnvironment(self):
+        """
+        Build the environment the cases are run in (None to inherit)
+        """
+        if self.envClear:
+            self.environment = {}
+            for name in TestSet.ENV_CLEAR_KEEP:
+                if name in os.environ:
+                    self.environment[name] = os.environ[name]
+            self.environment.update(TestSet.ENV_CLEAR_DEFAULTS)
+        elif self.pathdirs is not None or self.env is not None:
+            self.environment = os.environ.copy()
+
+        if self.pathdirs is not None:
+            for pathdir in self.pathdirs:
+                self.environment["PATH"] = (os.path.normpath(str(pathdir)) +
+                                            os.pathsep +
+                                            self.environment.get("PATH", ""))
+
+        if self.env is not None:
+            for name, value in self.env.iteritems():
+                self.environment[unicode(name).encode("utf-8")] = \
+                    unicode(value).encode("utf-8")
+
+    def openArchive(self):
+        """
+        Open the case output archive. An archive closed at the end of a run
+        is reopened (and appended to) for the next one.
+        """
+        if self.logarchive is not None:
+            tPhase = profiler.start()
+            self.archive = TestCaseArchive.open(
+                os.path.join(self.outdir, self.logarchive))
+            profiler.stop(HarnessProfiler.PHASE_LOGWRITE, tPhase)
+
+    def initializeProcessSettings(self):
+        """
+        Build the function applied to the case processes before exec to set
+        their CPU affinity and priority, and the record of the settings
+        applied to every case
+        """
+
+        # Extract CPU affinity
+        affinity = None
+        if self.affinity is not None:
+            try:
+                affinity = parseCpuList(self.affinity)
+            except ValueError:
+                self.logger.critical('Invalid affinity: %s' % self.affinity)
+
+        if TestSet.reservedCore is not None:
+            if affinity is None:
+                affinity = range(multiprocessing.cpu_count())
+            if TestSet.reservedCore in affinity:
+                affinity.remove(TestSet.reservedCore)
+            if len(affinity) == 0:
+                self.logger.critical('Affinity only contains the reserved '
+                                     'harness core: %i' % TestSet.reservedCore)
+                affinity = None
+
+        # Extract priority
+        nice = None
+        if self.nice is not None:
+            try:
+                nice = int(self.nice)
+            except ValueError:
+                self.logger.critical('Invalid nice value: %s' % self.nice)
+
+        if affinity is not None or nice is not None:
+            libc = None
+            if (not hasattr(os, "sched_setaffinity") or
+                not hasattr(os, "setpriority")):
+                libc = loadLibc()
+
+            def preexec():
+                if affinity is not None:
+                    setProcessAffinity(affinity, libc)
+                if nice is not None:
+                    setProcessPriority(nice, libc)
+
+            self.preexec = preexec
+
+        # Record settings so case timings are reproducible and comparable
+        environment = self.environment
+        if environment is None:
+            environment = os.environ
+        environmentHash = hashlib.sha1(
+            json.dumps(sorted(environment.items()))).hexdigest()[:12]
+
+        self.runSettings = collections.OrderedDict()
+        self.runSettings["affinity"] = (formatCpuList(affinity)
+                                        if affinity is not None else "inherit")
+        self.runSettings["nice"] = nice if nice is not None else "inherit"
+        self.runSettings["env"] = "clear" if self.envClear else "inherit"
+        self.runSettings["envHash"] = environmentHash
+        self.runSettings["reservedCore"] = TestSet.reservedCore
+
+    def printSettings(self):
+        """
+        Print settings to logger
+        """
+
+        fmt = "%10s: %s"
+
+        self.logger.info(fmt, "TEST SET", self.name)
+        self.logger.info(fmt, "EXECUTABLE", self.executable)
+        self.logger.info(fmt, "OUTPUT DIR", self.outdir)
+
+        if self.archive is not None:
+            self.logger.info(fmt, "LOGARCHIVE", self.archive.getPath())
+
+        if self.compression is not None:
+            self.logger.info(fmt, "COMPRESSION", self.compression)
+
+        self.logger.info(fmt, "AFFINITY", self.runSettings["affinity"])
+        self.logger.info(fmt, "NICE", self.runSettings["nice"])
+        self.logger.info(fmt, "ENV", self.runSettings["env"])
+
+        if self.env is not None:
+            for name, value in self.env.iteritems():
+                self.logger.info(fmt, "ENV", "%s=%s" % (name, value))
+
+        for index, case in enumerate(self.cases):
+            caseFile = "None"
+            if case is not None:
+                caseFile = case.getConfigFile()
+            self.logger.info(fmt, "CASE #" + str(index+1), caseFile)
+
+        for pathdir in self.pathdirs:
+            self.logger.info(fmt, "PATHDIRS", pathdir)
+
+        return
+
+    def begin(self):
+        """
+        Print Test Set header before its cases are run
+        """
+        self.logger.info("========================================")
+        self.printSettings()
+
+    def end(self, numTest, numPass, numSkip=0):
+        """
+        Print Test Set totals after its cases are run
+        :param numTest: Number of cases run
+        :param numPass: Number of cases passed
+        :param numSkip: Number of cases skipped because a dependency failed
+        :returns: Number of failed (including skipped) cases
+        """
+        numFail = numTest-numPass
+        self.logger.info("----------------------------------------")
+        self.logger.info("TOTAL NUMBER OF TESTS: " + str(numTest))
+        self.logger.info("TOTAL NUMBER OF PASS: " + str(numPass))
+        self.logger.info("TOTAL NUMBER OF FAIL: " + str(numFail))
+        if numSkip > 0:
+            self.logger.info("TOTAL NUMBER OF SKIPPED: " + str(numSkip))
+
+        return numFail
+
+    def findExecutable(self):
+        """
+        Locate the set executable as the case processes find it
+        :returns: Absolute executable path or None if not found
+        """
+        if len(os.path.dirname(self.executable)) > 0:
+            return os.path.abspath(self.executable)
+
+        environment = self.environment
+        if environment is None:
+            environment = os.environ
+        for pathdir in environment.get("PATH", "").split(os.pathsep):
+            path = os.path.join(pathdir, self.executable)
+            if os.path.isfile(path):
+                return os.path.abspath(path)
+        return None
+
+    def reloadCase(self, configFile):
+        """
+        Re-read a case configuration file, replacing the case created from
+        it. A case that no longer loads is removed; a new case is appended.
+        :param configFile: Case configuration filename
+        :returns: Reloaded case or None if the case failed to load
+        """
+        if configFile not in self.caseFiles:
+            self.caseFiles.append(configFile)
+
+        caseIndex = None
+        for index, case in enumerate(self.cases):
+            if case.getConfigFile() == configFile:
+                caseIndex = index
+
+        case = None
+        try:
+            case = TestCase.createTestCase(self.outdir,
+                                           configFile,
+                                           **self.caseOptions)
+        except Exception as e:
+            print "Error: {}".format(e)
+            print "Skipping test case {}. Skipping.".format(configFile)
+
+        if caseIndex is None:
+            if case: self.cases.append(case)
+        elif case:
+            self.cases[caseIndex] = case
+        else:
+            del self.cases[caseIndex]
+
+        return case
+
+    def run(self, dryrun = False, cases = None):
+        """
+        Run Test Set cases
+        :param dryrun: True if performing a dry run
+        :param cases: Optional subset of the cases to run (default all)
+        """
+
+        self.begin()
+
+        selected = enumerate(self.cases)
+        if cases is not None:
+            selected = [(self.cases.index(case), case) for case in cases]
+
+        numTest = 0
+        numPass = 0
+        for caseIndex, case in selected:
+
+            numTest += 1
+            if self.runCase(caseIndex, case, dryrun):
+                numPass += 1
+
+        return self.end(numTest, numPass)
+
+    def runCase(self, caseIndex, case, dryrun = False, logger = None,
+                runner = None):
+        """
+        Run a single Test Set case
+        :param caseIndex: Index of the case in the Test Set
+        :param case: Test case
+        :param dryrun: True if performing a dry run
+        :param logger: Logger to write case results to (default set logger)
+        :param runner: Optional function called with the case and logger
+                       that runs the case elsewhere and returns its status
+                       (default run the case here)
+        :returns: True if the case passed
+        """
+
+        if logger is None:
+            logger = self.logger
+
+        logger.info("----------------------------------------")
+        logger.info("Running CASE # " + str(caseIndex+1))
+
+        if not case:
+            logger.error("No test case found. Skipping.")
+            return False
+
+        # Write case options
+        profiler.setKey(case.getConfigFile())
+        case.setLogger(logger)
+        case.printSettings()
+
+        # Run test case
+        try:
+            if runner is not None:
+                status = runner(case, logger)
+            else:
+                status = case.run(self.executable,
+                                  self.outdir,
+                                  self.environment,
+                                  dryrun,
+                                  self.archive,
+                                  self.compression,
+                                  self.compressionThreshold,
+                                  self.preexec)
+            if dryrun:
+                status = self.successCode
+        except Exception:
+            status = None
+            logger.critical("An unhandled exception occurred when " +
+                            "running case. Skipping.")
+
+        logger.info("Test Case run settings: %s" % json.dumps(self.runSettings))
+
+        if TestSet.history is not None and not dryrun:
+            try:
+                TestSet.history.record(self, case, status,
+                                       status == self.successCode)
+            except Exception as e:
+                logger.error("Unable to record run history: %s" % e)
+
+        if not dryrun:
+            try:
+                case.cleanupWorkspace(status == self.successCode,
+                                      self.workspaceKeep)
+            except Exception as e:
+                logger.error("Unable to remove workspace: %s" % e)
+
+        if status == self.successCode:
+            logger.info("Test Case return status: %i" % status)
+            return True
+
+        logger.error("Test Case return status: %s" % status)
+        return False
+
+    def skipCase(self, caseIndex, case, failed, logger = None):
+        """
+        Report a case that is not run because a dependency did not pass
+        :param caseIndex: Index of the case in the Test Set
+        :param case: Test case
+        :param failed: Dependencies that did not pass
+        :param logger: Logger to write case results to (default set logger)
+        """
+
+        if logger is None:
+            logger = self.logger
+
+        logger.info("----------------------------------------")
+        logger.info("Running CASE # " + str(caseIndex+1))
+        case.setLogger(logger)
+        case.printSettings()
+        logger.error("Test Case return status: SKIPPED (dependency did not "
+                     "pass: %s)" % ", ".join(dependency.getName()
+                                             for dependency in failed))
+
+    @staticmethod
+    def createTestSet(configFile, section, readOnly=False):
+        """
+        Create a new Test Set
+        :param configFile: Configuration filename
+        :param section: Name of test Set to extract to extract
+        :param readOnly: If True the set is only inspected (not run)
+        """
+
+        profiler.setKey("[SET] " + section)
+
+        # Create parser
+        config = TestBedConfigParser()
+        config.optionxform = str
+        config.read(configFile)
+
+        # Extract executable path
+        exePath = config.parseOption(section, TestSet.PROP_GROUP_EXECUTABLE)
+
+        # Extract success code
+        successCode = TestSet.PROP_GROUP_SUCCESSCODE_DEFAULT
+        if config.has_option(section, TestSet.PROP_GROUP_SUCCESSCODE):
+            successCode = config.parseOption(section,
+                                             TestSet.PROP_GROUP_SUCCESSCODE)
+
+        # Extract output directory
+        outDir = config.parseOption(section, TestSet.PROP_GROUP_OUTDIR)
+        config.interpolator.setOutdir(outDir)
+
+        # Extract test files by concatenating
+        testFiles = []
+
+        testDir = None
+        if config.has_option(section, TestSet.PROP_GROUP_TESTDIR):
+            testDir = config.parseOption(section, TestSet.PROP_GROUP_TESTDIR)
+            globStr = (testDir.replace('"','') +
+                       os.path.sep +
+                       "*" +
+                       TestSet.CONFIG_EXTENSION)
+            tPhase = profiler.start()
+            testDirFiles = glob.glob(globStr)
+            profiler.stop(HarnessProfiler.PHASE_DISCOVER, tPhase)
+            testFiles = testFiles + testDirFiles
+
+        if config.has_option(section, TestSet.PROP_GROUP_TESTCASES):
+            testCases = config.parseOption(section,TestSet.PROP_GROUP_TESTCASES)
+            testFiles = testFiles + testCases
+
+        if len(testFiles)==0:
+            raise Exception("Configuration file missing test cases")
+
+        # Extract default case resource costs
+        cpus = TestSet.PROP_GROUP_CPUS_DEFAULT
+        if config.has_option(section, TestSet.PROP_GROUP_CPUS):
+            cpus = config.parseOption(section, TestSet.PROP_GROUP_CPUS)
+
+        memoryMb = TestSet.PROP_GROUP_MEMORY_DEFAULT
+        if config.has_option(section, TestSet.PROP_GROUP_MEMORY):
+            memoryMb = config.parseOption(section, TestSet.PROP_GROUP_MEMORY)
+
+        # Extract child process settings
+        affinity = None
+        if config.has_option(section, TestSet.PROP_GROUP_AFFINITY):
+            affinity = config.parseOption(section, TestSet.PROP_GROUP_AFFINITY)
+
+        nice = None
+        if config.has_option(section, TestSet.PROP_GROUP_NICE):
+            nice = config.parseOption(section, TestSet.PROP_GROUP_NICE)
+
+        envClear = False
+        if config.has_option(section, TestSet.PROP_GROUP_ENV_CLEAR):
+            envClear = str(config.parseOption(
+                section,
+                TestSet.PROP_GROUP_ENV_CLEAR)).lower() in ["1", "true", "yes"]
+
+        env = None
+        if config.has_option(section, TestSet.PROP_GROUP_ENV):
+            env = config.parseOption(section, TestSet.PROP_GROUP_ENV)
+
+        # Extract case workspace settings
+        workspaceRoot = None
+        if config.has_option(section, TestSet.PROP_GROUP_WORKSPACEROOT):
+            workspaceRoot = config.parseOption(
+                section,
+                TestSet.PROP_GROUP_WORKSPACEROOT)
+
+        if config.has_option(section, TestSet.PROP_GROUP_WORKSPACETMPFS):
+            if str(config.parseOption(
+                section,
+                TestSet.PROP_GROUP_WORKSPACETMPFS)).lower() in ["1", "true",
+                                                                "yes"]:
+                workspaceRoot = TestSet.PROP_GROUP_WORKSPACEROOT_TMPFS
+
+        workspaceMode = TestSet.PROP_GROUP_WORKSPACEMODE_DEFAULT
+        if config.has_option(section, TestSet.PROP_GROUP_WORKSPACEMODE):
+            workspaceMode = config.parseOption(
+                section,
+                TestSet.PROP_GROUP_WORKSPACEMODE).lower()
+            if workspaceMode not in Workspace.MODES:
+                raise Exception("Invalid workspace mode: %s" % workspaceMode)
+
+        workspaceKeep = TestSet.PROP_GROUP_WORKSPACEKEEP_DEFAULT
+        if config.has_option(section, TestSet.PROP_GROUP_WORKSPACEKEEP):
+            workspaceKeep = config.parseOption(
+                section,
+                TestSet.PROP_GROUP_WORKSPACEKEEP).lower()
+            if workspaceKeep not in Workspace.KEEPS:
+                raise Exception("Invalid workspace keep: %s" % workspaceKeep)
+
+        # Create test cases
+        caseOptions = {"cpus": cpus,
+                       "memoryMb": memoryMb,
+                       "workspaceRoot": workspaceRoot,
+                       "workspaceMode": workspaceMode,
+                       "readOnly": readOnly}
+        cases = []
+        for testFile in testFiles:
+            try:
+                case = TestCase.createTestCase(outDir,
+                                               testFile,
+                                               **caseOptions)
+                if case: cases.append(case)
+            except Exception as e:
+                print "Error: {}".format(e)
+                print "Skipping test case {} from {}. Skipping.".format(
+                    testFile,
+                    configFile)
+
+        profiler.setKey("[SET] " + section)
+
+        # Extract environment path directories
+        pathdirs = []
+        if config.has_option(section, TestSet.PROP_GROUP_PATHDIRS):
+            pathdir = config.parseOption(section, TestSet.PROP_GROUP_PATHDIRS)
+            pathdirs = pathdirs + pathdir
+
+        # Extract log file
+        logFile = None
+        if config.has_option(section, TestSet.PROP_GROUP_LOGFILE):
+            logFile = config.parseOption(section, TestSet.PROP_GROUP_LOGFILE)
+
+        # Extract log level
+        logLevel = TestSet.PROP_GROUP_LOGLEVEL_DEFAULT
+        if config.has_option(section, TestSet.PROP_GROUP_LOGLEVEL):
+            logLevel = config.parseOption(section, TestSet.PROP_GROUP_LOGLEVEL)
+
+        # Extract log archive
+        logArchive = None
+        if config.has_option(section, TestSet.PROP_GROUP_LOGARCHIVE):
+            logArchive = config.parseOption(section,
+                                            TestSet.PROP_GROUP_LOGARCHIVE)
+
+        # Extract log compression
+        logCompression = TestSet.PROP_GROUP_LOGCOMPRESSION_DEFAULT
+        if config.has_option(section, TestSet.PROP_GROUP_LOGCOMPRESSION):
+            logCompression = config.parseOption(
+                section,
+                TestSet.PROP_GROUP_LOGCOMPRESSION)
+
+        logCompressionMin = TestSet.PROP_GROUP_LOGCOMPRESSIONMIN_DEFAULT
+        if config.has_option(section, TestSet.PROP_GROUP_LOGCOMPRESSIONMIN):
+            logCompressionMin = config.parseOption(
+                section,
+                TestSet.PROP_GROUP_LOGCOMPRESSIONMIN)
+
+        return TestSet(section,
+                       exePath,
+                       successCode,
+                       outDir,
+                       cases,
+                       pathdirs,
+                       logFile,
+                       logLevel,
+                       logArchive,
+                       logCompression,
+                       logCompressionMin,
+                       affinity,
+                       nice,
+                       envClear,
+                       env,
+                       workspaceKeep,
+                       testDir,
+                       testFiles,
+                       caseOptions,
+                       readOnly)
+
+    @staticmethod
+    def createTestSets(configFile, readOnly=False, resolvePaths=None):
+        """
+        Create a list of all Test Sets in a configuration file
+        :param configFile: Configuration filename
+        :param readOnly: If True the sets are only inspected (not run)
+        :param resolvePaths: If True fixture and workspace paths are resolved
+                             as for a run (default = not readOnly)
+        """
+
+        profiler.setKey("[CONFIG] " + configFile)
+
+        # Create parser
+        config = TestBedConfigParser()
+        config.interpolator.reset()
+        if resolvePaths is None:
+            resolvePaths = not readOnly
+        config.interpolator.setReadOnly(not resolvePaths)
+        config.read(configFile)
+
+        # Extract shared fixtures
+        fixtureCache = FixtureCache()
+        if FixtureCache.SECTION_FIXTURES in config.sections():
+            fixtureCache.addFixtures(
+                config.data[FixtureCache.SECTION_FIXTURES])
+        config.interpolator.setFixtureCache(fixtureCache)
+
+        # Extract all sections in configuration file
+        sections = [section for section in config.sections()
+                    if section != FixtureCache.SECTION_FIXTURES]
+        if (len(sections) == 0):
+            raise Exception("No test sets sections in configuration file")
+
+        # Parse all sets in configuration file
+        sets = []
+        for section in sections:
+            try:
+                testset = TestSet.createTestSet(configFile,
+                                                section,
+                                                readOnly)
+                if testset: sets.append(testset)
+            except Exception as e:
+                print "Error: {}".format(e)
+                print "Skipping section {} from {}. Skipping.".format(
+                    section,
+                    configFile)
+
+        if (len(sets) == 0):
+            raise Exception("No test sets created in configuration file")
+
+        # Link cases to the cases they depend on
+        TestCaseGraph(sets).link()
+
+        return sets
+
+class TestCaseGraph:
+    """
+    Dependency graph of the cases of all test sets. Each case is linked to
+    the cases named by its DEPENDS_ON (in any test set), the $(outdir:name)
+    references of the cases are resolved and dependency cycles are
+    rejected before any case is run.
+    """
 
-    def run(self, executable, outdir, environment=None, dryrun = False):
+    def __init__(self, testsets):
         """
-        Run test case
+        :param testsets: Test sets
         """
-        # Build command line
-        command = [executable]
-        for argument in self.arguments:
-            if len(argument.getOption()) > 0:
-                command = command + [argument.getOption()]
-            if len(argument.getValue()) > 0:
-                command = command + [argument.getValue()]
+        self.testsets = testsets
 
-        tStart = time.time()
+        # Case name -> [(test set, case)]
+        self.names = collections.OrderedDict()
+        for testset in testsets:
+            for case in testset.cases:
+                self.names.setdefault(case.getName(), []).append((testset,
+                                                                  case))
 
-        if dryrun:
+    def getCase(self, name, case):
+        """
+        :param name: Case name
+        :param case: Case referencing the name
+        :returns: Case with the name
+        """
+        entries = self.names.get(name, [])
+        if len(entries) == 0:
+            raise Exception("Unknown case name in %s: %s" %
+                            (case.getConfigFile(), name))
+        if len(entries) > 1:
+            raise Exception("Ambiguous case name in %s: %s" %
+                            (case.getConfigFile(), name))
+        return entries[0][1]
+
+    def link(self):
+        """
+        Resolve case output directory references and dependencies
+        """
 
-            # Perform dry-run by printing would be command
-            self.logger.info("Dry run command: %s" % ' '.join(command))
-            status = 0
+        # Resolve $(outdir:name) with the output directory of each case
+        caseOutdirs = {}
+        for name, entries in self.names.iteritems():
+            caseOutdirs[name] = None
+            if len(entries) == 1:
+                testset, case = entries[0]
+                caseOutdirs[name] = os.path.normpath(
+                    os.path.join(testset.outdir, case.getOutsubdir()))
+
+        interpolator = TestBedConfigParser.interpolator
+        interpolator.setCaseOutdirs(caseOutdirs)
+        for testset in self.testsets:
+            for case in testset.cases:
+                case.interpolateCaseOutdirs(interpolator)
+
+        # Link cases to their dependencies
+        for testset in self.testsets:
+            for case in testset.cases:
+                case.setDependencies([self.getCase(name, case)
+                                      for name in case.getDependsOn()])
+
+        self.checkCycles()
+
+    def checkCycles(self):
+        """
+        Raise an exception naming the cases of a dependency cycle if any
+        """
+        visiting = 1
+        visited = 2
+        state = {}
+        for testset in self.testsets:
+            for case in testset.cases:
+                if id(case) in state:
+                    continue
+
+                # Depth first search keeping the path from the start case
+                state[id(case)] = visiting
+                path = [case]
+                stack = [iter(case.getDependencies())]
+                while len(stack) > 0:
+                    for dependency in stack[-1]:
+                        if state.get(id(dependency)) == visiting:
+                            cycle = path[path.index(dependency):]
+                            raise Exception("Case dependency cycle: " +
+                                            " -> ".join(
+                                                node.getName()
+                                                for node in cycle +
+                                                [dependency]))
+                        if id(dependency) not in state:
+                            state[id(dependency)] = visiting
+                            path.append(dependency)
+                            stack.append(iter(dependency.getDependencies()))
+                            break
+                    else:
+                        state[id(path.pop())] = visited
+                        stack.pop()
+
+    def getDependents(self, cases):
+        """
+        :param cases: Cases
+        :returns: (test set, case) of every case depending directly or
+                  indirectly on the cases
+        """
+        dependents = {}
+        for testset in self.testsets:
+            for case in testset.cases:
+                for dependency in case.getDependencies():
+                    dependents.setdefault(id(dependency), []).append(
+                        (testset, case))
 
-        else:
+        result = []
+        found = set(id(case) for case in cases)
+        pending = list(cases)
+        while len(pending) > 0:
+            for testset, dependent in dependents.get(id(pending.pop()), []):
+                if id(dependent) not in found:
+                    found.add(id(dependent))
+                    result.append((testset, dependent))
+                    pending.append(dependent)
+        return result
 
-            try:
+    @staticmethod
+    def hasDependencies(testsets):
+        """
+        :param testsets: Test sets
+        :returns: True if any case depends on another
+        """
+        for testset in testsets:
+            for case in testset.cases:
+                if len(case.getDependencies()) > 0:
+                    return True
+        return False
 
-                # Get executable path
-                exedir = os.path.dirname(executable)
-                if len(exedir.strip()) == 0:
-                    exedir = os.getcwd()
+class TestCaseLogBuffer:
+    """
+    Buffers a test case's log messages so cases run in parallel are written
+    to the test set logger as one contiguous block.
+    """
 
-                # Make sure log file exists
-                testLogFileToWrite = os.path.normpath(
-                    os.path.join(outdir, self.outsubdir, self.logfile))
-                testLogCreated = checkFileIsWritable(testLogFileToWrite, True)
-                if (testLogCreated is False):
+    # Serializes flushes from concurrently running cases
+    lock = threading.Lock()
 
-                    self.logger.critical("Log file is not writable: " +
-                                         testLogFileToWrite)
-                    return -1;
+    def __init__(self):
+        self.records = []
 
-                # Run command as a subprocess
-                testLogHandle = FileHandler(testLogFileToWrite,'w')
-                process = subprocess.Popen(command,
-                                           stdout=testLogHandle.getHandle(),
-                                           stderr=testLogHandle.getHandle(),
-                                           env=environment,
-                                           cwd=exedir,
-                                           shell=True)
-                status = process.wait()
+    def log(self, level, msg, *args):
+        self.records.append((level, msg, args))
 
-            except Exception, e:
-                message = "Exception occurred launching application: %s" % e
-                self.logger.critical(message)
-                self.logger.critical("Stopping test case.")
-                return -2
+    def debug(self, msg, *args):
+        self.log(logging.DEBUG, msg, *args)
 
-        tElapsed = time.time() - tStart;
-        self.logger.info("Test Case elapsed time (seconds): %i" % tElapsed)
+    def info(self, msg, *args):
+        self.log(logging.INFO, msg, *args)
 
-        return status
+    def warning(self, msg, *args):
+        self.log(logging.WARNING, msg, *args)
 
-    def printSettings(self):
+    def error(self, msg, *args):
+        self.log(logging.ERROR, msg, *args)
+
+    def critical(self, msg, *args):
+        self.log(logging.CRITICAL, msg, *args)
+
+    def flush(self, logger):
         """
-        Print settings to logger
+        Write buffered messages to a logger
+        :param logger: Destination logger
         """
+        with TestCaseLogBuffer.lock:
+            for level, msg, args in self.records:
+                logger.log(level, msg, *args)
+        self.records = []
 
-        fmt = "%15s: %s"
-
-        self.logger.info(fmt, "TEST CASE", self.configFile)
-        self.logger.info(fmt, "DESCRIPTION", self.description)
-        self.logger.info(fmt, "OUTSUBDIR", self.outsubdir)
-        self.logger.info(fmt, "LOG FILE", self.logfile)
+class TestCaseJob:
+    """
+    A test case scheduled to run by the TestCaseScheduler
+    """
 
-        for case, argument in enumerate(self.arguments):
-            self.logger.info(fmt,
-                             "ARGUMENT #" + str(case),
-                             argument.option + " " + argument.value)
+    def __init__(self, testset, caseIndex, case, cpus, memoryMb):
+        """
+        :param testset: Test Set the case belongs to
+        :param caseIndex: Index of the case in the Test Set
+        :param case: Test case
+        :param cpus: Number of CPUs reserved for the case
+        :param memoryMb: Memory (MB) reserved for the case
+        """
+        self.testset = testset
+        self.caseIndex = caseIndex
+        self.case = case
+        self.cpus = cpus
+        self.memoryMb = memoryMb
+        self.bypassed = 0
+        self.attempts = 0
+        self.passed = False
+        self.done = False
+        self.skipped = False
+        self.dependencies = []
+
+class TestCaseScheduler:
+    """
+    Runs the cases of all test sets in parallel, packing them onto the
+    machine according to their declared CPUS and MEMORY_MB so neither is
+    oversubscribed. The largest waiting case is started first; smaller
+    cases may start ahead of a case that does not fit yet, but once a case
+    has been bypassed BYPASS_LIMIT times no other case is started until it
+    fits so large cases are not starved. A case waits for the cases it
+    depends on and is skipped if any of them did not pass.
+    """
 
-        return
+    # Number of times a case can be bypassed before resources are reserved
+    BYPASS_LIMIT=4
 
-    def setLogger(self, logger):
+    def __init__(self, cpus=None, memoryMb=None):
         """
-        Set test case logger. Default is console
+        :param cpus: Number of CPUs available (default all but the core
+                     reserved for the harness)
+        :param memoryMb: Memory (MB) available (default physical memory)
         """
-        self.logger = logger
+        if cpus is None or TestSet.reservedCore is not None:
+            cpusAvailable = multiprocessing.cpu_count()
+            if TestSet.reservedCore is not None:
+                cpusAvailable = max(cpusAvailable - 1, 1)
+            cpus = min(cpus or cpusAvailable, cpusAvailable)
+        if memoryMb is None:
+            memoryMb = TestCaseScheduler.getPhysicalMemoryMb()
+        self.cpus = cpus
+        self.memoryMb = memoryMb
+        self.cpusFree = cpus
+        self.memoryFree = memoryMb
+        self.condition = threading.Condition()
+
+    def getCpus(self):
+        return self.cpus
+
+    def getMemoryMb(self):
+        return self.memoryMb
 
     @staticmethod
-    def createTestCase(outdir, configFile):
+    def getPhysicalMemoryMb():
         """
-        Create a Test Case in a configuration file
-        :param outdir: Test set output directory
-        :param configFile: Test case configuration filename
+        :returns: Physical memory (MB) or 0 if unknown
         """
+        try:
+            return (os.sysconf("SC_PHYS_PAGES") *
+                    os.sysconf("SC_PAGE_SIZE")) // (1024 * 1024)
+        except (AttributeError, ValueError, OSError):
+            return 0
 
-        # Create parser
-        config = TestBedConfigParser()
-        config.interpolator.setOutdir(outdir)
-        config.optionxform = str
-        config.read(configFile)
-
-        # Extract test properties
-        outsubdir=config.parseOption(
-            TestCase.SECTION_TEST,
-            TestCase.PROP_TEST_OUTSUBDIR)
-        config.interpolator.setOutSubdir(outsubdir)
-        description=config.parseOption(
-            TestCase.SECTION_TEST,
-            TestCase.PROP_TEST_DESCRIPTION)
-        logfile=config.parseOption(TestCase.SECTION_TEST,
-                                   TestCase.PROP_TEST_LOGFILE)
-        args=config.parseItemValues(TestCase.SECTION_ARGS)
+    def createJobs(self, testsets, cases=None, bySize=True):
+        """
+        Create a job for every case of the test sets. Cases declaring more
+        resources than available are limited to the available resources
+        so they run alone instead of never running.
+        :param testsets: Test sets to run
+        :param cases: Optional map of test set to the subset of its cases
+                      to run (default all)
+        :param bySize: If True order the jobs from largest to smallest
+                       otherwise keep the configuration order
+        :returns: Jobs
+        """
+        jobs = []
+        for testset in testsets:
+            selected = enumerate(testset.cases)
+            if cases is not None and cases.get(testset) is not None:
+                selected = [(testset.cases.index(case), case)
+                            for case in cases[testset]]
+            for caseIndex, case in selected:
+                cpus = 0
+                memoryMb = 0
+                if case:
+                    cpus = min(max(case.getCpus(), 0), self.cpus)
+                    memoryMb = max(case.getMemoryMb(), 0)
+                    if self.memoryMb > 0:
+                        memoryMb = min(memoryMb, self.memoryMb)
+                jobs.append(TestCaseJob(testset,
+                                        caseIndex,
+                                        case,
+                                        cpus,
+                                        memoryMb))
+
+        # Link jobs to the jobs of the cases they depend on. Dependencies
+        # that are not run are taken as satisfied.
+        caseJobs = dict((id(job.case), job) for job in jobs if job.case)
+        for job in jobs:
+            if job.case:
+                job.dependencies = [caseJobs[id(dependency)]
+                                    for dependency in
+                                    job.case.getDependencies()
+                                    if id(dependency) in caseJobs]
+
+        # Sort is stable so equal sized cases keep their configuration order
+        if bySize:
+            jobs.sort(key=lambda job: (job.cpus, job.memoryMb),
+                      reverse=True)
+        return jobs
+
+    def isReady(self, job):
+        """
+        :param job: Job to check
+        :returns: True if the jobs the job depends on are done and passed
+        """
+        for dependency in job.dependencies:
+            if not dependency.done or not dependency.passed:
+                return False
+        return True
 
-        arguments = []
-        for argument in args:
-            clarg = [CommandLineArgument(argument[0],argument[1])]
-            arguments = arguments + clarg
+    def getFailedDependencies(self, job):
+        """
+        :param job: Job to check
+        :returns: Cases the job depends on that are done and did not pass
+        """
+        return [dependency.case for dependency in job.dependencies
+                if dependency.done and not dependency.passed]
 
-        return TestCase(configFile,
-                        description,
-                        outsubdir,
-                        logfile,
-                        arguments)
+    def fits(self, job):
+        """
+        :param job: Job to check
+        :returns: True if the job's resources are available
+        """
+        return (job.cpus <= self.cpusFree and
+                (self.memoryMb <= 0 or job.memoryMb <= self.memoryFree))
 
-class TestSet:
+    def select(self, pending):
+        """
+        Select the next pending job to start
+        :param pending: Pending jobs ordered from largest to smallest
+        :returns: Job to start or None if none can start
+        """
+        for index, job in enumerate(pending):
+            if not self.isReady(job):
+                continue
+            if self.fits(job):
+                for bypassedJob in pending[:index]:
+                    if self.isReady(bypassedJob):
+                        bypassedJob.bypassed += 1
+                return job
+            if job.bypassed >= TestCaseScheduler.BYPASS_LIMIT:
+                return None
+        return None
+
+    def runJob(self, job, dryrun):
+        """
+        Run a job and release its resources
+        :param job: Job to run
+        :param dryrun: True if performing a dry run
+        """
+        try:
+            buffer = TestCaseLogBuffer()
+            job.passed = job.testset.runCase(job.caseIndex,
+                                             job.case,
+                                             dryrun,
+                                             buffer)
+            buffer.flush(job.testset.logger)
+        finally:
+            with self.condition:
+                self.cpusFree += job.cpus
+                self.memoryFree += job.memoryMb
+                job.done = True
+                self.condition.notify()
+
+    def skipJob(self, job):
+        """
+        Skip a job because a job it depends on did not pass
+        :param job: Job to skip
+        """
+        buffer = TestCaseLogBuffer()
+        job.testset.skipCase(job.caseIndex,
+                             job.case,
+                             self.getFailedDependencies(job),
+                             buffer)
+        buffer.flush(job.testset.logger)
+        job.skipped = True
+        job.done = True
+
+    def skipFailedJobs(self, pending):
+        """
+        Skip the pending jobs depending on jobs that did not pass, directly
+        or through other skipped jobs
+        :param pending: Pending jobs; skipped jobs are removed
+        :returns: Number of jobs skipped
+        """
+        numSkipped = 0
+        while True:
+            failed = [job for job in pending
+                      if len(self.getFailedDependencies(job)) > 0]
+            if len(failed) == 0:
+                return numSkipped
+            for job in failed:
+                pending.remove(job)
+                self.skipJob(job)
+            numSkipped += len(failed)
+
+    def run(self, testsets, dryrun=False, cases=None):
+        """
+        Run all cases of the test sets
+        :param testsets: Test sets to run
+        :param dryrun: True if performing a dry run
+        :param cases: Optional map of test set to the subset of its cases
+                      to run (default all)
+        :returns: Number of failed tests
+        """
+        for testset in testsets:
+            testset.begin()
+
+        jobs = self.createJobs(testsets, cases)
+        pending = list(jobs)
+        threads = []
+
+        with self.condition:
+            while len(pending) > 0:
+
+                # Skip jobs depending on jobs that did not pass
+                self.skipFailedJobs(pending)
+                if len(pending) == 0:
+                    break
+
+                job = self.select(pending)
+                if job is None:
+                    self.condition.wait()
+                    continue
+                pending.remove(job)
+                self.cpusFree -= job.cpus
+                self.memoryFree -= job.memoryMb
+                thread = threading.Thread(target=self.runJob,
+                                          args=(job, dryrun))
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        numFailTotal = 0
+        for testset in testsets:
+            setJobs = [job for job in jobs if job.testset is testset]
+            numPass = len([job for job in setJobs if job.passed])
+            numSkip = len([job for job in setJobs if job.skipped])
+            numFailTotal += testset.end(len(setJobs), numPass, numSkip)
+
+        return numFailTotal
+
+class TestCaseSerialScheduler(TestCaseScheduler):
     """
-    A collection of Test Cases for a single executable.
+    Runs the cases of all test sets one at a time in configuration order
+    as a serial run does, only deferring a case until the cases it depends
+    on are done. A Test Set header is written before its first case and
+    its totals once all its cases are done. A case is skipped if any case
+    it depends on did not pass.
     """
 
-    # ========================================
-    # SECTION PROPERTIES
-    # ========================================
-    PROP_GROUP_EXECUTABLE="EXECUTABLE"
-    PROP_GROUP_SUCCESSCODE="SUCCESSCODE"
-    PROP_GROUP_TESTDIR="TESTDIR"
-    PROP_GROUP_TESTCASES="TESTCASES"
-    PROP_GROUP_OUTDIR="OUTDIR"
-    PROP_GROUP_PATHDIRS="PATHDIRS"
-    PROP_GROUP_LOGFILE="LOGFILE"
-    PROP_GROUP_LOGLEVEL="LOGLEVEL"
-
-    # ========================================
-    # DEFAULT PROPERTIES
-    # ========================================
-    PROP_GROUP_SUCCESSCODE_DEFAULT=0
-    PROP_GROUP_LOGLEVEL_DEFAULT="DEBUG"
-
-    # ========================================
-    # CONFIGURATION EXTENSIONS
-    # ========================================
-    CONFIG_EXTENSION=".json"
+    def __init__(self):
+        TestCaseScheduler.__init__(self, 1, 0)
 
-    def __init__(self,
-                 name,
-                 executable,
-                 successCode,
-                 outdir,
-                 cases,
-                 pathdirs=None,
-                 logfile=None,
-                 loglevel=None):
+    def run(self, testsets, dryrun=False, cases=None):
         """
-        :param name: Set name
-        :param executable: Set executable path
-        :param executable: Set executable succes return code
-        :param outdir: Output directory
-        :param cases: Test case files to be run for this Set
-        :param pathdirs: Optional list of directories to add to system path
-        :param environment: OS Environment to run Test Cases
-        :param logger: Log file to write test results
+        Run all cases of the test sets
+        :param testsets: Test sets to run
+        :param dryrun: True if performing a dry run
+        :param cases: Optional map of test set to the subset of its cases
+                      to run (default all)
+        :returns: Number of failed tests
         """
-        self.name = name
-        self.executable = executable
-        self.successCode = successCode
-        self.outdir = outdir
-        self.cases = cases
-        self.pathdirs = pathdirs
-        self.logfile = logfile
-        self.loglevel = loglevel
+        jobs = self.createJobs(testsets, cases, False)
+        pending = list(jobs)
+        begun = set()
+        ended = set()
+
+        numFailTotal = 0
+        for testset in testsets:
+            if testset not in begun:
+                testset.begin()
+                begun.add(testset)
+
+            while True:
+
+                # End the sets whose cases are all done
+                for other in testsets:
+                    if other not in begun or other in ended:
+                        continue
+                    if any(job.testset is other for job in pending):
+                        continue
+                    setJobs = [job for job in jobs if job.testset is other]
+                    numPass = len([job for job in setJobs if job.passed])
+                    numSkip = len([job for job in setJobs if job.skipped])
+                    numFailTotal += other.end(len(setJobs), numPass, numSkip)
+                    ended.add(other)
+                if testset in ended:
+                    break
+
+                # Next case in configuration order whose dependencies are
+                # done; it runs only if they all passed
+                job = None
+                for candidate in pending:
+                    if (self.isReady(candidate) or
+                        len(self.getFailedDependencies(candidate)) > 0):
+                        job = candidate
+                        break
+                if job is None:
+                    raise Exception("Unable to order dependent cases")
+                pending.remove(job)
+
+                if job.testset not in begun:
+                    job.testset.begin()
+                    begun.add(job.testset)
+                if self.isReady(job):
+                    job.passed = job.testset.runCase(job.caseIndex,
+                                                     job.case,
+                                                     dryrun)
+                    job.done = True
+                else:
+                    self.skipJob(job)
+
+        return numFailTotal
+
+class TestCaseCoordinator(TestCaseScheduler):
+    """
+    Runs the cases of all test sets on worker processes (clitestbed.py
+    --worker) connected over TCP instead of on this machine. Workers pull
+    one case at a time and send back its status, timings, log messages and
+    compressed output, which are written to the test set logs as if the
+    case had run locally. A case whose worker disconnects or stops sending
+    heartbeats is re-queued for another worker, and the run fails once no
+    worker has been connected for the worker timeout. Workers load the
+    configuration file themselves so the configuration, case files and
+    executables must be found at the same paths on every machine.
+    """
 
-        self.logger = None
-        self.loggerHandler = None
-        self.environment = None
+    # Protocol version; peers of another version are rejected
+    PROTOCOL_VERSION=3
 
-        # Initialize derived properties: logger, system environment, etc.
-        self.initialize()
+    # Seconds between worker heartbeats while a case runs
+    HEARTBEAT_INTERVAL=5
 
-    def __del__ (self):
-    
-        # Clean up handler
-        if self.loggerHandler is not None:
-            self.logger.removeHandler(self.loggerHandler)
-            self.loggerHandler.close()
+    # Seconds without a worker message after which the worker is lost
+    HEARTBEAT_TIMEOUT=60
 
-    def initialize(self):
+    # Number of workers a case is handed to before it is failed
+    MAX_ATTEMPTS=3
 
-        # Build log file path
-        logFilePath = None
-        logFileValid = self.logfile is not None
-        if logFileValid:
-            logFilePath = os.path.normpath(os.path.join(self.outdir,
-                                                        self.logfile))
-            logFileValid = checkFileIsWritable(logFilePath, True)
+    # Seconds without any connected worker after which the run fails
+    WORKER_TIMEOUT=300
 
-        # Extract log level
-        logNumericLevel = getattr(logging, self.loglevel.upper(), None)
-        isLogLevelValid = isinstance(logNumericLevel, int)
-        if not isLogLevelValid:
-            logNumericLevel = getattr(logging,
-                                      TestSet.PROP_GROUP_LOGLEVEL_DEFAULT,
-                                      None)
+    def __init__(self, configFile, host, port, workerTimeout=None):
+        """
+        :param configFile: Configuration file the workers load
+        :param host: Address to listen for workers on
+        :param port: Port to listen for workers on (0 for any free port)
+        :param workerTimeout: Seconds without any connected worker after
+                              which the run fails (default WORKER_TIMEOUT)
+        """
+        TestCaseScheduler.__init__(self)
+        self.configFile = os.path.abspath(configFile)
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(16)
+        self.server.settimeout(1.0)
+        self.dryrun = False
+        self.jobs = []
+        self.jobIds = {}
+        self.pending = []
+        self.numDone = 0
+        self.workerTimeout = workerTimeout
+        if self.workerTimeout is None:
+            self.workerTimeout = TestCaseCoordinator.WORKER_TIMEOUT
+        self.numWorkers = 0
+        self.tIdle = None
+
+    def getAddress(self):
+        """
+        :returns: (host, port) the coordinator listens on
+        """
+        return self.server.getsockname()
 
-        # Create logger        
-        self.logger = logging.getLogger(self.name)
-        self.logger.setLevel(logNumericLevel)
-        formatter = logging.Formatter(
-            '%(asctime)s: %(levelname)10s: %(message)s',
-            '%Y-%m-%d %H:%M:%S')
+    @staticmethod
+    def send(connection, message, lock=None):
+        """
+        Send a message as one line of JSON
+        :param connection: Socket to send to
+        :param message: Message dictionary
+        :param lock: Optional lock serializing senders of the connection
+        """
+        data = json.dumps(message) + "\n"
+        if lock is None:
+            connection.sendall(data)
+            return
+        with lock:
+            connection.sendall(data)
 
-        # Add console handler to logger
-        consoleHandler = logging.StreamHandler()
-        consoleHandler.setFormatter(formatter)
-        self.logger.addHandler(consoleHandler)
+    @staticmethod
+    def receive(reader):
+        """
+        Receive a message
+        :param reader: File object reading the connection
+        :returns: Message dictionary
+        """
+        line = reader.readline()
+        if not line.endswith("\n"):
+            raise socket.error("Connection closed")
+        message = json.loads(line)
+        if message.get("type") == "error":
+            raise socket.error(message.get("message"))
+        return message
+
+    def skipPendingJobs(self):
+        """
+        Skip the pending jobs depending on jobs that did not pass, directly
+        or through other skipped jobs. Must be called with the condition
+        held.
+        """
+        numSkipped = self.skipFailedJobs(self.pending)
+        if numSkipped > 0:
+            self.numDone += numSkipped
+            self.condition.notify_all()
 
-        # Add file handler to logger
+    def acquireJob(self):
+        """
+        Wait for a pending job that is ready to run
+        :returns: Job or None once all jobs are done
+        """
+        with self.condition:
+            while True:
+                self.skipPendingJobs()
+                if self.numDone == len(self.jobs):
+                    return None
+                for job in self.pending:
+                    if self.isReady(job):
+                        self.pending.remove(job)
+                        job.attempts += 1
+                        return job
+                self.condition.wait(1.0)
+
+    def requeueJob(self, job, worker):
+        """
+        Hand a job whose worker was lost to another worker, or fail it
+        once it has been handed to MAX_ATTEMPTS workers
+        :param job: Job
+        :param worker: Name of the lost worker
+        """
+        if job.attempts >= TestCaseCoordinator.MAX_ATTEMPTS:
+            message = ("Test Case lost with %i workers (last %s). "
+                       "Stopping test case." % (job.attempts, worker))
+            self.completeJob(job,
+                             {"status": None,
+                              "log": [[logging.CRITICAL, message]]},
+                             worker)
+            return
+
+        job.testset.logger.warning("Worker %s lost running CASE # %i. "
+                                   "Re-queued." % (worker, job.caseIndex+1))
+        with self.condition:
+            self.pending.insert(0, job)
+            self.condition.notify_all()
+
+    def applyResult(self, job, result, worker, logger, output=None):
+        """
+        Apply the result of a case run by a worker as if it had run locally
+        :param job: Job
+        :param result: Result message of the worker
+        :param worker: Name of the worker
+        :param logger: Logger to write the case results to
+        :param output: Optional file holding the case output
+        :returns: Case return status
+        """
+        logger.info("Test Case worker: %s" % worker)
+        for level, message in result["log"]:
+            logger.log(level, message)
+
+        job.case.setRunResult(result.get("elapsed"),
+                              result.get("cpuTime"),
+                              result.get("peakRss"))
+
+        if output is not None:
+            tPhase = profiler.start()
+            job.case.storeOutput(
+                output,
+                job.testset.outdir,
+                job.testset.archive,
+                job.testset.compression,
+                job.testset.compressionThreshold)
+            profiler.stop(HarnessProfiler.PHASE_LOGWRITE, tPhase)
+
+        return result["status"]
+
+    def completeJob(self, job, result, worker, output=None):
+        """
+        Report the result of a job and mark it done
+        :param job: Job
+        :param result: Result message of the worker
+        :param worker: Name of the worker
+        :param output: Optional file holding the case output
+        """
         try:
-            if logFileValid:
-                self.loggerHandler = logging.FileHandler(normalizePath(
-                    os.path.normpath(logFilePath)))
-                self.loggerHandler.setFormatter(formatter)
-                self.logger.addHandler(self.loggerHandler)
-        except:
-            self.logger.critical("Unable to create file logger: " + logFilePath)
+            buffer = TestCaseLogBuffer()
+            runner = lambda case, logger: self.applyResult(job, result,
+                                                           worker, logger,
+                                                           output)
+            job.passed = job.testset.runCase(job.caseIndex,
+                                             job.case,
+                                             self.dryrun,
+                                             buffer,
+                                             runner)
+            buffer.flush(job.testset.logger)
+        finally:
+            with self.condition:
+                job.done = True
+                self.numDone += 1
+                self.condition.notify_all()
+
+    def serveWorker(self, connection, address):
+        """
+        Hand jobs to a connected worker until all jobs are done. The worker
+        is counted as connected by run before it is served.
+        :param connection: Worker socket
+        :param address: Worker address
+        """
+        worker = "%s:%i" % address
+        job = None
+        output = None
+        try:
+            connection.settimeout(TestCaseCoordinator.HEARTBEAT_TIMEOUT)
+            reader = connection.makefile('rb')
+            hello = TestCaseCoordinator.receive(reader)
+            if hello.get("version") != TestCaseCoordinator.PROTOCOL_VERSION:
+                TestCaseCoordinator.send(connection,
+                                         {"type": "error",
+                                          "message": "Protocol version "
+                                                     "mismatch"})
+                raise socket.error("Protocol version %s" %
+                                   hello.get("version"))
+            worker = hello.get("worker", worker)
+            TestCaseCoordinator.send(connection,
+                                     {"type": "config",
+                                      "version":
+                                          TestCaseCoordinator.PROTOCOL_VERSION,
+                                      "config": self.configFile,
+                                      "cwd": os.getcwd(),
+                                      "fixtureCache": FixtureCache.directory,
+                                      "dryrun": self.dryrun})
+            print "Worker connected: %s" % worker
+            sys.stdout.flush()
+
+            while True:
+                job = self.acquireJob()
+                if job is None:
+                    TestCaseCoordinator.send(connection, {"type": "done"})
+                    break
+                TestCaseCoordinator.send(connection,
+                                         {"type": "job",
+                                          "id": self.jobIds[id(job)],
+                                          "set": job.testset.name,
+                                          "case": job.case.getConfigFile()})
+
+                # Output arrives in compressed chunks before the result and
+                # is collected in a temporary file
+                decompressor = None
+                while True:
+                    result = TestCaseCoordinator.receive(reader)
+                    if result.get("id") != self.jobIds[id(job)]:
+                        continue
+                    if result.get("type") == "output":
+                        if output is None:
+                            output = tempfile.TemporaryFile()
+                            decompressor = zlib.decompressobj()
+                        output.write(decompressor.decompress(
+                            base64.b64decode(result["data"])))
+                    elif result.get("type") == "result":
+                        break
+                if output is not None:
+                    output.write(decompressor.flush())
+                    output.seek(0)
+                finished = job
+                job = None
+                self.completeJob(finished, result, worker, output)
+                if output is not None:
+                    output.close()
+                    output = None
+
+        except Exception as e:
+            print "Worker lost: %s (%s)" % (worker, e)
+            sys.stdout.flush()
+            if job is not None:
+                self.requeueJob(job, worker)
+        finally:
+            connection.close()
+            if output is not None:
+                output.close()
+            with self.condition:
+                self.numWorkers -= 1
+                if self.numWorkers == 0:
+                    self.tIdle = time.time()
+
+    def run(self, testsets, dryrun=False, cases=None):
+        """
+        Run all cases of the test sets on the connected workers
+        :param testsets: Test sets to run
+        :param dryrun: True if performing a dry run
+        :param cases: Optional map of test set to the subset of its cases
+                      to run (default all)
+        :returns: Number of failed tests
+        """
+        for testset in testsets:
+            testset.begin()
+
+        self.dryrun = dryrun
+        self.jobs = self.createJobs(testsets, cases)
+        self.jobIds = dict((id(job), index)
+                           for index, job in enumerate(self.jobs))
+        self.pending = list(self.jobs)
+        self.numDone = 0
+        self.tIdle = time.time()
+
+        print "Waiting for workers on %s:%i" % self.getAddress()
+        sys.stdout.flush()
 
-        # Warn user about logger failures
-        if not logFileValid:
-            self.logger.critical(('Invalid log file: %s' % logFilePath))
+        threads = []
+        try:
+            while True:
+                with self.condition:
+                    self.skipPendingJobs()
+                    if self.numDone == len(self.jobs):
+                        break
+                    if (self.numWorkers == 0 and
+                        time.time() - self.tIdle > self.workerTimeout):
+                        raise Exception("No worker connected for %i "
+                                        "seconds" % self.workerTimeout)
+                try:
+                    connection, address = self.server.accept()
+                except socket.timeout:
+                    continue
+                with self.condition:
+                    self.numWorkers += 1
+                thread = threading.Thread(target=self.serveWorker,
+                                          args=(connection, address))
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+        finally:
+            self.server.close()
+
+        for thread in threads:
+            thread.join()
+
+        numFailTotal = 0
+        for testset in testsets:
+            setJobs = [job for job in self.jobs if job.testset is testset]
+            numPass = len([job for job in setJobs if job.passed])
+            numSkip = len([job for job in setJobs if job.skipped])
+            numFailTotal += testset.end(len(setJobs), numPass, numSkip)
+
+        return numFailTotal
+
+class TestBedWorker:
+    """
+    Runs the cases handed out by a TestCaseCoordinator (clitestbed.py
+    --coordinator). The worker loads the coordinator's configuration file,
+    runs one case at a time with its output written to a private directory
+    and sends back the case status, timings, log messages and compressed
+    output. It exits once the coordinator has no more cases.
+    """
 
-        if not isLogLevelValid:
-            self.logger.critical(('Invalid log level: %s' % self.loglevel))
-            self.logger.critical("Setting log level to " +
-                                 TestSet.PROP_GROUP_LOGLEVEL_DEFAULT)
+    # Seconds to keep retrying to connect to the coordinator
+    CONNECT_TIMEOUT=60
 
-        # Modify test set system environment
-        if self.pathdirs is not None:
-            self.environment = os.environ.copy()
-            for pathdir in self.pathdirs:
-                self.environment["PATH"] = (os.path.normpath(str(pathdir)) +
-                                            os.pathsep +
-                                            self.environment["PATH"])
+    # Bytes of case output read and sent at a time
+    OUTPUT_CHUNK_SIZE=1048576
 
-    def printSettings(self):
+    def __init__(self, host, port):
         """
-        Print settings to logger
+        :param host: Coordinator address
+        :param port: Coordinator port
         """
+        self.host = host
+        self.port = port
+        self.name = "%s:%i" % (socket.gethostname(), os.getpid())
+        self.connection = None
+        self.sendLock = threading.Lock()
+        self.cases = {}
+        self.outdir = None
+        self.dryrun = False
 
-        fmt = "%10s: %s"
+    def connect(self):
+        """
+        Connect to the coordinator, retrying until it is listening
+        :returns: Coordinator socket
+        """
+        tStart = time.time()
+        while True:
+            try:
+                return socket.create_connection((self.host, self.port))
+            except socket.error:
+                if time.time() - tStart > TestBedWorker.CONNECT_TIMEOUT:
+                    raise
+                time.sleep(1.0)
 
-        self.logger.info(fmt, "TEST SET", self.name)
-        self.logger.info(fmt, "EXECUTABLE", self.executable)
-        self.logger.info(fmt, "OUTPUT DIR", self.outdir)
+    def send(self, message):
+        TestCaseCoordinator.send(self.connection, message, self.sendLock)
 
-        for index, case in enumerate(self.cases):
-            caseFile = "None"
-            if case is not None:
-                caseFile = case.getConfigFile()
-            self.logger.info(fmt, "CASE #" + str(index+1), caseFile)
+    def sendHeartbeats(self, stop):
+        """
+        Send heartbeats until stopped so the coordinator knows the worker
+        is alive while a long case runs
+        :param stop: Event set to stop
+        """
+        while not stop.wait(TestCaseCoordinator.HEARTBEAT_INTERVAL):
+            try:
+                self.send({"type": "heartbeat"})
+            except socket.error:
+                return
 
-        for pathdir in self.pathdirs:
-            self.logger.info(fmt, "PATHDIRS", pathdir)
+    def sendOutput(self, jobId, path):
+        """
+        Send a case output file as compressed chunks so it is never held
+        in memory or sent as a whole
+        :param jobId: Job identifier
+        :param path: Case output file
+        """
+        compressor = zlib.compressobj()
+        with open(path, 'rb') as handle:
+            for chunk in iter(lambda: handle.read(
+                    TestBedWorker.OUTPUT_CHUNK_SIZE), ""):
+                data = compressor.compress(chunk)
+                if len(data) > 0:
+                    self.send({"type": "output",
+                               "id": jobId,
+                               "data": base64.b64encode(data)})
+        self.send({"type": "output",
+                   "id": jobId,
+                   "data": base64.b64encode(compressor.flush())})
+
+    def load(self, configFile):
+        """
+        Load the test sets of the coordinator's configuration file
+        :param configFile: Configuration file
+        """
+        logger = logging.getLogger("clitestbed.worker")
+        if len(logger.handlers) == 0:
+            logger.addHandler(logging.StreamHandler())
+
+        # Sets create no log files on the worker but their cases run, so
+        # fixture and workspace paths are resolved as for a local run
+        self.cases = {}
+        for testset in TestSet.createTestSets(configFile,
+                                              readOnly=True,
+                                              resolvePaths=True):
+            testset.logger = logger
+            testset.initializeProcessSettings()
+            for case in testset.cases:
+                self.cases.setdefault((testset.name, case.getConfigFile()),
+                                      (testset, case))
+
+    def runJob(self, job):
+        """
+        Run a case handed out by the coordinator and send its output
+        :param job: Job message
+        :returns: Result message
+        """
+        testset, case = self.cases.get((job["set"], job["case"]),
+                                       (None, None))
+        if case is None:
+            return {"type": "result",
+                    "id": job["id"],
+                    "status": None,
+                    "log": [[logging.CRITICAL,
+                             "Test case not found on worker %s" % self.name]]}
+
+        buffer = TestCaseLogBuffer()
+        case.setLogger(buffer)
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self.sendHeartbeats,
+                                     args=(stop,))
+        heartbeat.daemon = True
+        heartbeat.start()
+        try:
+            try:
+                status = case.run(testset.executable,
+                                  self.outdir,
+                                  testset.environment,
+                                  self.dryrun,
+                                  preexec=testset.preexec)
+            except Exception as e:
+                status = None
+                buffer.critical("An unhandled exception occurred when "
+                                "running case: %s" % e)
+            if not self.dryrun:
+                try:
+                    case.cleanupWorkspace(status == testset.successCode,
+                                          testset.workspaceKeep)
+                except Exception as e:
+                    buffer.error("Unable to remove workspace: %s" % e)
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        logPath = case.getLogPath(self.outdir)
+        if os.path.isfile(logPath):
+            try:
+                self.sendOutput(job["id"], logPath)
+            finally:
+                os.remove(logPath)
+
+        return {"type": "result",
+                "id": job["id"],
+                "status": status,
+                "elapsed": case.getElapsed(),
+                "cpuTime": case.getCpuTime(),
+                "peakRss": case.getPeakRss(),
+                "log": [[level, msg % args if args else msg]
+                        for level, msg, args in buffer.records]}
+
+    def run(self):
+        """
+        Run cases until the coordinator has no more
+        :returns: Number of cases run
+        """
+        self.connection = self.connect()
+        try:
+            reader = self.connection.makefile('rb')
+            self.send({"type": "hello",
+                       "version": TestCaseCoordinator.PROTOCOL_VERSION,
+                       "worker": self.name})
+            config = TestCaseCoordinator.receive(reader)
+            print "Connected to coordinator %s:%i" % (self.host, self.port)
+            sys.stdout.flush()
 
-        return
+            try:
+                os.chdir(config["cwd"])
+                FixtureCache.directory = config["fixtureCache"]
+                self.dryrun = config["dryrun"]
+                self.load(config["config"])
+            except Exception as e:
+                self.send({"type": "error", "message": str(e)})
+                raise
+
+            numCases = 0
+            self.outdir = tempfile.mkdtemp(prefix="clitestbed-worker-")
+            try:
+                while True:
+                    job = TestCaseCoordinator.receive(reader)
+                    if job.get("type") == "done":
+                        break
+                    result = self.runJob(job)
+                    print "%s: %s: %s" % (job["set"], job["case"],
+                                          result["status"])
+                    sys.stdout.flush()
+                    self.send(result)
+                    numCases += 1
+            finally:
+                shutil.rmtree(self.outdir, ignore_errors=True)
+        finally:
+            self.connection.close()
+
+        return numCases
+
+class FileWatcher:
+    """
+    Watches files, and the entries of directories, for changes. Linux
+    inotify (through the C library) is used to sleep until something in
+    the watched directories changes; where it is unavailable the files
+    are polled instead. A file has changed when its modification time,
+    size or inode differ from when it was last seen, so files replaced by
+    build tools and editors (written elsewhere and renamed) are detected.
+    """
 
-    def run(self, dryrun = False):
+    # ========================================
+    # INOTIFY
+    # ========================================
+    IN_ATTRIB=0x00000004
+    IN_CLOSE_WRITE=0x00000008
+    IN_MOVED_FROM=0x00000040
+    IN_MOVED_TO=0x00000080
+    IN_CREATE=0x00000100
+    IN_DELETE=0x00000200
+    IN_Q_OVERFLOW=0x00004000
+    IN_NONBLOCK=0x00000800
+    IN_CLOEXEC=0x00080000
+    IN_MASK=(IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+             IN_CREATE | IN_DELETE)
+    IN_EVENT=struct.Struct("iIII")
+    IN_BUFFER_SIZE=65536
+
+    # Seconds between polls when inotify is not available
+    POLL_INTERVAL=1.0
+
+    # Seconds without changes that end a burst of changes
+    DEBOUNCE=0.5
+
+    def __init__(self, paths, directories=None, debounce=DEBOUNCE,
+                 pollInterval=POLL_INTERVAL):
         """
-        Run Test Set cases
+        :param paths: Files to watch
+        :param directories: Directories whose entries are watched
+        :param debounce: Seconds without changes that end a burst of changes
+        :param pollInterval: Seconds between polls without inotify
         """
+        self.paths = set(os.path.abspath(path) for path in paths)
+        self.directories = set(os.path.abspath(directory)
+                               for directory in directories or [])
+        self.debounce = debounce
+        self.pollInterval = pollInterval
+        self.inotifyFd = None
+        self.watches = {}
 
-        self.logger.info("========================================")
-        self.printSettings()
+        self.snapshot = {}
+        for path in self.listPaths():
+            self.snapshot[path] = FileWatcher.stat(path)
 
-        numTest = 0
-        numPass = 0
-        for caseIndex, case in enumerate(self.cases):
+        self.initializeInotify()
 
-            numTest += 1
+    def initializeInotify(self):
+        """
+        Watch the directories containing the watched files with inotify.
+        Falls back to polling if any directory cannot be watched.
+        """
+        libc = loadLibc()
+        if libc is None or not hasattr(libc, "inotify_init1"):
+            return
 
-            self.logger.info("----------------------------------------")
-            self.logger.info("Running CASE # " + str(caseIndex+1))
+        fd = libc.inotify_init1(FileWatcher.IN_NONBLOCK |
+                                FileWatcher.IN_CLOEXEC)
+        if fd < 0:
+            return
 
-            if not case:
-                self.logger.error("No test case found. Skipping.")
-                continue
+        directories = (set(os.path.dirname(path) for path in self.paths) |
+                       self.directories)
+        for directory in directories:
+            path = directory
+            if isinstance(path, unicode):
+                path = path.encode(sys.getfilesystemencoding())
+            wd = libc.inotify_add_watch(fd, path, FileWatcher.IN_MASK)
+            if wd < 0:
+                os.close(fd)
+                self.watches = {}
+                return
+            self.watches[wd] = directory
+
+        self.inotifyFd = fd
+
+    def close(self):
+        if self.inotifyFd is not None:
+            os.close(self.inotifyFd)
+            self.inotifyFd = None
+
+    def isInotify(self):
+        return self.inotifyFd is not None
+
+    def getCount(self):
+        """
+        :returns: Number of files watched
+        """
+        return len(self.snapshot)
 
-            # Write case options
-            case.setLogger(self.logger)
-            case.printSettings()
+    @staticmethod
+    def stat(path):
+        """
+        :param path: File path
+        :returns: (modification time, size, inode) or None if missing
+        """
+        try:
+            status = os.stat(path)
+        except OSError:
+            return None
+        return (status.st_mtime, status.st_size, status.st_ino)
 
-            # Run test case
+    def listPaths(self):
+        """
+        :returns: Watched files and the current entries of watched directories
+        """
+        paths = set(self.paths)
+        for directory in self.directories:
             try:
-                status = case.run(self.executable,
-                                  self.outdir,
-                                  self.environment,
-                                  dryrun)
-                if dryrun:
-                    status = self.successCode
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                paths.add(os.path.join(directory, name))
+        return paths
 
-                if (status == self.successCode):
-                    numPass+=1
-            except:
-                status = None
-                self.logger.critical("An unhandled exception occurred when " +
-                                     "running case. Skipping.")
+    def isWatched(self, path):
+        return path in self.paths or os.path.dirname(path) in self.directories
 
-            if status == self.successCode:
-                self.logger.info("Test Case return status: %i" % status)
-            else:
-                self.logger.error("Test Case return status: %i" % status)
+    def readEvents(self, timeout):
+        """
+        Wait for inotify events
+        :param timeout: Maximum seconds to wait (None waits forever)
+        :returns: Watched paths named by the events
+        """
+        readable = select.select([self.inotifyFd], [], [], timeout)[0]
+        if len(readable) == 0:
+            return set()
 
-        numFail = numTest-numPass
-        self.logger.info("----------------------------------------")
-        self.logger.info("TOTAL NUMBER OF TESTS: " + str(numTest))
-        self.logger.info("TOTAL NUMBER OF PASS: " + str(numPass))
-        self.logger.info("TOTAL NUMBER OF FAIL: " + str(numFail))
+        try:
+            data = os.read(self.inotifyFd, FileWatcher.IN_BUFFER_SIZE)
+        except OSError:
+            return set()
+
+        paths = set()
+        offset = 0
+        while offset + FileWatcher.IN_EVENT.size <= len(data):
+            wd, mask, cookie, length = FileWatcher.IN_EVENT.unpack_from(
+                data, offset)
+            offset += FileWatcher.IN_EVENT.size
+            name = data[offset:offset + length].rstrip("\0")
+            offset += length
+
+            # Events were lost so check everything
+            if mask & FileWatcher.IN_Q_OVERFLOW:
+                return self.listPaths() | set(self.snapshot)
+
+            directory = self.watches.get(wd)
+            if directory is None or len(name) == 0:
+                continue
+            path = os.path.join(directory, name)
+            if self.isWatched(path):
+                paths.add(path)
+        return paths
 
-        return numFail
+    def readChanges(self, timeout):
+        """
+        Wait for changes to the watched files
+        :param timeout: Maximum seconds to wait (None waits forever)
+        :returns: Changed paths
+        """
+        if self.inotifyFd is not None:
+            candidates = self.readEvents(timeout)
+        else:
+            time.sleep(timeout if timeout is not None else self.pollInterval)
+            candidates = self.listPaths() | set(self.snapshot)
+
+        changed = set()
+        for path in candidates:
+            status = FileWatcher.stat(path)
+            if status != self.snapshot.get(path):
+                changed.add(path)
+            if status is None:
+                self.snapshot.pop(path, None)
+            else:
+                self.snapshot[path] = status
+        return changed
 
-    @staticmethod
-    def createTestSet(configFile, section):
+    def wait(self):
         """
-        Create a new Test Set
-        :param configFile: Configuration filename
-        :param section: Name of test Set to extract to extract
+        Wait for a burst of changes to the watched files to end
+        :returns: Paths changed during the burst
         """
+        changed = set()
+        while len(changed) == 0:
+            changed = self.readChanges(None)
+
+        while True:
+            burst = self.readChanges(self.debounce)
+            if len(burst) == 0:
+                break
+            changed |= burst
+        return changed
+
+class TestBedWatch:
+    """
+    Watch mode. Runs the test sets of a configuration file then waits for
+    their executables, PATHDIRS binaries, configuration file or case files
+    to change and re-runs only the sets and cases affected. The parsed test
+    sets are kept between runs: a changed case file only reloads that case
+    and only a changed configuration file reloads everything.
+    """
 
-        # Create parser
-        config = TestBedConfigParser()
-        config.optionxform = str
-        config.read(configFile)
+    def __init__(self, configFile, dryRun=False, scheduler=None,
+                 debounce=FileWatcher.DEBOUNCE):
+        """
+        :param configFile: Configuration file
+        :param dryRun: True if performing a dry run otherwise False
+        :param scheduler: Optional TestCaseScheduler to run cases in parallel
+        :param debounce: Seconds without changes that end a burst of changes
+        """
+        self.configFile = os.path.abspath(configFile)
+        self.dryRun = dryRun
+        self.scheduler = scheduler
+        self.debounce = debounce
+        self.testsets = []
+        self.watcher = None
 
-        # Extract executable path
-        exePath = config.parseOption(section, TestSet.PROP_GROUP_EXECUTABLE)
+        # Watched path -> [(test set, case file or None for the whole set)]
+        self.targets = {}
 
-        # Extract success code
-        successCode = TestSet.PROP_GROUP_SUCCESSCODE_DEFAULT
-        if config.has_option(section, TestSet.PROP_GROUP_SUCCESSCODE):
-            successCode = config.parseOption(section,
-                                             TestSet.PROP_GROUP_SUCCESSCODE)
+        # Watched directory -> [(test set, True if only case files)]
+        self.directoryTargets = {}
 
-        # Extract output directory
-        outDir = config.parseOption(section, TestSet.PROP_GROUP_OUTDIR)
-        config.interpolator.setOutdir(outDir)
+    def load(self):
+        """
+        Load (or reload) the test sets of the configuration file
+        """
+        testsets = TestSet.createTestSets(self.configFile)
+        for testset in self.testsets:
+            testset.close()
+        self.testsets = testsets
 
-        # Extract test files by concatenating
-        testFiles = []
+    def addTarget(self, path, testset, caseFile=None):
+        path = os.path.abspath(path)
+        self.targets.setdefault(path, []).append((testset, caseFile))
 
-        if config.has_option(section, TestSet.PROP_GROUP_TESTDIR):
-            testDir = config.parseOption(section, TestSet.PROP_GROUP_TESTDIR)
-            globStr = (testDir.replace('"','') +
-                       os.path.sep +
-                       "*" +
-                       TestSet.CONFIG_EXTENSION)
-            testDirFiles = glob.glob(globStr)
-            testFiles = testFiles + testDirFiles
+    def addDirectoryTarget(self, directory, testset, casesOnly):
+        directory = os.path.abspath(directory.replace('"', ''))
+        self.directoryTargets.setdefault(directory, []).append((testset,
+                                                                casesOnly))
 
-        if config.has_option(section, TestSet.PROP_GROUP_TESTCASES):
-            testCases = config.parseOption(section,TestSet.PROP_GROUP_TESTCASES)
-            testFiles = testFiles + testCases
+    def createWatcher(self):
+        """
+        Watch the files the test sets depend on
+        """
+        if self.watcher is not None:
+            self.watcher.close()
+
+        self.targets = {}
+        self.directoryTargets = {}
+        for testset in self.testsets:
+            executable = testset.findExecutable()
+            if executable is not None:
+                self.addTarget(executable, testset)
+            for pathdir in testset.pathdirs or []:
+                self.addDirectoryTarget(str(pathdir), testset, False)
+            for caseFile in testset.caseFiles:
+                self.addTarget(caseFile, testset, caseFile)
+            if testset.testdir is not None:
+                self.addDirectoryTarget(testset.testdir, testset, True)
+
+        self.watcher = FileWatcher([self.configFile] + self.targets.keys(),
+                                   self.directoryTargets.keys(),
+                                   self.debounce)
+
+    def update(self, changed):
+        """
+        Reload the cases whose files changed
+        :param changed: Changed paths
+        :returns: Map of test set to the cases to run (None for all cases)
+                  or None if the configuration file changed
+        """
+        if self.configFile in changed:
+            return None
+
+        sets = collections.OrderedDict()
+        caseFiles = collections.OrderedDict()
+        for path in sorted(changed):
+            targets = list(self.targets.get(path, []))
+            for testset, casesOnly in self.directoryTargets.get(
+                    os.path.dirname(path), []):
+                if not casesOnly:
+                    targets.append((testset, None))
+                elif path.endswith(TestSet.CONFIG_EXTENSION):
+                    targets.append((testset, path))
+
+            for testset, caseFile in targets:
+                if caseFile is None:
+                    sets[testset] = None
+                else:
+                    caseFiles.setdefault(testset, []).append(caseFile)
+
+        for testset in self.testsets:
+            if testset not in caseFiles:
+                continue
+            cases = []
+            for caseFile in caseFiles[testset]:
+                case = testset.reloadCase(caseFile)
+                if case: cases.append(case)
+            if testset in sets:
+                continue
+            if len(cases) > 0:
+                sets[testset] = cases
 
-        if len(testFiles)==0:
-            raise Exception("Configuration file missing test cases")
+        # Relink reloaded cases and re-run the cases depending on those run
+        graph = TestCaseGraph(self.testsets)
+        try:
+            graph.link()
+        except Exception as e:
+            print "Error: {}".format(e)
+            return collections.OrderedDict()
 
-        # Create test cases
         cases = []
-        for testFile in testFiles:
-            try:
-                case = TestCase.createTestCase(outDir, testFile)
-                if case: cases.append(case)
-            except Exception as e:
-                print "Error: {}".format(e)
-                print "Skipping test case {} from {}. Skipping.".format(
-                    testFile,
-                    configFile)
+        for testset, selected in sets.iteritems():
+            cases += testset.cases if selected is None else selected
+        for testset, case in graph.getDependents(cases):
+            if testset not in sets:
+                sets[testset] = []
+            if sets[testset] is not None:
+                sets[testset].append(case)
 
-        # Extract environment path directories
-        pathdirs = []
-        if config.has_option(section, TestSet.PROP_GROUP_PATHDIRS):
-            pathdir = config.parseOption(section, TestSet.PROP_GROUP_PATHDIRS)
-            pathdirs = pathdirs + pathdir
+        return sets
 
-        # Extract log file
-        logFile = None
-        if config.has_option(section, TestSet.PROP_GROUP_LOGFILE):
-            logFile = config.parseOption(section, TestSet.PROP_GROUP_LOGFILE)
+    def run(self, selection=None):
+        """
+        Run test sets
+        :param selection: Optional map of test set to the cases to run
+                          (None for all cases). Default all test sets.
+        :returns: Number of failed tests
+        """
+        testsets = self.testsets
+        if selection is not None:
+            testsets = [testset for testset in self.testsets
+                        if testset in selection]
 
-        # Extract log level
-        logLevel = TestSet.PROP_GROUP_LOGLEVEL_DEFAULT
-        if config.has_option(section, TestSet.PROP_GROUP_LOGLEVEL):
-            logLevel = config.parseOption(section, TestSet.PROP_GROUP_LOGLEVEL)
+        scheduler = self.scheduler
+        if scheduler is None and TestCaseGraph.hasDependencies(testsets):
+            scheduler = TestCaseSerialScheduler()
 
-        return TestSet(section,
-                       exePath,
-                       successCode,
-                       outDir,
-                       cases,
-                       pathdirs,
-                       logFile,
-                       logLevel)
+        history = None
+        if TestSet.history is not None and not self.dryRun:
+            history = TestSet.history
+            history.beginRun(self.configFile)
 
-    @staticmethod
-    def createTestSets(configFile):
+        numFailTotal = 0
+        try:
+            for testset in testsets:
+                testset.openArchive()
+            if scheduler is not None:
+                numFailTotal = scheduler.run(testsets,
+                                             self.dryRun,
+                                             selection)
+            else:
+                for testset in testsets:
+                    cases = None
+                    if selection is not None:
+                        cases = selection[testset]
+                    numFailTotal += testset.run(self.dryRun, cases)
+        finally:
+            TestCaseArchive.closeAll()
+            if history is not None:
+                history.endRun(numFailTotal)
+
+        return numFailTotal
+
+    def watch(self):
         """
-        Create a list of all Test Sets in a configuration file
-        :param configFile: Configuration filename
+        Run the test sets then re-run them on changes until interrupted.
+        The watched files are snapshotted before each run so edits made
+        while the cases are running trigger the next run.
+        :returns: Number of failed tests of the last run
         """
+        self.load()
+        self.createWatcher()
+        numFailTotal = self.run()
 
-        # Create parser
-        config = TestBedConfigParser()
-        config.read(configFile)
+        try:
+            while True:
+                method = "polling"
+                if self.watcher.isInotify():
+                    method = "inotify"
+                print "Watching {} files for changes ({}).".format(
+                    self.watcher.getCount(), method)
+                print "Press Ctrl+C to stop."
+                sys.stdout.flush()
+
+                changed = self.watcher.wait()
+                for path in sorted(changed):
+                    print "Changed: {}".format(path)
+
+                selection = self.update(changed)
+                if selection is None:
+                    print "Configuration changed. Reloading test sets."
+                    try:
+                        self.load()
+                    except Exception as e:
+                        print "Error: {}".format(e)
+                        continue
+                elif len(selection) == 0:
+                    print "No test sets affected."
+                    continue
+                sys.stdout.flush()
+
+                self.createWatcher()
+                numFailTotal = self.run(selection)
+        except KeyboardInterrupt:
+            print "Stopped watching."
+        finally:
+            if self.watcher is not None:
+                self.watcher.close()
+
+        return numFailTotal
+
+class TestPlan:
+    """
+    Execution plan of test sets: every case's fully interpolated command,
+    working directory, environment changes, output paths and predicted
+    duration, with the estimated total per set. The plan is streamed as
+    a JSON document or CSV rows while the cases are visited.
+    """
 
-        # Extract all sections in configuration file
-        sections = config.sections()
-        if (len(sections) == 0):
-            raise Exception("No test sets sections in configuration file")
+    # ========================================
+    # FORMATS
+    # ========================================
+    FORMAT_JSON="json"
+    FORMAT_CSV="csv"
+    FORMATS=[FORMAT_JSON, FORMAT_CSV]
 
-        # Parse all sets in configuration file
-        sets = []
-        for section in sections:
-            try:
-                testset = TestSet.createTestSet(configFile, section)
-                if testset: sets.append(testset)
-            except Exception as e:
-                print "Error: {}".format(e)
-                print "Skipping section {} from {}. Skipping.".format(
-                    section,
-                    configFile)
+    # ========================================
+    # CSV RECORDS
+    # ========================================
+    RECORD_CASE="case"
+    RECORD_SET="set"
+    RECORD_TOTAL="total"
+    CSV_COLUMNS=["record", "set", "case", "name", "command", "cwd", "env",
+                 "stdin", "log", "archive", "case_id", "compression",
+                 "workspace", "depends_on", "predicted_seconds", "num_cases",
+                 "unpredicted_cases"]
+
+    def __init__(self, stream, format=FORMAT_JSON, history=None):
+        """
+        :param stream: Stream to write the plan to
+        :param format: Plan format (one of FORMATS)
+        :param history: Optional TestRunHistory to predict durations with
+        """
+        self.stream = stream
+        self.format = format
+        self.history = history
+        self.writer = None
+        if self.format == TestPlan.FORMAT_CSV:
+            self.writer = csv.writer(stream)
 
-        if (len(sets) == 0):
-            raise Exception("No test sets created in configuration file")
+    @staticmethod
+    def getEnvironmentDelta(testset):
+        """
+        :param testset: Test set
+        :returns: Environment changes applied to the set's cases
+        """
+        delta = collections.OrderedDict()
+        if testset.environment is None:
+            return delta
+        if testset.envClear:
+            delta["clear"] = True
+            delta["set"] = collections.OrderedDict(
+                sorted(testset.environment.iteritems()))
+            return delta
+        delta["set"] = collections.OrderedDict(
+            (name, value) for name, value in sorted(
+                testset.environment.iteritems())
+            if os.environ.get(name) != value)
+        delta["unset"] = sorted(name for name in os.environ
+                                if name not in testset.environment)
+        return delta
+
+    def getCaseEntry(self, testset, case):
+        """
+        :param testset: Test set
+        :param case: Test case
+        :returns: Plan entry of the case
+        """
+        cwd = os.path.dirname(testset.executable)
+        if len(cwd.strip()) == 0:
+            cwd = os.getcwd()
+        workspace = None
+        if case.getWorkspace() is not None:
+            workspace = case.getWorkspace().getPattern()
+            cwd = workspace
+
+        predicted = None
+        if self.history is not None:
+            predicted = self.history.predict(testset.name,
+                                             case.getConfigFile())
+
+        entry = {}
+        entry["case"] = case.getConfigFile()
+        entry["name"] = case.getName()
+        entry["command"] = case.getCommand(testset.executable)
+        if (workspace is not None and
+            len(os.path.dirname(testset.executable).strip()) > 0):
+            entry["command"][0] = os.path.abspath(testset.executable)
+        entry["cwd"] = cwd
+        entry["stdin"] = case.getStdin()
+        # Codec selected as in TestSet.initialize
+        entry["compression"] = None
+        if testset.logcompression is not None:
+            codec = testset.logcompression.lower()
+            if codec in LogCompressor.EXTENSIONS:
+                if not LogCompressor.isAvailable(codec):
+                    codec = TestSet.PROP_GROUP_LOGCOMPRESSION_FALLBACK
+                entry["compression"] = codec
+        if testset.logarchive is None:
+            entry["log"] = case.getLogPath(testset.outdir)
+            entry["archive"] = None
+            entry["case_id"] = None
+
+            # Output below the compression threshold is stored plain
+            if entry["compression"] is not None:
+                entry["log"] += "[%s]" % LogCompressor.EXTENSIONS[
+                    entry["compression"]]
+        else:
+            entry["log"] = None
+            entry["archive"] = os.path.normpath(
+                os.path.join(testset.outdir, testset.logarchive))
+            entry["case_id"] = case.getCaseId()
+        entry["workspace"] = workspace
+        entry["depends_on"] = case.getDependsOn()
+        entry["predicted_seconds"] = predicted
+        return entry
+
+    def writeRow(self, values):
+        """
+        Write a CSV row
+        :param values: Map of column to value
+        """
+        row = []
+        for column in TestPlan.CSV_COLUMNS:
+            value = values.get(column)
+            if value is None:
+                value = ""
+            elif isinstance(value, unicode):
+                value = value.encode("utf-8")
+            row.append(value)
+        self.writer.writerow(row)
+
+    def write(self, testsets):
+        """
+        Write the plan of the test sets
+        :param testsets: Test sets
+        :returns: Estimated total duration (seconds) of the known cases
+        """
+        if self.format == TestPlan.FORMAT_CSV:
+            self.writer.writerow(TestPlan.CSV_COLUMNS)
+        else:
+            self.stream.write('{"sets": [')
+
+        totalSeconds = 0.0
+        totalCases = 0
+        totalUnpredicted = 0
+        for setIndex, testset in enumerate(testsets):
+            env = TestPlan.getEnvironmentDelta(testset)
+            if self.format == TestPlan.FORMAT_JSON:
+                if setIndex > 0:
+                    self.stream.write(", ")
+                self.stream.write('{"set": %s, "executable": %s, "env": %s, '
+                                  '"cases": [' %
+                                  (json.dumps(testset.name),
+                                   json.dumps(testset.executable),
+                                   json.dumps(env)))
+
+            setSeconds = 0.0
+            setUnpredicted = 0
+            for caseIndex, case in enumerate(testset.cases):
+                entry = self.getCaseEntry(testset, case)
+                if entry["predicted_seconds"] is None:
+                    setUnpredicted += 1
+                else:
+                    setSeconds += entry["predicted_seconds"]
+
+                if self.format == TestPlan.FORMAT_CSV:
+                    entry["record"] = TestPlan.RECORD_CASE
+                    entry["set"] = testset.name
+                    entry["command"] = " ".join(entry["command"])
+                    entry["env"] = json.dumps(env)
+                    entry["depends_on"] = ";".join(entry["depends_on"])
+                    self.writeRow(entry)
+                else:
+                    if caseIndex > 0:
+                        self.stream.write(", ")
+                    self.stream.write(json.dumps(entry))
+
+            if self.format == TestPlan.FORMAT_CSV:
+                self.writeRow({"record": TestPlan.RECORD_SET,
+                               "set": testset.name,
+                               "predicted_seconds": setSeconds,
+                               "num_cases": len(testset.cases),
+                               "unpredicted_cases": setUnpredicted})
+            else:
+                self.stream.write('], "estimated_seconds": %s, '
+                                  '"num_cases": %d, "unpredicted_cases": %d}' %
+                                  (json.dumps(setSeconds),
+                                   len(testset.cases),
+                                   setUnpredicted))
+
+            totalSeconds += setSeconds
+            totalCases += len(testset.cases)
+            totalUnpredicted += setUnpredicted
+
+        if self.format == TestPlan.FORMAT_CSV:
+            self.writeRow({"record": TestPlan.RECORD_TOTAL,
+                           "predicted_seconds": totalSeconds,
+                           "num_cases": totalCases,
+                           "unpredicted_cases": totalUnpredicted})
+        else:
+            self.stream.write('], "estimated_seconds": %s, '
+                              '"num_cases": %d, "unpredicted_cases": %d}\n' %
+                              (json.dumps(totalSeconds),
+                               totalCases,
+                               totalUnpredicted))
+        self.stream.flush()
 
-        return sets
+        return totalSeconds
 
-def clitestbed(configFile, dryRun=False):
+def clitestbed(configFile, dryRun=False, scheduler=None):
     """
     Test Bed
     :param configFile: Configuration file
     :param dryRun: True if performing a dry run otherwise False
+    :param scheduler: Optional TestCaseScheduler to run cases in parallel
     :returns: Number of failed tests
     """
 
     # Load test sets
     tests = TestSet.createTestSets(configFile)
 
+    # Run dependent cases one at a time in dependency order
+    if scheduler is None and TestCaseGraph.hasDependencies(tests):
+        scheduler = TestCaseSerialScheduler()
+
+    # Record the run
+    history = None
+    if TestSet.history is not None and not dryRun:
+        history = TestSet.history
+        history.beginRun(configFile)
+
     # Run each test set
     numFailTotal = 0
-    for test in tests:
+    try:
+        if scheduler is not None:
+            numFailTotal = scheduler.run(tests, dryRun)
+        else:
+            for test in tests:
 
-        numFail = test.run(dryRun)
-        numFailTotal += numFail
+                numFail = test.run(dryRun)
+                numFailTotal += numFail
+    finally:
+        TestCaseArchive.closeAll()
+        if history is not None:
+            history.endRun(numFailTotal)
 
     return numFailTotal
 
+def show(archivePath, caseId=None):
+    """
+    Write a test case's output from a case output archive (or a possibly
+    compressed case log file) to stdout
+    :param archivePath: Archive directory or case log file
+    :param caseId: Case identifier. If None then list the archived cases.
+    """
+    if os.path.isfile(archivePath):
+        chunks = LogCompressor.readLog(archivePath)
+    elif caseId is None:
+        for archivedCaseId in TestCaseArchive.listCases(archivePath):
+            print archivedCaseId
+        return
+    else:
+        chunks = TestCaseArchive.read(archivePath, caseId)
+
+    for chunk in chunks:
+        sys.stdout.write(chunk)
+    sys.stdout.flush()
+
+def plan(configFile, format=TestPlan.FORMAT_JSON, history=None):
+    """
+    Write the execution plan of a configuration file to stdout. Nothing is
+    run and nothing is written to disk.
+    :param configFile: Configuration file
+    :param format: Plan format (one of TestPlan.FORMATS)
+    :param history: Optional TestRunHistory to predict durations with
+    :returns: Estimated total duration (seconds) of the known cases
+    """
+
+    # Keep messages about skipped sets and cases out of the plan
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        tests = TestSet.createTestSets(configFile, True)
+    finally:
+        sys.stdout = stdout
+
+    return TestPlan(sys.stdout, format, history).write(tests)
+
+def history(database, case=None, last=30, top=10):
+    """
+    Write the run history report of a run history database to stdout
+    :param database: Run history database
+    :param case: Optional case configuration file or name to report the
+                 per-run results of
+    :param last: Number of recent runs to report on
+    :param top: Maximum number of cases per table
+    """
+    runHistory = TestRunHistory(database, True)
+    try:
+        runHistory.report(sys.stdout, case, last, top)
+    finally:
+        runHistory.close()
+
 def main(argv=None):
     """
     Command line main function
@@ -933,16 +5721,123 @@ def main(argv=None):
     if not parser.isGood():
         return 1
 
+    # Read back archived case output
+    if parser.getCommand() == CommandLineParser.COMMAND_SHOW:
+        try:
+            show(*parser.getCommandArgs())
+        except Exception as e:
+            print "Error: {}".format(e)
+            return 2
+        return 0
+
+    # Report run history
+    if parser.getCommand() == CommandLineParser.COMMAND_HISTORY:
+        try:
+            history(*parser.getCommandArgs(),
+                    last=parser.getLast(),
+                    top=parser.getTop())
+        except Exception as e:
+            print "Error: {}".format(e)
+            return 2
+        return 0
+
     configFile = parser.getConfig()
     dryRun = parser.isDryrun()
 
+    # Reserve a core for the harness
+    if parser.getReserveCore() is not None:
+        try:
+            setProcessAffinity([parser.getReserveCore()], loadLibc())
+        except Exception as e:
+            print "Error: Unable to reserve core {}: {}".format(
+                parser.getReserveCore(), e)
+            return 2
+        TestSet.reservedCore = parser.getReserveCore()
+
+    # Configure fixture cache
+    if parser.getFixtureCache() is not None:
+        FixtureCache.directory = parser.getFixtureCache()
+    if parser.getFixtureCacheMb() is not None:
+        FixtureCache.sizeMb = parser.getFixtureCacheMb()
+
+    # Run the cases handed out by a coordinator
+    if parser.getWorker() is not None:
+        try:
+            numCases = TestBedWorker(*parser.getWorker()).run()
+        except Exception as e:
+            print "Error: {}".format(e)
+            return 2
+        print "Worker ran {} cases".format(numCases)
+        return 0
+
+    # Open run history
+    runHistory = None
+    if parser.getHistory() is not None:
+        try:
+            runHistory = TestRunHistory(parser.getHistory(),
+                                        parser.getPlan() is not None)
+        except Exception as e:
+            print "Error: Unable to open run history {}: {}".format(
+                parser.getHistory(), e)
+            return 2
+
+    # Write execution plan (predicted from the run history if recorded)
+    if parser.getPlan() is not None:
+        try:
+            plan(configFile, parser.getPlan(), runHistory)
+        except Exception as e:
+            sys.stderr.write("Error: {}\n".format(e))
+            return 2
+        finally:
+            if runHistory is not None:
+                runHistory.close()
+        return 0
+    TestSet.history = runHistory
+
+    # Create parallel case scheduler
+    scheduler = None
+    if parser.isParallel():
+        scheduler = TestCaseScheduler(parser.getCpus(),
+                                      parser.getMemoryMb())
+
+    # Listen for workers to run the cases on
+    if parser.getCoordinator() is not None:
+        try:
+            scheduler = TestCaseCoordinator(configFile,
+                                            *parser.getCoordinator(),
+                                            workerTimeout=
+                                                parser.getWorkerTimeout())
+        except Exception as e:
+            print "Error: Unable to listen on {}: {}".format(
+                ":".join(str(part) for part in parser.getCoordinator()), e)
+            return 2
+
+    # Enable harness self-profiling
+    cProfiler = None
+    if parser.isProfileHarness():
+        profiler.enable()
+        if parser.getProfileOutput() is not None:
+            cProfiler = cProfile.Profile()
+            cProfiler.enable()
+
     # Load test sets
     try:
-        clitestbed(configFile, dryRun)
+        if parser.isWatch():
+            TestBedWatch(configFile, dryRun, scheduler).watch()
+        else:
+            clitestbed(configFile, dryRun, scheduler)
     except Exception as e:
         print "Error: {}".format(e)
         print "Exiting"
         return 2
+    finally:
+        if runHistory is not None:
+            runHistory.close()
+        if cProfiler is not None:
+            cProfiler.disable()
+            cProfiler.dump_stats(parser.getProfileOutput())
+        if profiler.isEnabled():
+            profiler.report()
 
     return 0
 
@@ -0,0 +1,87 @@
+"""
+File
+
+    test_affinity.py
+
+Description
+
+    Tests of the benchmark noise controls: CPU lists given as numbers,
+    lists and ranges (parseCpuList) and --reserve-core removing the harness
+    core from the case affinity and from the --parallel CPUs.
+
+Usage
+
+    python -m unittest discover -s test
+
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "src"))
+
+from clitestbed import TestCaseScheduler, TestSet, parseCpuList
+
+class TestParseCpuList(unittest.TestCase):
+
+    def testNumber(self):
+        self.assertEqual([3], parseCpuList(3))
+
+    def testList(self):
+        self.assertEqual([0, 2, 5], parseCpuList([5, 0, 2, 2]))
+
+    def testRanges(self):
+        self.assertEqual([0, 1, 2, 3, 6], parseCpuList("0-3,6"))
+        self.assertEqual([1, 2, 4, 5, 6], parseCpuList(" 4-6 , 1-2 ,"))
+
+    def testInvalid(self):
+        for cpus in ["a", "1-b", "0,x", "1.5"]:
+            self.assertRaises(ValueError, parseCpuList, cpus)
+
+class TestReserveCore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.configFile = os.path.join(self.directory, "config.json")
+        caseFile = os.path.join(self.directory, "case.json")
+        with open(caseFile, "w") as handle:
+            json.dump({"TEST": {"DESCRIPTION": "Case",
+                                "OUTSUBDIR": "case",
+                                "LOGFILE": "case.log"},
+                       "ARGUMENTS": {}}, handle)
+        with open(self.configFile, "w") as handle:
+            json.dump({"set": {"EXECUTABLE": "true",
+                               "TESTCASES": [caseFile],
+                               "OUTDIR": "output",
+                               "AFFINITY": "0-3"}}, handle)
+
+    def tearDown(self):
+        TestSet.reservedCore = None
+        shutil.rmtree(self.directory)
+
+    def getAffinity(self):
+        testset = TestSet.createTestSet(self.configFile, "set", True)
+        testset.logger = logging.getLogger("test_affinity")
+        testset.initializeProcessSettings()
+        return testset.runSettings["affinity"]
+
+    def testAffinity(self):
+        self.assertEqual("0-3", self.getAffinity())
+        TestSet.reservedCore = 2
+        self.assertEqual("0-1,3", self.getAffinity())
+
+    def testParallelCpus(self):
+        TestSet.reservedCore = 0
+        cpus = max(multiprocessing.cpu_count() - 1, 1)
+        self.assertEqual(cpus, TestCaseScheduler(None, 0).getCpus())
+        self.assertEqual(cpus, TestCaseScheduler(1024, 0).getCpus())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+File
+
+    test_archive.py
+
+Description
+
+    Tests of the packed case output archive (TestCaseArchive): output
+    appended across reopened archives is found through the index, and
+    cases only recorded in the journal after the index was built are found
+    by scanning the journal tail.
+
+Usage
+
+    python -m unittest discover -s test
+
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "src"))
+
+from clitestbed import TestCaseArchive
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "archive")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def append(self, archive, caseId, data):
+        segment, handle = archive.acquireSegment()
+        offset = os.fstat(handle.fileno()).st_size
+        handle.write(data)
+        archive.releaseSegment(segment, handle)
+        archive.record(caseId, segment, offset, len(data))
+
+    def read(self, caseId):
+        return "".join(TestCaseArchive.read(self.path, caseId))
+
+    def testReopen(self):
+        archive = TestCaseArchive(self.path)
+        self.append(archive, "a/a.log", "output of a\n")
+        self.append(archive, "b/b.log", "output of b\n")
+        archive.close()
+
+        # A reopened archive appends to new segments and rebuilds the index
+        archive = TestCaseArchive(self.path)
+        self.append(archive, "c/c.log", "output of c\n")
+        self.append(archive, "a/a.log", "new output of a\n")
+        archive.close()
+
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.path, TestCaseArchive.INDEX_FILE)))
+        self.assertEqual(["a/a.log", "b/b.log", "c/c.log"],
+                         TestCaseArchive.listCases(self.path))
+        self.assertEqual("new output of a\n", self.read("a/a.log"))
+        self.assertEqual("output of b\n", self.read("b/b.log"))
+        self.assertEqual("output of c\n", self.read("c/c.log"))
+        self.assertEqual(1, TestCaseArchive.lookup(self.path, "c/c.log")[1])
+        self.assertIsNone(TestCaseArchive.lookup(self.path, "d/d.log"))
+
+    def testJournalTail(self):
+        archive = TestCaseArchive(self.path)
+        self.append(archive, "a/a.log", "output of a\n")
+        archive.close()
+
+        # Entries recorded after the index was built (e.g. by a run that
+        # was interrupted before closing the archive)
+        archive = TestCaseArchive(self.path)
+        self.append(archive, "b/b.log", "output of b\n")
+        self.append(archive, "a/a.log", "new output of a\n")
+        try:
+            self.assertEqual("output of b\n", self.read("b/b.log"))
+            self.assertEqual("new output of a\n", self.read("a/a.log"))
+        finally:
+            archive.close()
+
+if __name__ == "__main__":
+    unittest.main()
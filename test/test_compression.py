@@ -0,0 +1,85 @@
+"""
+File
+
+    test_compression.py
+
+Description
+
+    Tests of case output compression (LogCompressor): output compressing to
+    less than the threshold is written plain, larger output is written
+    compressed, and the compression CPU time is measured.
+
+Usage
+
+    python -m unittest discover -s test
+
+"""
+
+import cStringIO
+import os
+import random
+import sys
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "src"))
+
+from clitestbed import LogCompressor
+
+THRESHOLD = 4096
+
+class TestCompression(unittest.TestCase):
+
+    def compress(self, data):
+        """
+        :returns: (codec used, bytes written, compressor)
+        """
+        outputs = {}
+
+        def openOutput(codec):
+            outputs[codec] = cStringIO.StringIO()
+            return outputs[codec]
+
+        compressor = LogCompressor(LogCompressor.CODEC_GZIP,
+                                   THRESHOLD,
+                                   openOutput)
+        for position in xrange(0, len(data), LogCompressor.CHUNK_SIZE):
+            compressor.write(data[position:position +
+                                  LogCompressor.CHUNK_SIZE])
+        handle = compressor.close()
+        self.assertEqual(1, len(outputs))
+        self.assertIs(outputs[compressor.getCodec()], handle)
+        return (compressor.getCodec(), handle.getvalue(), compressor)
+
+    def testBelowThreshold(self):
+
+        # Large but compressing to less than the threshold
+        data = "hello\n" * 20000
+        self.assertLess(len(zlib.compress(data)), THRESHOLD)
+        codec, output, compressor = self.compress(data)
+        self.assertIsNone(codec)
+        self.assertEqual(data, output)
+
+    def testAboveThreshold(self):
+        generator = random.Random(1)
+        data = "".join(chr(generator.randint(0, 255))
+                       for index in xrange(2 * THRESHOLD))
+        codec, output, compressor = self.compress(data)
+        self.assertEqual(LogCompressor.CODEC_GZIP, codec)
+        self.assertGreaterEqual(len(output), THRESHOLD)
+        self.assertEqual(data, zlib.decompress(output, 16 + zlib.MAX_WBITS))
+        self.assertEqual(len(output), compressor.getBytesOut())
+        if compressor.getCpuTime() is not None:
+            self.assertGreaterEqual(compressor.getCpuTime(), 0.0)
+
+    def testBufferMax(self):
+
+        # Output beyond the buffered size is compressed regardless
+        data = "a" * (LogCompressor.BUFFER_MAX + 1)
+        codec, output, compressor = self.compress(data)
+        self.assertEqual(LogCompressor.CODEC_GZIP, codec)
+        self.assertEqual(data, zlib.decompress(output, 16 + zlib.MAX_WBITS))
+
+if __name__ == "__main__":
+    unittest.main()
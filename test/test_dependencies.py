@@ -0,0 +1,109 @@
+"""
+File
+
+    test_dependencies.py
+
+Description
+
+    Regression tests of case dependencies (DEPENDS_ON): a chain A -> B -> C
+    where A fails must skip both B and C, run serially or with --parallel.
+
+Usage
+
+    python -m unittest discover -s test
+
+"""
+
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+
+CLITESTBED = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, "src", "clitestbed.py")
+
+class TestDependencies(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.writeScript("fail.sh", 1)
+        self.writeScript("pass.sh", 0)
+        self.writeCase("a")
+        self.writeCase("b", "a")
+        self.writeCase("c", "b")
+        self.writeCase("d")
+
+        # C and B come before the A they depend on and A is in a later set
+        self.writeJson("config.json", {
+            "pass set": {"EXECUTABLE": "./pass.sh",
+                         "TESTCASES": ["c.json", "b.json", "d.json"],
+                         "OUTDIR": "output",
+                         "LOGFILE": "pass.log"},
+            "fail set": {"EXECUTABLE": "./fail.sh",
+                         "TESTCASES": ["a.json"],
+                         "OUTDIR": "output",
+                         "LOGFILE": "fail.log"}})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writeJson(self, filename, data):
+        with open(os.path.join(self.directory, filename), "w") as handle:
+            json.dump(data, handle)
+
+    def writeScript(self, filename, status):
+        path = os.path.join(self.directory, filename)
+        with open(path, "w") as handle:
+            handle.write("#!/bin/sh\nexit %i\n" % status)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+    def writeCase(self, name, dependency=None):
+        test = {"DESCRIPTION": "Case " + name,
+                "OUTSUBDIR": name,
+                "LOGFILE": name + ".log"}
+        if dependency is not None:
+            test["DEPENDS_ON"] = dependency
+        self.writeJson(name + ".json", {"TEST": test, "ARGUMENTS": {}})
+
+    def runTestBed(self, *options):
+        """
+        :returns: Status lines of the pass set log in order
+        """
+        subprocess.check_call([sys.executable, CLITESTBED] +
+                              list(options) + ["config.json"],
+                              cwd=self.directory,
+                              stdout=open(os.devnull, "w"),
+                              stderr=subprocess.STDOUT)
+        lines = []
+        with open(os.path.join(self.directory, "output",
+                               "pass.log")) as handle:
+            for line in handle:
+                for key in ["DESCRIPTION", "Test Case return status"]:
+                    if key in line:
+                        lines.append(line[line.index(key):].strip())
+        return lines
+
+    def checkChain(self, lines):
+        self.assertIn("SKIPPED (dependency did not pass: a)",
+                      lines[lines.index("DESCRIPTION: Case b") + 1])
+        self.assertIn("SKIPPED (dependency did not pass: b)",
+                      lines[lines.index("DESCRIPTION: Case c") + 1])
+        self.assertEqual("Test Case return status: 0",
+                         lines[lines.index("DESCRIPTION: Case d") + 1])
+
+    def testSerial(self):
+        lines = self.runTestBed()
+        self.checkChain(lines)
+
+        # Cases not waiting on a dependency keep the configuration order
+        self.assertEqual("DESCRIPTION: Case d", lines[0])
+
+    def testParallel(self):
+        self.checkChain(self.runTestBed("--parallel"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+File
+
+    test_distributed.py
+
+Description
+
+    Tests of distributed execution (--coordinator and --worker): several
+    workers on localhost run the cases of a configuration, including output
+    larger than one upload chunk, workers resolve fixtures to the cached
+    fixture files, a case whose worker is killed is finished by another
+    worker, and a coordinator without workers fails after --worker-timeout.
+
+Usage
+
+    python -m unittest discover -s test
+
+"""
+
+import json
+import os
+import re
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+CLITESTBED = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, "src", "clitestbed.py")
+
+# Output of each case (larger than the worker's 1 MB upload chunks)
+OUTPUT_LINES = 500000
+OUTPUT = "".join("%i\n" % line for line in range(1, OUTPUT_LINES + 1))
+
+NUM_CASES = 6
+
+NUM_WORKERS = 3
+
+class TestDistributed(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, "output.sh")
+        with open(path, "w") as handle:
+            handle.write("#!/bin/sh\nseq 1 %i\n" % OUTPUT_LINES)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+        caseFiles = []
+        for index in range(NUM_CASES):
+            name = "case%i" % index
+            self.writeJson(name + ".json",
+                           {"TEST": {"DESCRIPTION": "Case %i" % index,
+                                     "OUTSUBDIR": name,
+                                     "LOGFILE": name + ".log"},
+                            "ARGUMENTS": {}})
+            caseFiles.append(name + ".json")
+
+        self.writeJson("config.json",
+                       {"distributed set": {"EXECUTABLE": "./output.sh",
+                                            "TESTCASES": caseFiles,
+                                            "OUTDIR": "output",
+                                            "LOGFILE": "set.log"}})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writeJson(self, filename, data):
+        with open(os.path.join(self.directory, filename), "w") as handle:
+            json.dump(data, handle)
+
+    def writeScript(self, filename, script):
+        path = os.path.join(self.directory, filename)
+        with open(path, "w") as handle:
+            handle.write("#!/bin/sh\n" + script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+    def startWorker(self, port):
+        return subprocess.Popen([sys.executable, CLITESTBED,
+                                 "--worker", ":%i" % port],
+                                stdout=open(os.devnull, "w"),
+                                stderr=subprocess.STDOUT)
+
+    def readLog(self, *path):
+        with open(os.path.join(self.directory, "output", *path)) as handle:
+            return handle.read()
+
+    def startCoordinator(self, *options):
+        """
+        :returns: (coordinator process, port it listens on)
+        """
+        coordinator = subprocess.Popen([sys.executable, "-u", CLITESTBED,
+                                        "--coordinator", ":0"] +
+                                       list(options) + ["config.json"],
+                                       cwd=self.directory,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT)
+        for line in iter(coordinator.stdout.readline, ""):
+            match = re.match(r"Waiting for workers on ([^:]+):(\d+)", line)
+            if match:
+                self.assertEqual("127.0.0.1", match.group(1))
+                return coordinator, int(match.group(2))
+        coordinator.wait()
+        self.fail("Coordinator did not listen")
+
+    def testWorkers(self):
+        coordinator, port = self.startCoordinator()
+        workers = [self.startWorker(port) for index in range(NUM_WORKERS)]
+        coordinator.communicate()
+        self.assertEqual(0, coordinator.returncode)
+        for worker in workers:
+            self.assertEqual(0, worker.wait())
+
+        with open(os.path.join(self.directory, "output",
+                               "set.log")) as handle:
+            log = handle.read()
+        self.assertIn("TOTAL NUMBER OF PASS: %i" % NUM_CASES, log)
+        for index in range(NUM_CASES):
+            path = os.path.join(self.directory, "output", "case%i" % index,
+                                "case%i.log" % index)
+            with open(path) as handle:
+                self.assertTrue(handle.read() == OUTPUT)
+
+    def testFixtures(self):
+        self.writeScript("cat.sh", "cat\n")
+        self.writeJson("case.json", {"TEST": {"DESCRIPTION": "Case",
+                                              "OUTSUBDIR": "case",
+                                              "LOGFILE": "case.log",
+                                              "STDIN": "$(fixture:input)"},
+                                     "ARGUMENTS": {}})
+        self.writeJson("config.json",
+                       {"FIXTURES": {"input": {"COMMAND": "seq 1 3"}},
+                        "fixture set": {"EXECUTABLE": "./cat.sh",
+                                        "TESTCASES": ["case.json"],
+                                        "OUTDIR": "output",
+                                        "LOGFILE": "set.log"}})
+
+        coordinator, port = self.startCoordinator("--fixture-cache",
+                                                  "cache")
+        worker = self.startWorker(port)
+        coordinator.communicate()
+        self.assertEqual(0, coordinator.returncode)
+        self.assertEqual(0, worker.wait())
+
+        self.assertIn("TOTAL NUMBER OF PASS: 1", self.readLog("set.log"))
+        self.assertEqual("1\n2\n3\n", self.readLog("case", "case.log"))
+        self.assertEqual(1, len(os.listdir(os.path.join(self.directory,
+                                                        "cache"))))
+
+    def testLostWorker(self):
+        # The case signals it started then runs long enough to be killed
+        self.writeScript("slow.sh", "echo started >> started.txt\n"
+                                    "sleep 1\n"
+                                    "echo done\n")
+        self.writeJson("case.json", {"TEST": {"DESCRIPTION": "Case",
+                                              "OUTSUBDIR": "case",
+                                              "LOGFILE": "case.log"},
+                                     "ARGUMENTS": {}})
+        self.writeJson("config.json",
+                       {"slow set": {"EXECUTABLE": "./slow.sh",
+                                     "TESTCASES": ["case.json"],
+                                     "OUTDIR": "output",
+                                     "LOGFILE": "set.log"}})
+
+        coordinator, port = self.startCoordinator()
+        worker = self.startWorker(port)
+        started = os.path.join(self.directory, "started.txt")
+        while not os.path.isfile(started):
+            self.assertIsNone(worker.poll())
+            time.sleep(0.05)
+        worker.kill()
+        worker.wait()
+
+        worker = self.startWorker(port)
+        coordinator.communicate()
+        self.assertEqual(0, coordinator.returncode)
+        self.assertEqual(0, worker.wait())
+
+        log = self.readLog("set.log")
+        self.assertIn("lost running CASE # 1. Re-queued.", log)
+        self.assertIn("TOTAL NUMBER OF PASS: 1", log)
+        self.assertEqual("done\n", self.readLog("case", "case.log"))
+        with open(started) as handle:
+            self.assertEqual(2, len(handle.readlines()))
+
+    def testWorkerTimeout(self):
+        coordinator = self.startCoordinator("--worker-timeout", "1")[0]
+        output = coordinator.communicate()[0]
+        self.assertEqual(2, coordinator.returncode)
+        self.assertIn("No worker connected for 1 seconds", output)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+File
+
+    test_inputs.py
+
+Description
+
+    Tests of case inputs (STDIN and FIXTURES): a missing STDIN file or a
+    failing fixture command fails the case with its error logged, and
+    fixtures no case uses are never hashed when the cache is evicted.
+
+Usage
+
+    python -m unittest discover -s test
+
+"""
+
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+
+CLITESTBED = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, "src", "clitestbed.py")
+
+class TestInputs(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, "cat.sh")
+        with open(path, "w") as handle:
+            handle.write("#!/bin/sh\ncat\n")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writeJson(self, filename, data):
+        with open(os.path.join(self.directory, filename), "w") as handle:
+            json.dump(data, handle)
+
+    def runTestBed(self, stdin, fixtures):
+        """
+        Run a case reading its standard input from stdin
+        :returns: (set log, case log or None if not written)
+        """
+        self.writeJson("case.json", {"TEST": {"DESCRIPTION": "Case",
+                                              "OUTSUBDIR": "case",
+                                              "LOGFILE": "case.log",
+                                              "STDIN": stdin},
+                                     "ARGUMENTS": {}})
+        self.writeJson("config.json", {"FIXTURES": fixtures,
+                                       "set": {"EXECUTABLE": "./cat.sh",
+                                               "TESTCASES": ["case.json"],
+                                               "OUTDIR": "output",
+                                               "LOGFILE": "set.log"}})
+        subprocess.call([sys.executable, CLITESTBED,
+                         "--fixture-cache", "cache",
+                         "--fixture-cache-mb", "0",
+                         "config.json"],
+                        cwd=self.directory,
+                        stdout=open(os.devnull, "w"),
+                        stderr=subprocess.STDOUT)
+
+        output = os.path.join(self.directory, "output")
+        with open(os.path.join(output, "set.log")) as handle:
+            log = handle.read()
+        caseLog = None
+        if os.path.isfile(os.path.join(output, "case", "case.log")):
+            with open(os.path.join(output, "case", "case.log")) as handle:
+                caseLog = handle.read()
+        return (log, caseLog)
+
+    def testMissingStdin(self):
+        log, caseLog = self.runTestBed("missing.txt", {})
+        self.assertIn("Unable to open STDIN missing.txt", log)
+        self.assertIn("Test Case return status: -2", log)
+        self.assertNotIn("unhandled exception", log)
+
+    def testFailingFixture(self):
+        log, caseLog = self.runTestBed("$(fixture:broken)",
+                                       {"broken": "exit 3"})
+        self.assertIn("Unable to generate fixture broken", log)
+        self.assertIn("Test Case return status: -2", log)
+        self.assertNotIn("unhandled exception", log)
+
+    def testUnusedFixture(self):
+
+        # The unused fixture's input is missing so it cannot be hashed
+        log, caseLog = self.runTestBed("$(fixture:numbers)",
+                                       {"numbers": "seq 1 3",
+                                        "unused": {"COMMAND": "cat data.csv",
+                                                   "INPUTS": ["data.csv"]}})
+        self.assertIn("Test Case return status: 0", log)
+        self.assertEqual("1\n2\n3\n", caseLog)
+
+if __name__ == "__main__":
+    unittest.main()
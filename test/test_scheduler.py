@@ -0,0 +1,126 @@
+"""
+File
+
+    test_scheduler.py
+
+Description
+
+    Tests of the parallel case scheduler (TestCaseScheduler): cases are
+    packed onto the CPUS and MEMORY_MB available without oversubscribing
+    either, and a large case cannot be starved by smaller ones.
+
+Usage
+
+    python -m unittest discover -s test
+
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "src"))
+
+from clitestbed import TestCaseScheduler
+
+class FakeCase:
+
+    def __init__(self, name, cpus, memoryMb=0):
+        self.name = name
+        self.cpus = cpus
+        self.memoryMb = memoryMb
+
+    def getCpus(self):
+        return self.cpus
+
+    def getMemoryMb(self):
+        return self.memoryMb
+
+    def getDependencies(self):
+        return []
+
+class FakeTestSet:
+
+    def __init__(self, cases):
+        self.cases = cases
+
+class TestScheduler(unittest.TestCase):
+
+    def createJobs(self, scheduler, *cases):
+        return scheduler.createJobs([FakeTestSet(list(cases))])
+
+    def start(self, scheduler, pending):
+        """
+        Start pending jobs until none can start
+        :returns: Names of the cases started
+        """
+        started = []
+        while True:
+            job = scheduler.select(pending)
+            if job is None:
+                return started
+            pending.remove(job)
+            scheduler.cpusFree -= job.cpus
+            scheduler.memoryFree -= job.memoryMb
+            started.append(job.case.name)
+
+    def testCpuPacking(self):
+        scheduler = TestCaseScheduler(4, 0)
+        pending = self.createJobs(scheduler,
+                                  FakeCase("one", 1),
+                                  FakeCase("three", 3),
+                                  FakeCase("two", 2),
+                                  FakeCase("other one", 1))
+
+        # Largest first, then the cases that still fit
+        self.assertEqual(["three", "one"], self.start(scheduler, pending))
+        self.assertEqual(0, scheduler.cpusFree)
+        self.assertEqual(["two", "other one"],
+                         [job.case.name for job in pending])
+
+    def testMemoryPacking(self):
+        scheduler = TestCaseScheduler(4, 1000)
+        pending = self.createJobs(scheduler,
+                                  FakeCase("small", 1, 300),
+                                  FakeCase("large", 1, 800),
+                                  FakeCase("medium", 1, 500))
+        self.assertEqual(["large"], self.start(scheduler, pending))
+        self.assertEqual(200, scheduler.memoryFree)
+
+    def testOversizedCase(self):
+
+        # Cases declaring more than available are limited to run alone
+        scheduler = TestCaseScheduler(4, 1000)
+        jobs = self.createJobs(scheduler, FakeCase("huge", 16, 4000))
+        self.assertEqual(4, jobs[0].cpus)
+        self.assertEqual(1000, jobs[0].memoryMb)
+
+    def testBypassLimit(self):
+        scheduler = TestCaseScheduler(4, 0)
+        pending = self.createJobs(scheduler,
+                                  FakeCase("large", 4),
+                                  *[FakeCase("small %i" % index, 1)
+                                    for index in range(10)])
+        large = pending[0]
+
+        # Two CPUs are busy so small cases (which finish at once) may
+        # bypass the large one until it has been bypassed BYPASS_LIMIT times
+        scheduler.cpusFree = 2
+        numStarted = 0
+        while True:
+            job = scheduler.select(pending)
+            if job is None:
+                break
+            self.assertIsNot(large, job)
+            pending.remove(job)
+            numStarted += 1
+        self.assertEqual(TestCaseScheduler.BYPASS_LIMIT, numStarted)
+        self.assertEqual(TestCaseScheduler.BYPASS_LIMIT, large.bypassed)
+
+        # Once the busy CPUs are released the large case starts first
+        scheduler.cpusFree = 4
+        self.assertIs(large, scheduler.select(pending))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+File
+
+    test_workspace.py
+
+Description
+
+    Tests of case workspaces (WORKSPACE): a workspace is a clone of its
+    template that a case can modify without modifying the template, auto
+    mode falls back to copying where reflink is not supported (with a
+    warning), and a relative EXECUTABLE is still found from a workspace.
+
+Usage
+
+    python -m unittest discover -s test
+
+"""
+
+import errno
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "src"))
+
+import clitestbed
+from clitestbed import Workspace
+
+CLITESTBED = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, "src", "clitestbed.py")
+
+class TestWorkspace(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.template = os.path.join(self.directory, "template")
+        os.makedirs(os.path.join(self.template, "data"))
+        with open(os.path.join(self.template, "data", "input.txt"),
+                  "w") as handle:
+            handle.write("template\n")
+        os.symlink("data", os.path.join(self.template, "link"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writeJson(self, filename, data):
+        with open(os.path.join(self.directory, filename), "w") as handle:
+            json.dump(data, handle)
+
+    def testClone(self):
+        workspace = Workspace(self.template,
+                              os.path.join(self.directory, "workspaces"),
+                              "case")
+        mode = workspace.create()
+        self.assertIn(mode, [Workspace.MODE_REFLINK, Workspace.MODE_COPY])
+
+        path = os.path.join(workspace.getPath(), "data", "input.txt")
+        with open(path) as handle:
+            self.assertEqual("template\n", handle.read())
+        self.assertEqual("data", os.readlink(
+            os.path.join(workspace.getPath(), "link")))
+
+        # Modifying the clone in place leaves the template unchanged
+        with open(path, "a") as handle:
+            handle.write("case\n")
+        with open(os.path.join(self.template, "data",
+                               "input.txt")) as handle:
+            self.assertEqual("template\n", handle.read())
+
+        workspace.remove()
+        self.assertFalse(os.path.exists(workspace.getPath()))
+
+    def testFallback(self):
+        def ioctl(fd, request, arg):
+            raise IOError(errno.EOPNOTSUPP, os.strerror(errno.EOPNOTSUPP))
+
+        root = os.path.join(self.directory, "workspaces")
+        ficlone = clitestbed.fcntl.ioctl
+        clitestbed.fcntl.ioctl = ioctl
+        try:
+            # Auto mode copies the files reflink fails on
+            workspace = Workspace(self.template, root, "auto")
+            self.assertEqual(Workspace.MODE_COPY, workspace.create())
+            with open(os.path.join(workspace.getPath(), "data",
+                                   "input.txt")) as handle:
+                self.assertEqual("template\n", handle.read())
+
+            # Reflink mode fails instead
+            workspace = Workspace(self.template, root, "reflink",
+                                  Workspace.MODE_REFLINK)
+            self.assertRaises(IOError, workspace.create)
+        finally:
+            clitestbed.fcntl.ioctl = ficlone
+
+    def testRelativeExecutable(self):
+        path = os.path.join(self.directory, "gen.sh")
+        with open(path, "w") as handle:
+            handle.write("#!/bin/sh\ncat data/input.txt > output.txt\n")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+        self.writeJson("case.json", {"TEST": {"DESCRIPTION": "Case",
+                                              "OUTSUBDIR": "case",
+                                              "LOGFILE": "case.log",
+                                              "WORKSPACE": "template"},
+                                     "ARGUMENTS": {}})
+        self.writeJson("config.json", {"set": {"EXECUTABLE": "./gen.sh",
+                                               "TESTCASES": ["case.json"],
+                                               "OUTDIR": "output",
+                                               "LOGFILE": "set.log",
+                                               "WORKSPACEKEEP": "always"}})
+        subprocess.call([sys.executable, CLITESTBED, "config.json"],
+                        cwd=self.directory,
+                        stdout=open(os.devnull, "w"),
+                        stderr=subprocess.STDOUT)
+
+        with open(os.path.join(self.directory, "output",
+                               "set.log")) as handle:
+            log = handle.read()
+        self.assertIn("Test Case return status: 0", log)
+
+        # The case ran in its workspace, which holds its output
+        outputs = []
+        for dirPath, dirNames, fileNames in os.walk(
+                os.path.join(self.directory, "output", "workspaces")):
+            if "output.txt" in fileNames:
+                outputs.append(os.path.join(dirPath, "output.txt"))
+        self.assertEqual(1, len(outputs))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.template, "output.txt")))
+
+if __name__ == "__main__":
+    unittest.main()